@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Layout profiles for portfolio disclosures
+An AMC in amc_urls.json can register the layout of its portfolio
+disclosure (header row, column names, scheme title rows, value units).
+A profile is compiled once into a deterministic parser, so AMCs with a
+profile never need the LLM. The one layout shipped is sebi_profile, a
+generic parser for the SEBI monthly disclosure format; no AMC is
+registered by default.
+"""
+
+import re
+import pandas as pd
+
+from normalization import NUMERIC_COLUMNS, parse_numeric_column, disclosure_date
+
+VALUE_UNITS = {'rupees': 1.0, 'thousand': 1e3, 'lakh': 1e5, 'million': 1e6, 'crore': 1e7}
+
+def _cell_text(value):
+    if value is None or (isinstance(value, float) and pd.isna(value)):
+        return ''
+    return re.sub(r'\s+', ' ', str(value)).strip()
+
+class LayoutProfile:
+    """
+    Layout of one AMC's portfolio tables, compiled into a parser
+
+    columns maps canonical holdings columns to a regex for their header
+    cell (checked in order, first match wins). header_row is the 0-based
+    row of the header in every sheet or table, or None to take the first
+    row whose cells name the security and at least min_columns columns.
+    scheme_from is 'marker' (the last row before the header matching
+    scheme_marker), 'sheet' (the sheet name) or 'column' (a scheme_name
+    column). value_unit is the unit of the market value column. Rows
+    whose security matches skip_rows are dropped. file_pattern limits
+    which linked files are read; page_tables also reads the page's own
+    HTML tables.
+    """
+
+    def __init__(self, columns, header_row=None, min_columns=3,
+                 scheme_from='marker', scheme_marker=r'\b(fund|scheme|plan|etf|fof)\b',
+                 value_unit='rupees', skip_rows=r'^(sub[\s-]*total|grand\s+total|total|net\s+assets)\b',
+                 file_pattern=None, page_tables=True):
+        if scheme_from not in ('marker', 'sheet', 'column'):
+            raise ValueError(f"scheme_from must be 'marker', 'sheet' or 'column', not {scheme_from!r}")
+        if value_unit not in VALUE_UNITS:
+            raise ValueError(f"value_unit must be one of {', '.join(VALUE_UNITS)}, not {value_unit!r}")
+
+        self.columns = [(col, re.compile(pattern, re.I)) for col, pattern in columns.items()]
+        self.header_row = header_row
+        self.min_columns = min_columns
+        self.scheme_from = scheme_from
+        self.scheme_marker = re.compile(scheme_marker, re.I)
+        self.multiplier = VALUE_UNITS[value_unit]
+        self.skip_rows = re.compile(skip_rows, re.I)
+        self.file_pattern = re.compile(file_pattern, re.I) if file_pattern else None
+        self.page_tables = page_tables
+
+    def _map_header(self, row):
+        """Canonical column per cell, or None if row is not this layout's header"""
+        mapping = []
+        for text in row:
+            mapping.append(next((col for col, pattern in self.columns if text and pattern.search(text)), None))
+        found = {col for col in mapping if col}
+        if len(found) >= self.min_columns and found & {'stock_name', 'isin'}:
+            return mapping
+        return None
+
+    def wants_file(self, url):
+        return self.file_pattern is None or bool(self.file_pattern.search(url))
+
+    def parse_grid(self, rows, sheet_name=None, scheme=None, header=None):
+        """
+        Parse one sheet or table into holdings with canonical keys
+
+        Numbers are parsed and market_value is converted to rupees here,
+        and holdings get the 'as on' date of the title rows as their
+        portfolio_date. header and scheme carry over between tables of one document (PDF
+        pages). Returns (holdings, header, scheme).
+        """
+        # Sheet names are the fallback scheme name until a title row gives one
+        if sheet_name and self.scheme_from != 'column' and (self.scheme_from == 'sheet' or scheme is None):
+            scheme = sheet_name
+
+        records, title, portfolio_date = [], None, None
+        for index, raw in enumerate(rows):
+            row = [_cell_text(value) for value in raw]
+            filled = [text for text in row if text]
+            if not filled:
+                continue
+
+            if self.header_row is None or index == self.header_row:
+                mapping = self._map_header(row)
+                if mapping is not None:
+                    header = mapping
+                    if self.scheme_from == 'marker' and title:
+                        scheme, title = title, None
+                    continue
+
+            # The disclosure date sits in the title rows ("Portfolio as on 31-Mar-2026")
+            if len(filled) == 1 or header is None:
+                portfolio_date = disclosure_date(' '.join(filled)) or portfolio_date
+
+            if len(filled) == 1:
+                if self.scheme_marker.search(filled[0]):
+                    title = filled[0]
+                continue
+
+            if header is None:
+                continue
+
+            record = {}
+            for col, text in zip(header, row):
+                if col and text and col not in record:
+                    record[col] = text
+            security = record.get('stock_name') or record.get('isin')
+            if not security or self.skip_rows.search(security):
+                continue
+            if self.scheme_from != 'column' and scheme:
+                record['scheme_name'] = scheme
+            if portfolio_date and 'portfolio_date' not in record:
+                record['portfolio_date'] = portfolio_date
+            records.append(record)
+
+        if not records:
+            return [], header, scheme
+
+        df = pd.DataFrame(records)
+        for col in df.columns.intersection(NUMERIC_COLUMNS):
+            multiplier = self.multiplier if col == 'market_value' else 1.0
+            df[col] = parse_numeric_column(df[col], multiplier)
+        holdings = [
+            {key: value for key, value in record.items() if not pd.isna(value)}
+            for record in df.to_dict('records')
+        ]
+        return holdings, header, scheme
+
+def table_rows(table):
+    """Rows of a pd.read_html table, with its (possibly multi-level) header as the first row"""
+    header = [
+        ' '.join(str(part) for part in col if not str(part).startswith('Unnamed')) if isinstance(col, tuple) else str(col)
+        for col in table.columns
+    ]
+    return [header] + table.values.tolist()
+
+# ============================================
+# REGISTRY
+# ============================================
+
+PROFILES = {}
+
+def register_profile(amc_name, profile):
+    """Register the layout profile for an AMC (keyed by its name in amc_urls.json)"""
+    PROFILES[amc_name] = profile
+    return profile
+
+def get_profile(amc_name):
+    """Return the layout profile registered for an AMC, or None"""
+    return PROFILES.get(amc_name)
+
+# Column headers of the SEBI monthly portfolio disclosure format
+SEBI_COLUMNS = {
+    'stock_name': r'name of (the )?(instrument|issuer|security)|^company name$',
+    'isin': r'^isin',
+    'sector': r'industry|sector',
+    'quantity': r'^quantity|no\.? of shares',
+    'market_value': r'market\s*(/\s*fair\s*)?value|fair value',
+    'weight_percent': r'%\s*(to|of)\s*(net\s*assets|nav|aum)',
+}
+
+def sebi_profile(value_unit='lakh', **overrides):
+    """
+    Generic parser for the SEBI disclosure format: one scheme per sheet, titled above its header
+
+    It is not tuned to any AMC. Register it for an AMC only after checking
+    it against that AMC's files, e.g. the unit of its market value column:
+    register_profile('DSP Mutual Fund', sebi_profile('lakh')). Unregistered
+    AMCs go through the generic file parser, which reads units from headers.
+    """
+    return LayoutProfile(SEBI_COLUMNS, value_unit=value_unit, **overrides)
@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""
+AMFI scheme master
+Downloads the AMFI scheme list through the HTTP cache, parses it line by
+line into a compact categorical table, keeps that between runs, and
+serves O(1) lookups of schemes by code, ISIN or name
+"""
+
+import os
+import re
+import csv
+import json
+from functools import cached_property
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+try:
+    import pyarrow
+    PARQUET_AVAILABLE = True
+except ImportError:
+    PARQUET_AVAILABLE = False
+
+from http_cache import HTTPCache, CacheMiss
+from normalization import normalize_isins
+from name_index import name_key
+from run_manifest import DEFAULT_STATE_DIR
+
+AMFI_MASTER_URL = "https://portal.amfiindia.com/DownloadSchemeData_Po.aspx?mf=0"
+DEFAULT_MAX_AGE_SECONDS = 24 * 3600
+CHUNK_ROWS = 5_000
+
+MASTER_COLUMNS = [
+    'scheme_code', 'amc', 'scheme_name', 'scheme_type', 'scheme_category', 'nav_name',
+    'isin', 'isin_reinvestment',
+]
+STRING_COLUMNS = MASTER_COLUMNS[1:]
+ISIN_COLUMNS = ['isin', 'isin_reinvestment']
+
+# AMFI header cell -> master column, checked in order (first match wins)
+_HEADER_PATTERNS = [
+    ('isin_reinvestment', r'isin.*reinvest'),
+    ('isin', r'isin'),
+    ('nav_name', r'nav\s*name'),
+    ('scheme_category', r'category'),
+    ('scheme_type', r'type'),
+    ('scheme_name', r'scheme\s*name'),
+    ('scheme_code', r'code'),
+    ('amc', r'^amc'),
+]
+
+def _map_header(header):
+    """Master column for each header cell (None for columns that are not kept)"""
+    mapping, taken = [], set()
+    for cell in header:
+        text = cell.strip().lower()
+        col = next((col for col, pattern in _HEADER_PATTERNS if re.search(pattern, text)), None)
+        if col in taken:
+            col = None
+        taken.add(col)
+        mapping.append(col)
+    return mapping
+
+def _empty_table():
+    table = pd.DataFrame({col: pd.Categorical([]) for col in STRING_COLUMNS})
+    table.index = pd.Index([], dtype='int64', name='scheme_code')
+    return table
+
+def _chunk_frame(rows, mapping):
+    """Turn a batch of split lines into a frame of codes plus categorical strings"""
+    columns = {}
+    for index, col in enumerate(mapping):
+        if col is None:
+            continue
+        values = pd.Series([row[index].strip() if index < len(row) else '' for row in rows], dtype=object)
+        if col == 'scheme_code':
+            columns[col] = pd.to_numeric(values, errors='coerce')
+        elif col in ISIN_COLUMNS:
+            columns[col] = pd.Categorical(normalize_isins(values))
+        else:
+            columns[col] = pd.Categorical(values.mask(values == ''))
+    chunk = pd.DataFrame(columns).reindex(columns=MASTER_COLUMNS)
+    return chunk[chunk['scheme_code'].notna()]
+
+def parse_master_lines(lines, chunk_rows=CHUNK_ROWS):
+    """
+    Parse the semicolon separated AMFI scheme master from an iterable of lines
+
+    Lines are consumed as they arrive and turned into categorical chunks
+    of chunk_rows rows, so the raw text is never held in memory. Lines
+    that do not have a field per header cell (section titles) are
+    skipped. Returns a table indexed by scheme code.
+    """
+    rows = csv.reader((line for line in lines if line.strip()), delimiter=';')
+    header = next(rows, None)
+    if header is None:
+        return _empty_table()
+    mapping = _map_header(header)
+    if 'scheme_code' not in mapping:
+        raise ValueError(f"AMFI scheme master has no scheme code column: {';'.join(header)}")
+
+    chunks, batch = [], []
+    for row in rows:
+        if len(row) < len(header):
+            continue
+        batch.append(row)
+        if len(batch) >= chunk_rows:
+            chunks.append(_chunk_frame(batch, mapping))
+            batch = []
+    if batch:
+        chunks.append(_chunk_frame(batch, mapping))
+    if not chunks:
+        return _empty_table()
+
+    table = pd.DataFrame({
+        col: union_categoricals(
+            [chunk[col].astype('category') for chunk in chunks], sort_categories=True, ignore_order=True
+        )
+        for col in STRING_COLUMNS
+    })
+    table.index = pd.Index(
+        np.concatenate([chunk['scheme_code'].to_numpy(dtype='int64') for chunk in chunks]), name='scheme_code'
+    )
+    return table[~table.index.duplicated()]
+
+class AMFIMaster:
+    """
+    Lookup service over the AMFI scheme master
+
+    table has one row per scheme code (one plan and option of a scheme)
+    with categorical string columns. ISINs (growth/payout and
+    reinvestment) and scheme names resolve through hash indexes built on
+    first use, so every lookup is O(1).
+    """
+
+    def __init__(self, table, fetched_at=None):
+        self.table = table
+        self.fetched_at = fetched_at
+
+    def __len__(self):
+        return len(self.table)
+
+    @property
+    def num_amcs(self):
+        return self.table['amc'].nunique()
+
+    @cached_property
+    def _isin_index(self):
+        index = {}
+        for col in reversed(ISIN_COLUMNS):
+            known = self.table[col].notna()
+            index.update(zip(self.table[col][known].astype(str), self.table.index[known]))
+        return index
+
+    @cached_property
+    def _name_index(self):
+        # Plan level names ("... - Direct Plan - Growth") also resolve to their scheme
+        pairs = self.table[['nav_name', 'scheme_name']].dropna().drop_duplicates()
+        index = {name_key(name): scheme for name, scheme in zip(pairs['nav_name'], pairs['scheme_name'])}
+        index.update((name_key(scheme), scheme) for scheme in self.table['scheme_name'].dropna().unique())
+        return index
+
+    def scheme(self, code):
+        """Row of a scheme code as a dict, or None"""
+        try:
+            row = self.table.loc[int(code)]
+        except (KeyError, ValueError, TypeError):
+            return None
+        return {'scheme_code': int(code), **{col: (None if pd.isna(value) else value) for col, value in row.items()}}
+
+    def lookup_isin(self, isin):
+        """Scheme row for a mutual fund unit ISIN, or None"""
+        code = self._isin_index.get(str(isin).strip().upper())
+        return None if code is None else self.scheme(code)
+
+    def is_known_isin(self, isin):
+        return str(isin).strip().upper() in self._isin_index
+
+    def resolve_scheme_name(self, name):
+        """AMFI's name for a scraped scheme name, or None if AMFI has no such scheme"""
+        return self._name_index.get(name_key(name))
+
+    def save(self, path, meta=None):
+        """
+        Store the table plus a JSON file of download metadata
+
+        The table is written as Parquet (dictionary encoded) when pyarrow
+        is installed, otherwise pickled.
+        """
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        if PARQUET_AVAILABLE:
+            self.table.to_parquet(tmp_path)
+        else:
+            self.table.to_pickle(tmp_path)
+        os.replace(tmp_path, path)
+        meta_path = os.path.splitext(path)[0] + '.json'
+        with open(f"{meta_path}.{os.getpid()}.tmp", 'w') as f:
+            json.dump({**(meta or {}), 'fetched_at': self.fetched_at, 'rows': len(self)}, f)
+        os.replace(f"{meta_path}.{os.getpid()}.tmp", meta_path)
+
+    @classmethod
+    def load(cls, path):
+        """Load a stored master, returning (master, metadata) or (None, {}) if there is none"""
+        meta_path = os.path.splitext(path)[0] + '.json'
+        try:
+            with open(meta_path, 'r') as f:
+                meta = json.load(f)
+            table = pd.read_parquet(path) if PARQUET_AVAILABLE else pd.read_pickle(path)
+        except (FileNotFoundError, ValueError, OSError):
+            return None, {}
+        for col in STRING_COLUMNS:
+            table[col] = table[col].astype('category')
+        return cls(table, meta.get('fetched_at')), meta
+
+def master_path(state_dir=DEFAULT_STATE_DIR):
+    """Where the parsed master is stored: Parquet with pyarrow, a pickle without"""
+    return os.path.join(state_dir, 'amfi_master.parquet' if PARQUET_AVAILABLE else 'amfi_master.pkl')
+
+def load_amfi_master(state_dir=DEFAULT_STATE_DIR, max_age=DEFAULT_MAX_AGE_SECONDS, offline=False,
+                     client=None, url=AMFI_MASTER_URL):
+    """
+    Return the AMFI scheme master, downloading it at most every max_age seconds
+
+    The download goes through an HTTPCache in state_dir with a TTL of
+    max_age, so a stale copy is revalidated with a conditional request.
+    The parsed table is kept in state_dir too and only re-parsed when the
+    downloaded list differs from the one it was parsed from. Offline the
+    stored copy is used whatever its age (an empty master if there is none).
+    """
+    path = master_path(state_dir)
+    master, meta = AMFIMaster.load(path)
+    cache = HTTPCache(os.path.join(state_dir, 'amfi_cache'), ttl=max_age, offline=offline, client=client)
+
+    try:
+        text = cache.get_text(url)
+    except CacheMiss:
+        return master if master is not None else AMFIMaster(_empty_table())
+    cached = cache.lookup(url)
+
+    if master is not None and meta.get('sha256') == cached['sha256']:
+        master.fetched_at = cached['fetched_at']
+        return master
+
+    fresh = AMFIMaster(parse_master_lines(text.splitlines()), cached['fetched_at'])
+    if len(fresh) == 0 and master is not None:
+        # An error page instead of the list, keep the stored copy
+        print("⚠️  AMFI returned no schemes, keeping the stored scheme master")
+        return master
+
+    fresh.save(path, {'url': url, 'sha256': cached['sha256']})
+    return fresh
@@ -4,16 +4,193 @@ Financial Market Analysis Templates
 Ready-to-use analysis scripts for mutual fund holdings data
 """
 
+import os
 import pandas as pd
 import numpy as np
 from datetime import datetime
+from functools import cached_property
 
-def load_data(filepath='mutual_fund_holdings_latest.csv'):
-    """Load mutual fund holdings data"""
-    df = pd.read_csv(filepath)
+try:
+    import scipy.sparse as sp
+    SCIPY_AVAILABLE = True
+except ImportError:
+    SCIPY_AVAILABLE = False
+
+from holdings_writer import LATEST_FILE, LATEST_PARQUET_FILE
+from holdings_history import HoldingsHistory, DEFAULT_HISTORY_DB
+from normalization import normalize_holdings, canonical_column, CATEGORICAL_COLUMNS
+from name_index import canonicalize_holdings, build_scheme_index, build_stock_index
+
+def load_data(filepath=None, columns=None, canonicalize=True):
+    """
+    Load mutual fund holdings data
+    
+    Reads Parquet files directly (falling back to CSV), with string columns
+    as categoricals and value columns as floats. CSV files, including ones
+    written by older versions, are passed through normalize_holdings.
+    columns limits loading to the columns an analysis needs. Without a
+    filepath the latest Parquet file is used if it exists, otherwise the
+    latest CSV. With canonicalize, every stock and scheme gets one spelling
+    (see name_index.canonicalize_holdings) so groupbys do not split them.
+    """
+    if filepath is None:
+        filepath = LATEST_PARQUET_FILE if os.path.exists(LATEST_PARQUET_FILE) else LATEST_FILE
+    
+    if filepath.endswith('.parquet'):
+        df = pd.read_parquet(filepath, columns=columns)
+    else:
+        # Older files may have raw column names and values like "1,234" or "5.2%"
+        usecols = None
+        if columns is not None:
+            header = pd.read_csv(filepath, nrows=0).columns
+            usecols = [col for col in header if canonical_column(col) in columns]
+        
+        df = normalize_holdings(pd.read_csv(filepath, usecols=usecols), label=filepath)
+        if columns is not None:
+            df = df[columns]
+    
+    if canonicalize:
+        df = canonicalize_holdings(df)
+    
+    # Sorted categories keep groupby output in the same order as plain strings
+    for col in df.columns.intersection(CATEGORICAL_COLUMNS):
+        df[col] = df[col].astype('category')
+        df[col] = df[col].cat.reorder_categories(sorted(df[col].cat.categories))
+    
     print(f"✅ Loaded {len(df)} holdings records")
     return df
 
+# ============================================
+# SHARED BASE AGGREGATES
+# ============================================
+
+class AnalysisContext:
+    """
+    Holdings plus memoized per-stock, per-scheme, per-AMC and per-sector aggregates
+    
+    Each aggregate is computed once, on first use, and shared by every
+    analysis run on the context, so a full report does one groupby per
+    grain instead of one per analysis. The DataFrame must not be modified
+    after the context is created.
+    """
+    
+    def __init__(self, df):
+        self.df = df
+    
+    @property
+    def columns(self):
+        return self.df.columns
+    
+    @cached_property
+    def stock_stats(self):
+        return self.df.groupby('stock_name', observed=True).agg(
+            num_schemes=('scheme_name', 'count'),
+            total_value=('market_value', 'sum'),
+            avg_weight=('weight_percent', 'mean'),
+            num_amcs=('amc', 'nunique'),
+        )
+    
+    @cached_property
+    def scheme_stats(self):
+        return self.df.groupby('scheme_name', observed=True).agg(
+            num_holdings=('stock_name', 'count'),
+            total_value=('market_value', 'sum'),
+            total_weight=('weight_percent', 'sum'),
+        )
+    
+    @cached_property
+    def amc_stats(self):
+        return self.df.groupby('amc', observed=True).agg(
+            num_schemes=('scheme_name', 'nunique'),
+            num_stocks=('stock_name', 'nunique'),
+            total_value=('market_value', 'sum'),
+            avg_weight=('weight_percent', 'mean'),
+        )
+    
+    @cached_property
+    def sector_stats(self):
+        if 'sector' not in self.df.columns or self.df['sector'].isna().all():
+            return None
+        return self.df.groupby('sector', observed=True).agg(
+            total_value=('market_value', 'sum'),
+            num_stocks=('stock_name', 'nunique'),
+            num_holdings=('scheme_name', 'count'),
+            avg_weight=('weight_percent', 'mean'),
+        )
+    
+    @cached_property
+    def monthly_stock_stats(self):
+        months = holding_months(self.df)
+        return self.df.groupby([months, self.df['stock_name']], observed=True).agg(
+            num_schemes=('scheme_name', 'count'),
+            total_value=('market_value', 'sum'),
+        )
+    
+    @cached_property
+    def scheme_metrics(self):
+        if not has_scheme_weights(self):
+            return None
+        # Weights only add up within one disclosure, so a history is scored on its latest month
+        months = holding_months(self.df)
+        if months.nunique() <= 1:
+            return compute_scheme_metrics(self.df)
+        return compute_scheme_metrics(self.df[(months == months.max()).to_numpy()])
+    
+    @cached_property
+    def stock_amcs(self):
+        return join_samples(self.df['stock_name'], self.df['amc'], unique=True)
+    
+    def holdings_above(self, min_weight):
+        """Holdings weighing more than min_weight percent of their scheme, in file order"""
+        return self.df[self.df['weight_percent'] > min_weight]
+    
+    @cached_property
+    def scheme_index(self):
+        return build_scheme_index(self.df)
+    
+    @cached_property
+    def stock_index(self):
+        return build_stock_index(self.df)
+    
+    @cached_property
+    def summary(self):
+        return {
+            'amcs': len(self.amc_stats),
+            'schemes': len(self.scheme_stats),
+            'stocks': len(self.stock_stats),
+            'records': len(self.df),
+            'total_value': self.df['market_value'].sum(),
+        }
+
+def get_context(data):
+    """Return data if it already is an AnalysisContext, otherwise wrap the DataFrame in one"""
+    return data if isinstance(data, AnalysisContext) else AnalysisContext(data)
+
+def _months_of_dates(dates):
+    """'YYYY-MM' month of every date, parsing each distinct date once rather than every row"""
+    dates = dates.astype('category')
+    month_of_date = pd.to_datetime(pd.Series(dates.cat.categories), errors='coerce').dt.strftime('%Y-%m')
+    return np.append(month_of_date.to_numpy(dtype=object), None)[dates.cat.codes.to_numpy()]
+
+def holding_months(df):
+    """
+    'YYYY-MM' month of every holding, from a month column or else the
+    portfolio_date (the disclosure's "as on" date), falling back to the
+    scraped_date where the source gave none
+    Holdings without any of these columns have no month (None)
+    """
+    if 'month' in df.columns:
+        return df['month'].astype(object).rename('month')
+    months = pd.Series(None, index=df.index, name='month', dtype=object)
+    for col in ['portfolio_date', 'scraped_date']:
+        if col in df.columns:
+            months = months.fillna(pd.Series(_months_of_dates(df[col]), index=df.index, dtype=object))
+    return months
+
+def security_key(df):
+    """ISIN of every holding, falling back to the stock name where the ISIN is missing"""
+    return df['isin'].astype(object).where(df['isin'].notna(), df['stock_name'].astype(object))
+
 # ============================================
 # 1. MOST HELD STOCKS ANALYSIS
 # ============================================
@@ -27,16 +204,9 @@ def analyze_most_held_stocks(df, top_n=20):
     print("📊 TOP MOST HELD STOCKS")
     print("="*60)
     
-    analysis = df.groupby('stock_name').agg({
-        'scheme_name': 'count',
-        'market_value': 'sum',
-        'weight_percent': 'mean',
-        'amc': 'nunique'
-    }).rename(columns={
-        'scheme_name': 'num_schemes',
-        'market_value': 'total_value_cr',
-        'weight_percent': 'avg_weight_pct',
-        'amc': 'num_amcs'
+    analysis = get_context(df).stock_stats[['num_schemes', 'total_value', 'avg_weight', 'num_amcs']].rename(columns={
+        'total_value': 'total_value_cr',
+        'avg_weight': 'avg_weight_pct'
     })
     
     # Convert to crores
@@ -54,6 +224,36 @@ def analyze_most_held_stocks(df, top_n=20):
 # 2. CONCENTRATED BETS ANALYSIS
 # ============================================
 
+def join_samples(keys, values, limit=None, unique=False):
+    """
+    Join each key's values into one 'a, b, c' string, in order of appearance
+    
+    Matches groupby(keys)[values].agg(lambda x: ', '.join(x.head(limit)))
+    (x.unique() instead of x when unique is set) without a Python call per
+    group: values are ranked within their key with cumcount and the
+    strings are concatenated one rank at a time over all keys together.
+    Missing keys and values are skipped.
+    """
+    frame = pd.DataFrame({'key': keys, 'value': values}).dropna()
+    if unique:
+        frame = frame.drop_duplicates()
+    
+    rank = frame.groupby('key', observed=True).cumcount().to_numpy()
+    if limit is not None:
+        frame, rank = frame[rank < limit], rank[rank < limit]
+    
+    key_codes, key_index = pd.factorize(frame['key'], sort=True)
+    value_codes, value_labels = pd.factorize(frame['value'])
+    labels = np.asarray(value_labels, dtype=object)
+    
+    joined = np.empty(len(key_index), dtype=object)
+    for position in range(rank.max() + 1 if len(rank) else 0):
+        at = rank == position
+        text = labels[value_codes[at]]
+        joined[key_codes[at]] = text if position == 0 else joined[key_codes[at]] + ', ' + text
+    
+    return pd.Series(joined, index=pd.Index(key_index, name=getattr(keys, 'name', None)))
+
 def analyze_concentrated_bets(df, min_weight=5.0):
     """
     Find high-conviction bets (stocks with >5% portfolio weight)
@@ -63,15 +263,17 @@ def analyze_concentrated_bets(df, min_weight=5.0):
     print("🎯 HIGH CONVICTION BETS (Weight > {}%)".format(min_weight))
     print("="*60)
     
-    concentrated = df[df['weight_percent'] > min_weight].copy()
+    concentrated = get_context(df).holdings_above(min_weight)
     
-    analysis = concentrated.groupby('stock_name').agg({
-        'scheme_name': lambda x: ', '.join(x.head(5)),
-        'weight_percent': ['count', 'mean', 'max'],
-        'amc': lambda x: ', '.join(x.unique()[:3])
-    })
+    stats = concentrated.groupby('stock_name', observed=True)['weight_percent'].agg(['count', 'mean', 'max'])
+    analysis = pd.DataFrame({
+        'schemes_sample': join_samples(concentrated['stock_name'], concentrated['scheme_name'], limit=5),
+        'num_high_weight': stats['count'],
+        'avg_weight': stats['mean'],
+        'max_weight': stats['max'],
+        'amcs_sample': join_samples(concentrated['stock_name'], concentrated['amc'], limit=3, unique=True),
+    }, index=stats.index)
     
-    analysis.columns = ['schemes_sample', 'num_high_weight', 'avg_weight', 'max_weight', 'amcs_sample']
     analysis = analysis.sort_values('num_high_weight', ascending=False).head(20)
     
     print(f"\nStocks with high portfolio weights (>{min_weight}%):\n")
@@ -92,21 +294,12 @@ def analyze_sector_allocation(df):
     print("🏭 SECTOR ALLOCATION ANALYSIS")
     print("="*60)
     
-    if 'sector' not in df.columns:
+    sector_analysis = get_context(df).sector_stats
+    if sector_analysis is None:
         print("⚠️  Sector information not available in data")
         return None
     
-    sector_analysis = df.groupby('sector').agg({
-        'market_value': 'sum',
-        'stock_name': 'nunique',
-        'scheme_name': 'count',
-        'weight_percent': 'mean'
-    }).rename(columns={
-        'market_value': 'total_value_cr',
-        'stock_name': 'num_stocks',
-        'scheme_name': 'num_holdings',
-        'weight_percent': 'avg_weight'
-    })
+    sector_analysis = sector_analysis.rename(columns={'total_value': 'total_value_cr'})
     
     # Convert to crores
     sector_analysis['total_value_cr'] = sector_analysis['total_value_cr'] / 10000000
@@ -136,25 +329,28 @@ def analyze_amc_strategies(df):
     print("🏢 AMC STRATEGY COMPARISON")
     print("="*60)
     
-    amc_analysis = df.groupby('amc').agg({
-        'scheme_name': 'nunique',
-        'stock_name': 'nunique',
-        'market_value': 'sum',
-        'weight_percent': 'mean'
-    }).rename(columns={
-        'scheme_name': 'num_schemes',
-        'stock_name': 'num_unique_stocks',
-        'market_value': 'total_aum_cr',
-        'weight_percent': 'avg_stock_weight'
+    context = get_context(df)
+    amc_analysis = context.amc_stats.rename(columns={
+        'num_stocks': 'num_unique_stocks',
+        'total_value': 'total_aum_cr',
+        'avg_weight': 'avg_stock_weight'
     })
     
     # Convert to crores
     amc_analysis['total_aum_cr'] = amc_analysis['total_aum_cr'] / 10000000
     
-    # Calculate average stocks per scheme
-    amc_analysis['avg_stocks_per_scheme'] = (
-        amc_analysis['num_unique_stocks'] / amc_analysis['num_schemes']
-    )
+    # Per-scheme figures averaged over each AMC's schemes, when the data has weights per holding
+    metrics = context.scheme_metrics
+    if metrics is not None:
+        amc_analysis = amc_analysis.join(metrics.groupby('amc', observed=True).agg(
+            avg_stocks_per_scheme=('num_holdings', 'mean'),
+            avg_top10_weight=('top10_weight', 'mean'),
+            avg_active_share=('active_share', 'mean'),
+        ))
+    else:
+        amc_analysis['avg_stocks_per_scheme'] = (
+            amc_analysis['num_unique_stocks'] / amc_analysis['num_schemes']
+        )
     
     amc_analysis = amc_analysis.sort_values('total_aum_cr', ascending=False)
     
@@ -171,14 +367,21 @@ def analyze_portfolio_overlap(df, scheme1, scheme2):
     """
     Calculate overlap between two schemes
     Helps avoid redundant investments
+    Scheme names may be partial or spelled differently, they are resolved
+    to the closest scheme in the data
     """
     print("\n" + "="*60)
     print(f"🔄 PORTFOLIO OVERLAP ANALYSIS")
     print("="*60)
     
-    # Get holdings for each scheme
-    holdings1 = set(df[df['scheme_name'].str.contains(scheme1, case=False, na=False)]['stock_name'])
-    holdings2 = set(df[df['scheme_name'].str.contains(scheme2, case=False, na=False)]['stock_name'])
+    context = get_context(df)
+    df = context.df
+    
+    # Resolve the names once, then select by equality instead of scanning every name
+    scheme1 = context.scheme_index.lookup(scheme1) or scheme1
+    scheme2 = context.scheme_index.lookup(scheme2) or scheme2
+    holdings1 = set(df.loc[df['scheme_name'] == scheme1, 'stock_name'].dropna())
+    holdings2 = set(df.loc[df['scheme_name'] == scheme2, 'stock_name'].dropna())
     
     if not holdings1 or not holdings2:
         print(f"⚠️  One or both schemes not found")
@@ -223,17 +426,12 @@ def find_hidden_gems(df, max_holders=5, min_value=100):
     print(f"💎 HIDDEN GEMS (Held by ≤{max_holders} schemes)")
     print("="*60)
     
-    stock_counts = df.groupby('stock_name').agg({
-        'scheme_name': 'count',
-        'market_value': 'sum',
-        'weight_percent': 'mean',
-        'amc': lambda x: ', '.join(x.unique())
-    }).rename(columns={
-        'scheme_name': 'num_holders',
-        'market_value': 'total_value_cr',
-        'weight_percent': 'avg_weight',
-        'amc': 'held_by_amcs'
+    context = get_context(df)
+    stock_counts = context.stock_stats[['num_schemes', 'total_value', 'avg_weight']].rename(columns={
+        'num_schemes': 'num_holders',
+        'total_value': 'total_value_cr'
     })
+    stock_counts['held_by_amcs'] = context.stock_amcs
     
     # Convert to crores
     stock_counts['total_value_cr'] = stock_counts['total_value_cr'] / 10000000
@@ -263,15 +461,13 @@ def analyze_mom_changes(df_current, df_previous):
     print("="*60)
     
     # Aggregate by stock
-    current = df_current.groupby('stock_name').agg({
-        'scheme_name': 'count',
-        'market_value': 'sum'
-    }).rename(columns={'scheme_name': 'holders_current', 'market_value': 'value_current'})
+    current = get_context(df_current).stock_stats[['num_schemes', 'total_value']].rename(
+        columns={'num_schemes': 'holders_current', 'total_value': 'value_current'}
+    )
     
-    previous = df_previous.groupby('stock_name').agg({
-        'scheme_name': 'count',
-        'market_value': 'sum'
-    }).rename(columns={'scheme_name': 'holders_previous', 'market_value': 'value_previous'})
+    previous = get_context(df_previous).stock_stats[['num_schemes', 'total_value']].rename(
+        columns={'num_schemes': 'holders_previous', 'total_value': 'value_previous'}
+    )
     
     # Merge
     comparison = current.join(previous, how='outer').fillna(0)
@@ -297,17 +493,575 @@ def analyze_mom_changes(df_current, df_previous):
     return comparison
 
 # ============================================
-# 8. COMPREHENSIVE REPORT GENERATOR
+# 8. HISTORICAL TRENDS
 # ============================================
 
-def generate_monthly_report(df, output_file='monthly_analysis_report.txt'):
+def analyze_stock_history(isin, last_months=24, db_path=DEFAULT_HISTORY_DB):
     """
-    Generate comprehensive monthly analysis report
+    Track one stock (by ISIN) across the stored monthly history
+    Shows how many schemes held it and how much, month by month
     """
     print("\n" + "="*60)
-    print("📄 GENERATING COMPREHENSIVE REPORT")
+    print(f"🕰️  STOCK HISTORY: {isin}")
+    print("="*60)
+    
+    history = HoldingsHistory(db_path).isin_history(isin, last_months=last_months)
+    if history.empty:
+        print(f"⚠️  {isin} not found in {db_path}")
+        return None
+    
+    trend = history.groupby('month').agg({
+        'scheme_name': 'count',
+        'amc': 'nunique',
+        'quantity': 'sum',
+        'market_value': 'sum',
+        'weight_percent': 'mean'
+    }).rename(columns={
+        'scheme_name': 'num_schemes',
+        'amc': 'num_amcs',
+        'quantity': 'total_quantity',
+        'market_value': 'total_value_cr',
+        'weight_percent': 'avg_weight_pct'
+    })
+    
+    # Convert to crores
+    trend['total_value_cr'] = trend['total_value_cr'] / 10000000
+    
+    print(f"\n{history['stock_name'].dropna().iloc[-1] if history['stock_name'].notna().any() else isin}"
+          f" over the last {len(trend)} months:\n")
+    print(trend.to_string())
+    
+    return trend
+
+def analyze_scheme_history(scheme_name, last_months=12, db_path=DEFAULT_HISTORY_DB):
+    """
+    Show how one scheme's portfolio weights moved over time
+    One row per stock, one column per month
+    """
+    print("\n" + "="*60)
+    print(f"🕰️  SCHEME HISTORY: {scheme_name}")
+    print("="*60)
+    
+    history = HoldingsHistory(db_path).scheme_history(scheme_name, last_months=last_months)
+    if history.empty:
+        print(f"⚠️  {scheme_name} not found in {db_path}")
+        return None
+    
+    weights = history.pivot_table(
+        index='stock_name', columns='month', values='weight_percent', aggfunc='sum'
+    )
+    weights = weights.sort_values(weights.columns[-1], ascending=False)
+    
+    print(f"\nPortfolio weights (%) by month:\n")
+    print(weights.head(30).to_string())
+    
+    return weights
+
+def analyze_most_held_over_time(df, top_n=20):
+    """
+    Number of schemes holding each of the most held stocks, month by month
+    Works on several months of holdings, e.g. HoldingsHistory.recent()
+    or an out_of_core.OutOfCoreContext over a history file
+    """
+    print("\n" + "="*60)
+    print("🕰️  MOST HELD STOCKS OVER TIME")
+    print("="*60)
+    
+    holders = get_context(df).monthly_stock_stats['num_schemes'].unstack('month', fill_value=0)
+    if holders.empty:
+        print("⚠️  No dated holdings in data")
+        return None
+    
+    trend = holders.sort_values(holders.columns[-1], ascending=False).head(top_n)
+    
+    print(f"\nSchemes holding the top {top_n} stocks of {holders.columns[-1]}:\n")
+    print(trend.to_string())
+    
+    return trend
+
+# ============================================
+# 9. ALL-PAIRS PORTFOLIO OVERLAP
+# ============================================
+
+# Upper bound on co-holding pairs expanded at once for weighted overlap
+OVERLAP_PAIR_BATCH = 5_000_000
+
+def build_holdings_matrix(df, weighted=False):
+    """
+    Build a sparse scheme x security matrix
+    Securities are keyed by ISIN, falling back to stock name without one.
+    Entries are 1 for held securities, or the summed weight_percent.
+    """
+    if not SCIPY_AVAILABLE:
+        raise ImportError("The overlap engine needs scipy: pip install scipy")
+    
+    security = security_key(df)
+    valid = df['scheme_name'].notna().to_numpy() & security.notna().to_numpy()
+    
+    scheme_codes, schemes = pd.factorize(df['scheme_name'][valid], sort=True)
+    security_codes, securities = pd.factorize(security[valid])
+    
+    if weighted:
+        data = df['weight_percent'][valid].fillna(0).to_numpy(dtype='float64')
+    else:
+        data = np.ones(len(scheme_codes))
+    
+    # Duplicate rows for the same scheme and security are summed
+    matrix = sp.csr_matrix(
+        (data, (scheme_codes, security_codes)), shape=(len(schemes), len(securities))
+    )
+    if not weighted:
+        matrix.data[:] = 1.0
+    
+    return matrix, pd.Index(schemes, name='scheme_name'), pd.Index(securities)
+
+def _weighted_overlap(weights):
+    """
+    Sum of min(weight_i, weight_j) over shared securities for every scheme pair
+
+    A min is not a matrix product, so every column (security) is expanded into
+    the co-holding pairs of its schemes, the same pairs a sparse product would
+    visit, and accumulated into a sparse matrix in bounded batches. Only the
+    upper triangle is expanded; the result is mirrored at the end.
+    """
+    csc = weights.tocsc()
+    csc.sort_indices()
+    lengths = np.diff(csc.indptr)
+    pairs_per_column = lengths.astype(np.int64) * (lengths + 1) // 2
+    
+    # Position of every entry inside its column, each pairs with itself and those after it
+    positions = np.arange(csc.nnz) - np.repeat(csc.indptr[:-1], lengths)
+    pairs_per_entry = np.repeat(lengths, lengths) - positions
+    
+    upper = sp.csr_matrix((weights.shape[0], weights.shape[0]))
+    column = 0
+    while column < len(lengths):
+        # Take as many columns as fit in one batch (at least one)
+        batch_end = column + max(1, np.searchsorted(
+            np.cumsum(pairs_per_column[column:]), OVERLAP_PAIR_BATCH, side='right'
+        ))
+        first, last = csc.indptr[column], csc.indptr[batch_end]
+        
+        counts = pairs_per_entry[first:last]
+        left = np.repeat(np.arange(first, last), counts)
+        right = left + np.arange(len(left)) - np.repeat(np.cumsum(counts) - counts, counts)
+        
+        values = np.minimum(csc.data[left], csc.data[right])
+        upper = upper + sp.csr_matrix(
+            (values, (csc.indices[left], csc.indices[right])), shape=upper.shape
+        )
+        column = batch_end
+    
+    return upper + upper.T - sp.diags(upper.diagonal())
+
+def compute_overlap_matrix(df, weighted=False):
+    """
+    Compute the overlap between every pair of schemes in one pass
+    
+    Count mode: entry (i, j) is the number of securities schemes i and j
+    both hold, from a single sparse product B @ B.T. Weighted mode: entry
+    (i, j) is the sum of min weights (%) over their shared securities.
+    Returns (sparse matrix, scheme index); the diagonal holds each scheme's
+    own number of holdings or total weight.
+    """
+    matrix, schemes, _ = build_holdings_matrix(df, weighted=weighted)
+    if weighted:
+        overlap = _weighted_overlap(matrix)
+    else:
+        overlap = matrix @ matrix.T
+    return overlap.tocsr(), schemes
+
+def find_similar_schemes(df, top_k=5, weighted=False, min_common=1):
+    """
+    Find the most similar schemes for every scheme
+    Screens all scheme pairs at once instead of comparing two at a time
+    """
+    print("\n" + "="*60)
+    print(f"🔗 MOST SIMILAR SCHEMES (top {top_k}, {'weighted' if weighted else 'count'} overlap)")
+    print("="*60)
+    
+    overlap, schemes = compute_overlap_matrix(get_context(df).df, weighted=weighted)
+    own = overlap.diagonal()
+    
+    pairs = overlap.tocoo()
+    keep = pairs.row != pairs.col
+    if not weighted:
+        keep &= pairs.data >= min_common
+    rows, cols, values = pairs.row[keep], pairs.col[keep], pairs.data[keep]
+    
+    similar = pd.DataFrame({
+        'scheme_name': schemes[rows],
+        'similar_scheme': schemes[cols],
+        'overlap': values,
+    })
+    if weighted:
+        # Sum of min weights is already a percentage of the portfolio
+        similar['overlap_pct'] = similar['overlap']
+    else:
+        # Same definition as analyze_portfolio_overlap: common / holdings of the first scheme
+        similar['overlap_pct'] = values / own[rows] * 100
+    
+    similar = similar.sort_values(['scheme_name', 'overlap_pct', 'similar_scheme'], ascending=[True, False, True])
+    similar = similar.groupby('scheme_name', sort=False).head(top_k).reset_index(drop=True)
+    
+    print(f"\nMost overlapping pairs across {len(schemes)} schemes:\n")
+    print(similar.sort_values('overlap_pct', ascending=False).head(20).to_string(index=False))
+    
+    return similar
+
+# ============================================
+# 10. MULTI-MONTH HOLDING FLOWS
+# ============================================
+
+FLOW_COLUMNS = [
+    'month', 'previous_month', 'amc', 'scheme_name', 'isin', 'stock_name', 'flow',
+    'quantity_previous', 'quantity', 'quantity_change',
+    'value_previous', 'market_value', 'value_change',
+    'weight_previous', 'weight_percent', 'weight_change',
+]
+
+def _codes(values, sort=True):
+    """Factorize values into integer codes and their labels, missing values coded -1"""
+    codes, labels = pd.factorize(values, sort=sort)
+    return codes.astype(np.int64), np.asarray(labels, dtype=object)
+
+def compute_holding_flows(snapshots):
+    """
+    Per-scheme position changes between every pair of consecutive months
+    
+    snapshots holds several months of holdings, with a 'month' column
+    (as returned by HoldingsHistory.recent) or dates (see holding_months). Positions
+    are keyed on ISIN (stock name without one) and all consecutive months
+    are matched in one sorted merge over integer position keys. Returns a
+    long table, one row per scheme, security and month, with flow set to
+    entry, exit, increase, decrease or unchanged (by quantity). Schemes
+    missing from either month of a pair are left out of that pair, so a
+    failed scrape does not show up as the scheme selling everything.
+    """
+    period, months = _codes(holding_months(snapshots))
+    
+    scheme, schemes = _codes(snapshots['scheme_name'])
+    amc, amcs = _codes(snapshots['amc'])
+    stock, stocks = _codes(snapshots['stock_name'])
+    
+    # Securities are ISINs, then stock names for holdings without one
+    isin, isins = _codes(snapshots['isin'])
+    security = np.where(isin >= 0, isin, np.where(stock >= 0, len(isins) + stock, -1))
+    securities = np.concatenate([isins, stocks])
+    
+    valid = (period >= 0) & (scheme >= 0) & (security >= 0)
+    num_schemes, num_securities = len(schemes), len(securities)
+    stride = num_schemes * num_securities
+    key = (period[valid] * num_schemes + scheme[valid]) * num_securities + security[valid]
+    
+    # One row per month, scheme and security (a stable sort keeps each one's first row first)
+    order = np.argsort(key, kind='stable')
+    starts = np.flatnonzero(np.diff(key[order], prepend=-1))
+    keys, first = key[order][starts], order[starts]
+    position = np.empty(len(key), dtype=np.int64)
+    position[order] = np.cumsum(np.diff(key[order], prepend=-1) != 0) - 1
+    def total(col):
+        values = snapshots[col].to_numpy(dtype='float64', na_value=np.nan)[valid]
+        return np.bincount(position, weights=np.nan_to_num(values), minlength=len(keys))
+    totals = {col: total(col) for col in ['quantity', 'market_value', 'weight_percent']}
+    position_amc = amc[valid][first]
+    position_stock = stock[valid][first]
+    
+    # Line every position up with the same scheme and security one month later
+    all_keys = np.sort(np.concatenate([keys, keys + stride]))
+    all_keys = all_keys[np.diff(all_keys, prepend=-1) != 0]
+    all_keys = all_keys[all_keys // stride < len(months)]
+    current = np.searchsorted(keys, all_keys)
+    has_current = (current < len(keys)) & (keys[np.minimum(current, len(keys) - 1)] == all_keys)
+    previous = np.searchsorted(keys, all_keys - stride)
+    has_previous = (previous < len(keys)) & (keys[np.minimum(previous, len(keys) - 1)] == all_keys - stride)
+    
+    # Only compare schemes that were scraped in both months
+    periods = all_keys // stride
+    scheme_of = (all_keys // num_securities) % num_schemes
+    present = np.zeros((len(months), num_schemes), dtype=bool)
+    present[keys // stride, (keys // num_securities) % num_schemes] = True
+    keep = (periods >= 1) & present[periods, scheme_of] & present[periods - 1, scheme_of]
+    
+    all_keys, periods, scheme_of = all_keys[keep], periods[keep], scheme_of[keep]
+    current, has_current = current[keep], has_current[keep]
+    previous, has_previous = previous[keep], has_previous[keep]
+    
+    def pick(values, index, found, fill):
+        return np.where(found, values[np.minimum(index, len(values) - 1)], fill)
+    
+    now = {col: pick(values, current, has_current, 0.0) for col, values in totals.items()}
+    before = {col: pick(values, previous, has_previous, 0.0) for col, values in totals.items()}
+    amc_code = np.where(has_current, pick(position_amc, current, has_current, -1), pick(position_amc, previous, has_previous, -1))
+    stock_code = np.where(has_current, pick(position_stock, current, has_current, -1), pick(position_stock, previous, has_previous, -1))
+    
+    quantity_change = now['quantity'] - before['quantity']
+    flow = np.select(
+        [~has_previous, ~has_current, quantity_change > 0, quantity_change < 0],
+        ['entry', 'exit', 'increase', 'decrease'], default='unchanged'
+    )
+    
+    # String columns are returned as categoricals over the codes, sorted like load_data
+    def label(codes, labels):
+        column = pd.Categorical.from_codes(codes, labels)
+        return column.reorder_categories(sorted(column.categories))
+    
+    return pd.DataFrame({
+        'month': label(periods, months),
+        'previous_month': label(periods - 1, months),
+        'amc': label(amc_code, amcs),
+        'scheme_name': label(scheme_of, schemes),
+        'isin': label(all_keys % num_securities, securities),
+        'stock_name': label(stock_code, stocks),
+        'flow': pd.Categorical(flow),
+        'quantity_previous': before['quantity'],
+        'quantity': now['quantity'],
+        'quantity_change': quantity_change,
+        'value_previous': before['market_value'],
+        'market_value': now['market_value'],
+        'value_change': now['market_value'] - before['market_value'],
+        'weight_previous': before['weight_percent'],
+        'weight_percent': now['weight_percent'],
+        'weight_change': now['weight_percent'] - before['weight_percent'],
+    }, columns=FLOW_COLUMNS)
+
+def summarize_stock_flows(flows):
+    """
+    Roll per-scheme flows up to one row per stock (ISIN) and month
+    Counts schemes entering, exiting, adding and trimming, with net changes
+    """
+    stock_flows = flows.assign(
+        holders=flows['flow'] != 'exit',
+        entries=flows['flow'] == 'entry',
+        exits=flows['flow'] == 'exit',
+        increases=flows['flow'] == 'increase',
+        decreases=flows['flow'] == 'decrease',
+    ).groupby(['month', 'isin'], observed=True).agg(
+        stock_name=('stock_name', 'last'),
+        holders=('holders', 'sum'),
+        entries=('entries', 'sum'),
+        exits=('exits', 'sum'),
+        increases=('increases', 'sum'),
+        decreases=('decreases', 'sum'),
+        quantity_change=('quantity_change', 'sum'),
+        value_change=('value_change', 'sum'),
+    )
+    stock_flows['net_schemes'] = stock_flows['entries'] - stock_flows['exits']
+    return stock_flows.reset_index()
+
+def screen_net_buying(flows=None, last_months=6, top_n=20, db_path=DEFAULT_HISTORY_DB):
+    """
+    Find stocks the industry kept buying over the last N months
+    Ranks stocks by the number of months with net buying (quantity added
+    across all schemes), then by net schemes gained
+    """
+    print("\n" + "="*60)
+    print(f"🛒 NET BUYING OVER {last_months} MONTHS")
+    print("="*60)
+    
+    if flows is None:
+        # N monthly changes need N + 1 snapshots
+        snapshots = HoldingsHistory(db_path).recent(last_months + 1, columns=[
+            'amc', 'scheme_name', 'stock_name', 'isin', 'quantity', 'market_value', 'weight_percent'
+        ])
+        flows = compute_holding_flows(snapshots)
+    
+    if flows.empty:
+        print("⚠️  Need at least two months of history")
+        return None
+    
+    stock_flows = summarize_stock_flows(flows)
+    recent_months = sorted(stock_flows['month'].unique())[-last_months:]
+    stock_flows = stock_flows[stock_flows['month'].isin(recent_months)].assign(
+        net_buying=lambda x: x['quantity_change'] > 0,
+        holders_now=lambda x: x['holders'].where(x['month'] == recent_months[-1], 0),
+    )
+    
+    screen = stock_flows.groupby('isin', observed=True).agg(
+        stock_name=('stock_name', 'last'),
+        months_net_buying=('net_buying', 'sum'),
+        net_schemes=('net_schemes', 'sum'),
+        quantity_change=('quantity_change', 'sum'),
+        value_change_cr=('value_change', 'sum'),
+        holders_now=('holders_now', 'sum'),
+    )
+    screen['value_change_cr'] = screen['value_change_cr'] / 10000000
+    screen = screen[screen['quantity_change'] > 0].sort_values(
+        ['months_net_buying', 'net_schemes', 'quantity_change'], ascending=False
+    )
+    
+    print(f"\nStocks with net buying in {recent_months[0]} → {recent_months[-1]}:\n")
+    print(screen.head(top_n).to_string())
+    
+    return screen
+
+# ============================================
+# 11. SCHEME METRICS
+# ============================================
+
+# Disclosed equity weights of a complete portfolio add up to about 100%, less cash
+WEIGHT_SUM_RANGE = (80.0, 101.0)
+# Columns the scheme metrics need (securities are keyed by ISIN when there is one)
+SCHEME_METRIC_COLUMNS = ['amc', 'scheme_name', 'stock_name', 'weight_percent']
+
+def _segment_starts(sorted_codes):
+    """Offset where every run of equal values starts in a sorted array"""
+    return np.flatnonzero(np.r_[True, sorted_codes[1:] != sorted_codes[:-1]])
+
+def _security_codes(df):
+    """Integer codes and labels of security_key(df), built from the ISIN and stock name codes"""
+    isin_codes, isins = _codes(df['isin'], sort=False) if 'isin' in df.columns else (np.full(len(df), -1), np.array([], dtype=object))
+    name_codes, names = _codes(df['stock_name'], sort=False)
+    codes = np.where(isin_codes >= 0, isin_codes, np.where(name_codes >= 0, name_codes + len(isins), -1))
+    return codes, np.concatenate([isins, names])
+
+def has_scheme_weights(context):
+    """Whether the data has the columns and weights the scheme metrics need"""
+    if not set(SCHEME_METRIC_COLUMNS) <= set(context.columns):
+        return False
+    return context.amc_stats['avg_weight'].notna().any()
+
+def compute_scheme_metrics(df, benchmark=None, categories=None, top_n=10, weight_range=WEIGHT_SUM_RANGE):
+    """
+    Score every scheme's portfolio in one vectorized pass
+    
+    Per scheme: number of holdings, sum of weights (and whether it lies
+    in weight_range), weight of the top_n holdings, Herfindahl index
+    (0-10,000, of the weights rescaled to 100%) with the effective number
+    of holdings it implies, and active share in percent. Active share is
+    measured against benchmark (weights by ISIN, e.g. an index) when
+    given, otherwise against the average portfolio of the scheme's
+    category; categories maps scheme names to categories, without it all
+    schemes form one category. Securities are keyed by ISIN, falling back
+    to stock name, and repeated rows of a security are added up first.
+    """
+    df = get_context(df).df
+    top_column = f'top{top_n}_weight'
+    scheme_codes, schemes = _codes(df['scheme_name'])
+    security_codes, securities = _security_codes(df)
+    valid = (scheme_codes >= 0) & (security_codes >= 0)
+    if not valid.any():
+        return pd.DataFrame(columns=[
+            'amc', 'num_holdings', 'weight_sum', 'weight_sum_ok', top_column, 'hhi', 'effective_holdings', 'active_share'
+        ], index=pd.Index([], name='scheme_name'))
+    
+    scheme_codes, security_codes = scheme_codes[valid], security_codes[valid]
+    amc_codes, amcs = _codes(df['amc'])
+    amc_codes = amc_codes[valid]
+    weights = np.nan_to_num(df['weight_percent'].to_numpy(dtype='float64')[valid])
+    
+    # One position per scheme and security, sorted by scheme
+    num_securities = len(securities)
+    keys = scheme_codes * num_securities + security_codes
+    order = np.argsort(keys)
+    keys = keys[order]
+    starts = _segment_starts(keys)
+    position_weight = np.add.reduceat(weights[order], starts)
+    position_scheme = keys[starts] // num_securities
+    position_security = keys[starts] % num_securities
+    position_amc = amc_codes[order][starts]
+    
+    scheme_starts = _segment_starts(position_scheme)
+    num_holdings = np.diff(np.r_[scheme_starts, len(position_scheme)])
+    weight_sum = np.add.reduceat(position_weight, scheme_starts)
+    
+    # Largest positions first within each scheme, the scheme boundaries stay the same
+    weight_rank = np.empty(len(position_weight), dtype=np.int64)
+    weight_rank[np.argsort(-position_weight)] = np.arange(len(position_weight))
+    ranked = np.argsort(position_scheme * len(position_weight) + weight_rank)
+    rank = np.arange(len(ranked)) - np.repeat(scheme_starts, num_holdings)
+    top = ranked[rank < top_n]
+    top_weight = np.bincount(position_scheme[top], weights=position_weight[top], minlength=len(schemes))
+    
+    has_weight = weight_sum > 0
+    share = np.divide(
+        position_weight, weight_sum[position_scheme],
+        out=np.zeros_like(position_weight), where=has_weight[position_scheme]
+    )
+    hhi = np.add.reduceat(share ** 2, scheme_starts) * 10000
+    
+    if benchmark is not None:
+        benchmark = pd.Series(benchmark, dtype='float64').groupby(level=0).sum()
+        benchmark_share = (benchmark / benchmark.sum()).reindex(securities).fillna(0).to_numpy()
+        position_benchmark = benchmark_share[position_security]
+    else:
+        if categories is None:
+            scheme_group = np.zeros(len(schemes), dtype=np.int64)
+        else:
+            scheme_group, _ = _codes(pd.Series(schemes).map(categories))
+            # Schemes without a category are compared with each other
+            scheme_group[scheme_group < 0] = scheme_group.max() + 1
+        schemes_per_group = np.bincount(scheme_group)
+        
+        # Category average = summed shares of its schemes / number of schemes
+        group_keys = scheme_group[position_scheme] * num_securities + position_security
+        group_order = np.argsort(group_keys)
+        sorted_group_keys = group_keys[group_order]
+        group_starts = _segment_starts(sorted_group_keys)
+        group_mean = (
+            np.add.reduceat(share[group_order], group_starts)
+            / schemes_per_group[sorted_group_keys[group_starts] // num_securities]
+        )
+        position_benchmark = np.empty_like(share)
+        position_benchmark[group_order] = np.repeat(group_mean, np.diff(np.r_[group_starts, len(group_order)]))
+    
+    # 1/2 * sum |w - b| over all securities, where securities the scheme does not hold add b each
+    active_share = 0.5 * (1 + np.add.reduceat(np.abs(share - position_benchmark) - position_benchmark, scheme_starts))
+    
+    metrics = pd.DataFrame({
+        'amc': pd.Categorical.from_codes(position_amc[scheme_starts], amcs),
+        'num_holdings': num_holdings,
+        'weight_sum': weight_sum,
+        'weight_sum_ok': (weight_sum >= weight_range[0]) & (weight_sum <= weight_range[1]),
+        top_column: top_weight,
+        'hhi': np.where(has_weight, hhi, np.nan),
+        'effective_holdings': np.where(has_weight, 10000 / np.where(has_weight, hhi, 1), np.nan),
+        'active_share': np.where(has_weight, np.clip(active_share, 0, 1) * 100, np.nan),
+    }, index=pd.Index(schemes, name='scheme_name'))
+    return metrics
+
+def analyze_scheme_metrics(df, benchmark=None, categories=None, top_n=20):
+    """
+    Rank schemes by concentration and flag incomplete disclosures
+    Lists the most concentrated portfolios, with HHI and active share,
+    and the schemes whose weights do not add up
+    """
+    print("\n" + "="*60)
+    print("🧮 SCHEME CONCENTRATION & ACTIVE SHARE")
     print("="*60)
     
+    context = get_context(df)
+    if not has_scheme_weights(context):
+        print(f"\n⚠️  Scheme metrics need the columns {', '.join(SCHEME_METRIC_COLUMNS)} with weights")
+        return None
+    if benchmark is None and categories is None:
+        metrics = context.scheme_metrics
+    else:
+        metrics = compute_scheme_metrics(df, benchmark=benchmark, categories=categories)
+    
+    concentrated = metrics.sort_values('top10_weight', ascending=False).head(top_n)
+    print(f"\nMost concentrated schemes (weight of the top 10 holdings):\n")
+    print(concentrated.drop(columns='weight_sum_ok').to_string())
+    
+    suspicious = metrics[~metrics['weight_sum_ok']]
+    if len(suspicious):
+        print(
+            f"\n⚠️  {len(suspicious)} schemes with weights adding up to less than {WEIGHT_SUM_RANGE[0]:.0f}% "
+            f"or more than {WEIGHT_SUM_RANGE[1]:.0f}% (missing or double counted rows?):\n"
+        )
+        print(suspicious[['amc', 'num_holdings', 'weight_sum']].head(top_n).to_string())
+    
+    return metrics
+
+# ============================================
+# 12. COMPREHENSIVE REPORT GENERATOR
+# ============================================
+
+def write_monthly_report(summary, most_held, sector_alloc, amc_comp, output_file='monthly_analysis_report.txt'):
+    """
+    Write the monthly report from analyses that were already run
+    sector_alloc may be None when the data has no sectors
+    """
     with open(output_file, 'w') as f:
         f.write("="*60 + "\n")
         f.write("MUTUAL FUND HOLDINGS ANALYSIS REPORT\n")
@@ -317,70 +1071,54 @@ def generate_monthly_report(df, output_file='monthly_analysis_report.txt'):
         # Summary statistics
         f.write("SUMMARY STATISTICS\n")
         f.write("-"*60 + "\n")
-        f.write(f"Total AMCs: {df['amc'].nunique()}\n")
-        f.write(f"Total Schemes: {df['scheme_name'].nunique()}\n")
-        f.write(f"Total Unique Stocks: {df['stock_name'].nunique()}\n")
-        f.write(f"Total Holdings Records: {len(df)}\n")
-        f.write(f"Total Market Value: ₹{df['market_value'].sum()/10000000:.0f} Cr\n")
+        f.write(f"Total AMCs: {summary['amcs']}\n")
+        f.write(f"Total Schemes: {summary['schemes']}\n")
+        f.write(f"Total Unique Stocks: {summary['stocks']}\n")
+        f.write(f"Total Holdings Records: {summary['records']}\n")
+        f.write(f"Total Market Value: ₹{summary['total_value']/10000000:.0f} Cr\n")
         f.write("\n")
         
         # Most held stocks
         f.write("TOP 20 MOST HELD STOCKS\n")
         f.write("-"*60 + "\n")
-        most_held = analyze_most_held_stocks(df, top_n=20)
         f.write(most_held.to_string())
         f.write("\n\n")
         
         # Sector allocation
-        if 'sector' in df.columns:
+        if sector_alloc is not None:
             f.write("SECTOR ALLOCATION\n")
             f.write("-"*60 + "\n")
-            sector_alloc = analyze_sector_allocation(df)
-            if sector_alloc is not None:
-                f.write(sector_alloc.to_string())
+            f.write(sector_alloc.to_string())
             f.write("\n\n")
         
         # AMC comparison
         f.write("AMC STRATEGY COMPARISON\n")
         f.write("-"*60 + "\n")
-        amc_comp = analyze_amc_strategies(df)
         f.write(amc_comp.to_string())
         f.write("\n\n")
     
     print(f"\n✅ Report saved to: {output_file}")
 
+def generate_monthly_report(df, output_file='monthly_analysis_report.txt'):
+    """
+    Generate comprehensive monthly analysis report
+    Pass an AnalysisContext to reuse aggregates from earlier analyses
+    """
+    print("\n" + "="*60)
+    print("📄 GENERATING COMPREHENSIVE REPORT")
+    print("="*60)
+    
+    context = get_context(df)
+    most_held = analyze_most_held_stocks(context, top_n=20)
+    sector_alloc = analyze_sector_allocation(context) if context.sector_stats is not None else None
+    amc_comp = analyze_amc_strategies(context)
+    write_monthly_report(context.summary, most_held, sector_alloc, amc_comp, output_file)
+
 # ============================================
 # MAIN EXECUTION
 # ============================================
 
 if __name__ == "__main__":
-    print("="*60)
-    print("🚀 MUTUAL FUND HOLDINGS ANALYSIS")
-    print("="*60)
-    
-    # Load data
-    df = load_data()
-    
-    # Run all analyses
-    print("\n1️⃣  Running Most Held Stocks Analysis...")
-    analyze_most_held_stocks(df)
-    
-    print("\n2️⃣  Running Concentrated Bets Analysis...")
-    analyze_concentrated_bets(df)
-    
-    print("\n3️⃣  Running Sector Allocation Analysis...")
-    analyze_sector_allocation(df)
-    
-    print("\n4️⃣  Running AMC Strategy Comparison...")
-    analyze_amc_strategies(df)
-    
-    print("\n5️⃣  Finding Hidden Gems...")
-    find_hidden_gems(df)
-    
-    print("\n6️⃣  Generating Comprehensive Report...")
-    generate_monthly_report(df)
-    
-    print("\n" + "="*60)
-    print("✅ ANALYSIS COMPLETE!")
-    print("="*60)
-    print("\nCheck 'monthly_analysis_report.txt' for detailed report")
+    # Runs every analysis above, in parallel worker processes, and writes the report
+    from report_runner import main
+    main()
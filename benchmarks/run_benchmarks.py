@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Analysis Templates Benchmark Suite
+Measures wall time and peak memory of the analysis functions on synthetic
+holdings data and stores the results so commits can be compared
+"""
+
+import os
+import io
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import subprocess
+import tracemalloc
+import contextlib
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+import analysis_templates as at
+from name_index import canonicalize_holdings
+from synthetic_holdings import generate_holdings
+
+RESULTS_DIR = os.path.join(BENCH_DIR, 'results')
+DEFAULT_SIZES = '10k,100k,1m'
+
+def _report(df, df_previous, workdir):
+    at.generate_monthly_report(df, output_file=os.path.join(workdir, 'report.txt'))
+
+def _sample_join_lambda(df, df_previous, workdir):
+    # The per-group lambda join_samples replaces, kept as its baseline
+    df.groupby('scheme_name', observed=True)['stock_name'].agg(lambda x: ', '.join(x.head(5)))
+
+# name -> function(df, df_previous, workdir)
+BENCHMARKS = {
+    'analyze_most_held_stocks': lambda df, df_previous, workdir: at.analyze_most_held_stocks(df),
+    'analyze_concentrated_bets': lambda df, df_previous, workdir: at.analyze_concentrated_bets(df),
+    'analyze_sector_allocation': lambda df, df_previous, workdir: at.analyze_sector_allocation(df),
+    'analyze_amc_strategies': lambda df, df_previous, workdir: at.analyze_amc_strategies(df),
+    'find_hidden_gems': lambda df, df_previous, workdir: at.find_hidden_gems(df),
+    'analyze_mom_changes': lambda df, df_previous, workdir: at.analyze_mom_changes(df, df_previous),
+    'find_similar_schemes': lambda df, df_previous, workdir: at.find_similar_schemes(df),
+    'compute_scheme_metrics': lambda df, df_previous, workdir: at.compute_scheme_metrics(df),
+    'compute_holding_flows': lambda df, df_previous, workdir: at.compute_holding_flows(pd.concat([df_previous, df])),
+    'generate_monthly_report': _report,
+    'join_samples': lambda df, df_previous, workdir: at.join_samples(df['scheme_name'], df['stock_name'], limit=5),
+    'join_samples_lambda': _sample_join_lambda,
+    'canonicalize_holdings': lambda df, df_previous, workdir: canonicalize_holdings(df),
+}
+
+def parse_size(text):
+    """Parse sizes such as 10k, 2.5m or 100000"""
+    text = text.strip().lower()
+    multiplier = {'k': 1_000, 'm': 1_000_000}.get(text[-1], 1)
+    number = text[:-1] if text[-1] in 'km' else text
+    return int(float(number) * multiplier)
+
+def git_commit():
+    """Return the current commit hash, or 'unknown' outside a git checkout"""
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=BENCH_DIR, stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+def measure(fn, repeat=3):
+    """
+    Return (best wall time in seconds, peak traced memory in MB) for fn()
+
+    Timing runs happen without tracemalloc, which slows Python code down;
+    one extra traced run measures the peak memory.
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            fn()
+            best = min(best, time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return best, peak / (1024 * 1024)
+
+def run_benchmarks(sizes, names, repeat=3, seed=42):
+    """Run every selected benchmark at every size and return the result records"""
+    records = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for size in sizes:
+            print(f"\n📦 Generating {size:,} rows x 2 months...")
+            both = generate_holdings(size, num_months=2, seed=seed)
+            months = sorted(both['scraped_date'].unique())
+            df_previous = both[both['scraped_date'] == months[0]].reset_index(drop=True)
+            df = both[both['scraped_date'] == months[1]].reset_index(drop=True)
+            del both
+
+            for name in names:
+                seconds, peak_mb = measure(lambda: BENCHMARKS[name](df, df_previous, workdir), repeat)
+                records.append({'function': name, 'rows': size, 'seconds': seconds, 'peak_mb': peak_mb})
+                print(f"⏱️  {name:<28} {size:>11,} rows  {seconds:>9.3f}s  {peak_mb:>9.1f} MB")
+
+    return records
+
+def save_results(records, output_file=None):
+    """Write benchmark results plus environment details to a JSON file"""
+    commit = git_commit()
+    if output_file is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output_file = os.path.join(RESULTS_DIR, f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{commit}.json")
+
+    with open(output_file, 'w') as f:
+        json.dump({
+            'commit': commit,
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'pandas': pd.__version__,
+            'numpy': np.__version__,
+            'machine': platform.machine(),
+            'results': records,
+        }, f, indent=2)
+
+    print(f"\n💾 Results saved to: {output_file}")
+    return output_file
+
+def compare_results(baseline_file, current_file, threshold=1.2):
+    """Print time and memory ratios between two result files, flagging regressions"""
+    with open(baseline_file) as f:
+        baseline = json.load(f)
+    with open(current_file) as f:
+        current = json.load(f)
+
+    before = {(r['function'], r['rows']): r for r in baseline['results']}
+
+    print("\n" + "="*60)
+    print(f"📊 COMPARISON: {baseline['commit']} → {current['commit']}")
+    print("="*60)
+
+    regressions = 0
+    for record in current['results']:
+        old = before.get((record['function'], record['rows']))
+        if old is None:
+            continue
+        time_ratio = record['seconds'] / old['seconds'] if old['seconds'] else float('inf')
+        memory_ratio = record['peak_mb'] / old['peak_mb'] if old['peak_mb'] else float('inf')
+        flag = "🔴" if time_ratio > threshold or memory_ratio > threshold else "🟢"
+        regressions += flag == "🔴"
+        print(
+            f"{flag} {record['function']:<28} {record['rows']:>11,} rows  "
+            f"time x{time_ratio:.2f}  memory x{memory_ratio:.2f}"
+        )
+
+    print(f"\n{regressions} regression(s) above x{threshold}")
+    return regressions
+
+def main(argv=None):
+    """Main benchmark function"""
+    parser = argparse.ArgumentParser(description="Benchmark the analysis templates on synthetic data")
+    parser.add_argument(
+        '--sizes', default=DEFAULT_SIZES,
+        help="Comma separated rows per month, e.g. 10k,100k,1m,10m (default: %(default)s)"
+    )
+    parser.add_argument(
+        '--only', default=None,
+        help=f"Comma separated benchmarks to run (default: all of {', '.join(BENCHMARKS)})"
+    )
+    parser.add_argument('--repeat', type=int, default=3, help="Timing runs per benchmark, best is kept (default: 3)")
+    parser.add_argument('--seed', type=int, default=42, help="Seed for the synthetic data (default: 42)")
+    parser.add_argument('--output', default=None, help="Results file (default: benchmarks/results/<date>_<commit>.json)")
+    parser.add_argument('--compare', default=None, help="Baseline results file to compare against")
+    args = parser.parse_args(argv)
+
+    names = list(BENCHMARKS) if args.only is None else [name.strip() for name in args.only.split(',')]
+    unknown = [name for name in names if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmark(s): {', '.join(unknown)}")
+
+    sizes = [parse_size(size) for size in args.sizes.split(',')]
+
+    print("="*60)
+    print("🏁 ANALYSIS TEMPLATES BENCHMARK")
+    print("="*60)
+
+    records = run_benchmarks(sizes, names, repeat=args.repeat, seed=args.seed)
+    output_file = save_results(records, args.output)
+
+    if args.compare:
+        compare_results(args.compare, output_file)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Synthetic holdings generator
+Builds deterministic, realistic-looking holdings data in the scraper's
+output schema, so the analysis templates can be benchmarked offline
+"""
+
+import os
+import sys
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from normalization import HOLDINGS_COLUMNS, CATEGORICAL_COLUMNS, isin_checksum_valid
+
+HOLDINGS_PER_SCHEME = 60
+NUM_AMCS = 45
+NUM_STOCKS = 2500
+NUM_SECTORS = 25
+
+def _isin(index):
+    """Return an equity ISIN for a stock index, with a valid check digit"""
+    body = f"INE{index:05d}A01"
+    candidates = [f"{body}{digit}" for digit in range(10)]
+    return candidates[int(isin_checksum_valid(candidates).argmax())]
+
+def generate_holdings(num_rows, num_months=1, seed=42, start_month='2024-01'):
+    """
+    Generate num_rows holdings per month for num_months consecutive months
+
+    Schemes hold HOLDINGS_PER_SCHEME stocks each, stock popularity follows a
+    Zipf-like curve so a few large caps are held by most schemes, and
+    portfolios drift from month to month (about 10% of positions are
+    replaced and weights move by a few percent). The result uses the
+    same columns and dtypes as analysis_templates.load_data.
+    """
+    rng = np.random.default_rng(seed)
+    num_schemes = max(1, num_rows // HOLDINGS_PER_SCHEME)
+
+    popularity = 1.0 / np.arange(1, NUM_STOCKS + 1) ** 0.9
+    popularity /= popularity.sum()
+    stock_prices = rng.lognormal(6, 1.2, NUM_STOCKS)
+    stock_sectors = rng.integers(0, NUM_SECTORS, NUM_STOCKS)
+    scheme_amcs = rng.integers(0, NUM_AMCS, num_schemes)
+    scheme_aum = rng.lognormal(23, 1.5, num_schemes)
+
+    scheme_ids = np.resize(np.arange(num_schemes).repeat(HOLDINGS_PER_SCHEME), num_rows)
+    stock_ids = rng.choice(NUM_STOCKS, size=num_rows, p=popularity)
+    raw_weights = rng.gamma(1.2, 1.0, num_rows)
+
+    isins = [_isin(i) for i in range(NUM_STOCKS)]
+    months = pd.period_range(start_month, periods=num_months, freq='M')
+    frames = []
+    for month_index, month in enumerate(months):
+        if month_index > 0:
+            replaced = rng.random(num_rows) < 0.1
+            stock_ids = np.where(replaced, rng.choice(NUM_STOCKS, size=num_rows, p=popularity), stock_ids)
+            raw_weights = raw_weights * rng.lognormal(0, 0.1, num_rows)
+
+        scheme_totals = np.bincount(scheme_ids, weights=raw_weights, minlength=num_schemes)
+        weights = raw_weights / scheme_totals[scheme_ids] * rng.uniform(90, 100, num_schemes)[scheme_ids]
+
+        values = weights / 100 * scheme_aum[scheme_ids]
+        quantities = np.floor(values / stock_prices[stock_ids])
+
+        frames.append(pd.DataFrame({
+            'amc': pd.Categorical.from_codes(scheme_amcs[scheme_ids], [f"AMC {i:02d} Mutual Fund" for i in range(NUM_AMCS)]),
+            'scheme_name': pd.Categorical.from_codes(scheme_ids, [f"Scheme {i:05d} Fund" for i in range(num_schemes)]),
+            'stock_name': pd.Categorical.from_codes(stock_ids, [f"Company {i:04d} Ltd" for i in range(NUM_STOCKS)]),
+            'isin': pd.Categorical.from_codes(stock_ids, isins),
+            'sector': pd.Categorical.from_codes(stock_sectors[stock_ids], [f"Sector {i:02d}" for i in range(NUM_SECTORS)]),
+            'quantity': quantities,
+            'market_value': values,
+            'weight_percent': weights,
+            'portfolio_date': str(month.end_time.date()),
+            'scraped_date': str(month.end_time.date()),
+            'source_url': pd.Categorical.from_codes(scheme_amcs[scheme_ids], [f"https://amc{i:02d}.example/portfolio" for i in range(NUM_AMCS)]),
+        }))
+
+    df = pd.concat(frames, ignore_index=True)[HOLDINGS_COLUMNS]
+    for col in CATEGORICAL_COLUMNS:
+        df[col] = df[col].astype('category')
+        df[col] = df[col].cat.reorder_categories(sorted(df[col].cat.categories))
+    return df
+
+if __name__ == "__main__":
+    sample = generate_holdings(1000)
+    print(sample.head(10).to_string())
+    print(f"\n{len(sample)} rows, {sample['scheme_name'].nunique()} schemes, {sample['stock_name'].nunique()} stocks")
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Chunked LLM extraction for large portfolio documents
+Splits a source page into table-level chunks, extracts them in parallel
+with a bounded number of in-flight LLM calls and merges the results
+"""
+
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import lxml.html
+
+DEFAULT_CHUNK_CHARS = 20000
+DEFAULT_LLM_WORKERS = 4
+
+_HEADING_XPATH = (
+    'preceding::*[self::h1 or self::h2 or self::h3 or self::h4 or self::h5 '
+    'or self::caption or self::strong or self::b][1]'
+)
+
+def _split_rows(header_html, rows_html, context, max_chars):
+    """Split one large table into several smaller tables that repeat its header row"""
+    chunks = []
+    current = []
+    size = 0
+    for row in rows_html:
+        if current and size + len(row) > max_chars:
+            chunks.append(f"{context}<table>{header_html}{''.join(current)}</table>")
+            current, size = [], 0
+        current.append(row)
+        size += len(row)
+    if current:
+        chunks.append(f"{context}<table>{header_html}{''.join(current)}</table>")
+    return chunks
+
+def _table_pieces(content, max_chars):
+    """Return one HTML piece per top-level table, prefixed by its nearest heading"""
+    try:
+        root = lxml.html.fromstring(content)
+    except (ValueError, lxml.etree.ParserError):
+        return []
+
+    pieces = []
+    for table in root.xpath('//table[not(ancestor::table)]'):
+        headings = table.xpath(_HEADING_XPATH)
+        context = ''
+        if headings:
+            heading = ' '.join(headings[0].text_content().split())
+            if heading:
+                context = f"<h3>{heading}</h3>"
+
+        html = lxml.html.tostring(table, encoding='unicode')
+        if len(html) + len(context) <= max_chars:
+            pieces.append(context + html)
+            continue
+
+        rows = table.xpath('.//tr[not(ancestor::tr)]')
+        if not rows:
+            pieces.append(context + html)
+            continue
+        header_html = lxml.html.tostring(rows[0], encoding='unicode')
+        rows_html = [lxml.html.tostring(row, encoding='unicode') for row in rows[1:]]
+        pieces.extend(_split_rows(header_html, rows_html, context, max_chars - len(header_html)))
+
+    return pieces
+
+def _text_pieces(content, max_chars):
+    """Split plain text on blank lines, falling back to single lines for huge paragraphs"""
+    pieces = []
+    for block in re.split(r'\n\s*\n', content):
+        if len(block) <= max_chars:
+            pieces.append(block)
+        else:
+            pieces.extend(block.splitlines())
+    return [piece for piece in pieces if piece.strip()]
+
+def split_source(content, max_chars=DEFAULT_CHUNK_CHARS):
+    """
+    Split a source document into chunks of at most roughly max_chars
+
+    HTML is cut at table boundaries (oversized tables at row boundaries,
+    repeating the header row) and each table carries the heading above it
+    so the model still knows which scheme it belongs to. Small pieces are
+    packed together to keep the number of LLM calls down.
+    """
+    if len(content) <= max_chars:
+        return [content]
+
+    pieces = _table_pieces(content, max_chars) or _text_pieces(content, max_chars)
+
+    chunks = []
+    current = ''
+    for piece in pieces:
+        if current and len(current) + len(piece) > max_chars:
+            chunks.append(current)
+            current = ''
+        current = f"{current}\n{piece}" if current else piece
+    if current:
+        chunks.append(current)
+    return chunks
+
+def extract_chunks(chunks, extract_fn, llm_slots, max_workers=DEFAULT_LLM_WORKERS):
+    """
+    Run extract_fn over every chunk in parallel and return the result lists in order
+
+    llm_slots is a semaphore shared by every AMC, so the number of LLM calls
+    in flight stays bounded no matter how many AMCs are being scraped.
+    A chunk that fails contributes no holdings instead of failing the AMC.
+    """
+    def run(index, chunk):
+        with llm_slots:
+            try:
+                return extract_fn(chunk)
+            except Exception as e:
+                print(f"⚠️  Chunk {index + 1}/{len(chunks)} failed: {e}")
+                return []
+
+    if len(chunks) == 1:
+        return [run(0, chunks[0])]
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(chunks))) as executor:
+        return list(executor.map(run, range(len(chunks)), chunks))
+
+def _field(record, *names):
+    """Look up a field whatever spelling the model used for its key"""
+    for key, value in record.items():
+        if re.sub(r'[^a-z]', '', str(key).lower()) in names:
+            return value
+    return None
+
+def _holding_key(holding):
+    """Identity of a holding row: scheme, security and the reported position"""
+    fields = (
+        _field(holding, 'schemename', 'scheme'),
+        _field(holding, 'isin', 'isincode'),
+        _field(holding, 'stockname', 'stock', 'companyname'),
+        _field(holding, 'quantity', 'qty', 'shares'),
+        _field(holding, 'marketvalue', 'value'),
+        _field(holding, 'weightpercent', 'weight', 'percentage', 'percent'),
+    )
+    return tuple(str(value).strip().lower() if value is not None else None for value in fields)
+
+def merge_holdings(results):
+    """
+    Concatenate chunk results, dropping holdings repeated across chunks
+
+    A holding is only dropped when an earlier chunk returned the same row,
+    scheme, security, quantity, value and weight alike. Rows within one
+    chunk are always kept, so a security listed twice in a scheme (say,
+    fully and partly paid shares) survives the merge.
+    """
+    merged = []
+    seen = set()
+    for holdings in results:
+        if isinstance(holdings, dict) and 'stocks' in holdings:
+            holdings = holdings['stocks']
+        if not isinstance(holdings, list):
+            continue
+
+        chunk_keys = set()
+        for holding in holdings:
+            if not isinstance(holding, dict):
+                continue
+            key = _holding_key(holding)
+            if key in seen:
+                continue
+            chunk_keys.add(key)
+            merged.append(holding)
+        seen |= chunk_keys
+
+    return merged
+
+def make_llm_slots(max_in_flight=DEFAULT_LLM_WORKERS):
+    """Return the semaphore that caps concurrent LLM calls"""
+    return threading.BoundedSemaphore(max_in_flight)
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Persistent cache for LLM extraction results
+Identical content sent with the identical prompt and model is only
+extracted once, across runs and across processes
+"""
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from contextlib import contextmanager
+
+DEFAULT_DB_PATH = os.path.join('.scrape_state', 'extraction_cache.db')
+DEFAULT_MAX_ENTRIES = 1000
+
+def extraction_key(prompt, model, content):
+    """Return the cache key for one extraction call"""
+    payload = json.dumps([prompt, model, content], ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+class ExtractionCache:
+    """
+    SQLite-backed LRU cache of extraction results
+
+    SQLite makes the cache safe to share between processes, and every
+    entry remembers how long the original extraction took and how many
+    tokens it used so the time and tokens saved by a hit can be reported.
+    """
+
+    def __init__(self, path=DEFAULT_DB_PATH, max_entries=DEFAULT_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self.stats = {'hits': 0, 'misses': 0, 'seconds_saved': 0.0, 'tokens_saved': 0}
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        with self._connect() as conn:
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS extractions (
+                    key TEXT PRIMARY KEY,
+                    model TEXT,
+                    result TEXT NOT NULL,
+                    seconds REAL,
+                    tokens INTEGER,
+                    created_at REAL,
+                    accessed_at REAL
+                )"""
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_accessed ON extractions (accessed_at)")
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get(self, key):
+        """Return the cached result for key, or None on a miss"""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT result, seconds, tokens FROM extractions WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None:
+                conn.execute("UPDATE extractions SET accessed_at = ? WHERE key = ?", (time.time(), key))
+
+        with self._lock:
+            if row is None:
+                self.stats['misses'] += 1
+                return None
+            self.stats['hits'] += 1
+            self.stats['seconds_saved'] += row[1] or 0.0
+            self.stats['tokens_saved'] += row[2] or 0
+
+        return json.loads(row[0])
+
+    def put(self, key, model, result, seconds=None, tokens=None):
+        """Store an extraction result and evict the least recently used entries"""
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO extractions VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, model, json.dumps(result, default=str), seconds, tokens, now, now)
+            )
+            conn.execute(
+                """DELETE FROM extractions WHERE key NOT IN (
+                    SELECT key FROM extractions ORDER BY accessed_at DESC LIMIT ?
+                )""",
+                (self.max_entries,)
+            )
+
+    def print_summary(self):
+        """Print hit/miss statistics for this run"""
+        print(
+            f"🧠 Extraction cache: {self.stats['hits']} hits, {self.stats['misses']} misses, "
+            f"~{self.stats['seconds_saved']:.0f}s and {self.stats['tokens_saved']} tokens saved"
+        )
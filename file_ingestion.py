@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+"""
+Portfolio file ingestion
+Finds the monthly portfolio XLSX/XLS/PDF files linked from an AMC page and
+parses their tables directly, without LLM calls. Sheets and PDF pages are
+spread over a process pool, so a 100-sheet workbook uses every core.
+"""
+
+import os
+import re
+import multiprocessing
+from io import BytesIO
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import urljoin, urlparse
+
+import pandas as pd
+from lxml import html as lxml_html
+
+from normalization import canonical_column
+from run_trace import get_tracer
+
+try:
+    import openpyxl
+    EXCEL_AVAILABLE = True
+except ImportError:
+    EXCEL_AVAILABLE = False
+
+try:
+    import pdfplumber
+    PDF_AVAILABLE = True
+except ImportError:
+    PDF_AVAILABLE = False
+
+FILE_EXTENSIONS = ('.xlsx', '.xlsm', '.xls', '.pdf')
+DEFAULT_MAX_FILES = 20
+DEFAULT_FILE_WORKERS = os.cpu_count() or 1
+
+# A header row names at least this many canonical columns, one of them the security
+MIN_HEADER_COLUMNS = 3
+
+_SCHEME_MARKER = re.compile(r'\b(fund|scheme|plan|etf|fof)\b', re.I)
+_TOTAL_ROW = re.compile(r'^\s*(sub[\s-]*total|grand\s+total|total|net\s+assets)\b', re.I)
+
+def file_extension(url):
+    """Lower-case extension of the path in a URL ('' if none)"""
+    return os.path.splitext(urlparse(url).path)[1].lower()
+
+def find_portfolio_links(content, base_url, max_files=DEFAULT_MAX_FILES):
+    """
+    Return absolute URLs of the spreadsheet and PDF files linked from a page
+
+    Links whose URL or text mentions a portfolio are preferred; if there
+    are none, every file link is returned. Page order is kept (AMCs list
+    the latest disclosure first) and at most max_files links are returned.
+    """
+    try:
+        tree = lxml_html.fromstring(content)
+    except (ValueError, lxml_html.etree.ParserError):
+        return []
+
+    links, seen = [], set()
+    for anchor in tree.iter('a'):
+        href = (anchor.get('href') or '').strip()
+        if not href:
+            continue
+        url = urljoin(base_url, href)
+        if file_extension(url) not in FILE_EXTENSIONS or url in seen:
+            continue
+        seen.add(url)
+        text = ' '.join(anchor.itertext())
+        links.append((url, 'portfolio' in f"{url} {text}".lower()))
+
+    preferred = [url for url, is_portfolio in links if is_portfolio]
+    return (preferred or [url for url, _ in links])[:max_files]
+
+# ============================================
+# Table parsing (shared by Excel and PDF)
+# ============================================
+
+def _cell_text(value):
+    if value is None or (isinstance(value, float) and pd.isna(value)):
+        return ''
+    return re.sub(r'\s+', ' ', str(value)).strip()
+
+def _header_columns(row):
+    """Canonical column of each cell if row looks like a holdings header, else None"""
+    canonical = [canonical_column(text) if text else None for text in row]
+    found = {col for col in canonical if col}
+    if len(found) >= MIN_HEADER_COLUMNS and found & {'stock_name', 'isin'}:
+        return canonical
+    return None
+
+def _unique_headers(row):
+    """Header names with blanks filled and duplicates numbered, so no cell is lost in a dict"""
+    headers, counts = [], {}
+    for index, text in enumerate(row):
+        name = text or f"column_{index + 1}"
+        counts[name] = counts.get(name, 0) + 1
+        headers.append(name if counts[name] == 1 else f"{name}_{counts[name]}")
+    return headers
+
+def grid_to_holdings(rows, scheme=None, header=None):
+    """
+    Turn a grid of cell values (one sheet or PDF table) into holdings dicts
+
+    The first row naming enough canonical columns becomes the header. A
+    row with a single text cell mentioning a fund or scheme names the
+    scheme of the next header's table (section rows such as "Mutual Fund
+    Units" inside a table do not). Total rows and rows without a security
+    are skipped. header and scheme carry over from the previous table,
+    for PDF tables continued across pages. Returns (holdings, header, scheme).
+    """
+    holdings = []
+    title = None
+    for raw in rows:
+        row = [_cell_text(value) for value in raw]
+        filled = [text for text in row if text]
+        if not filled:
+            continue
+
+        canonical = _header_columns(row)
+        if canonical is not None:
+            header = (_unique_headers(row), canonical)
+            scheme, title = title or scheme, None
+            continue
+
+        if len(filled) == 1:
+            if _SCHEME_MARKER.search(filled[0]):
+                title = filled[0]
+            continue
+
+        if header is None:
+            continue
+
+        names, canonical = header
+        security = [text for text, col in zip(row, canonical) if col in ('stock_name', 'isin') and text]
+        if not security or _TOTAL_ROW.match(security[0]):
+            continue
+
+        record = {name: text for name, text in zip(names, row) if text}
+        if scheme and 'scheme_name' not in canonical:
+            record['scheme_name'] = scheme
+        holdings.append(record)
+
+    return holdings, header, scheme
+
+# ============================================
+# Workers (run in the process pool)
+# ============================================
+
+def list_sheets(data):
+    """Names of the sheets in an XLSX workbook"""
+    workbook = openpyxl.load_workbook(BytesIO(data), read_only=True, data_only=True)
+    try:
+        return workbook.sheetnames
+    finally:
+        workbook.close()
+
+def _parse_sheet(rows, sheet_name, profile=None):
+    if profile is not None:
+        return profile.parse_grid(rows, sheet_name=sheet_name)[0]
+    return grid_to_holdings(rows, scheme=sheet_name)[0]
+
+def parse_excel_sheets(data, sheet_names, extension='.xlsx', profile=None):
+    """
+    Parse holdings from some of a workbook's sheets
+    With a layout profile its parser is used, otherwise the generic one
+    (where each sheet is its own scheme unless a title row names it)
+    """
+    holdings = []
+    if extension == '.xls':
+        # Legacy workbooks need xlrd, through pandas
+        sheets = pd.read_excel(BytesIO(data), sheet_name=sheet_names, header=None, dtype=object)
+        for name in sheet_names:
+            holdings.extend(_parse_sheet(sheets[name].itertuples(index=False), name, profile))
+        return holdings
+
+    workbook = openpyxl.load_workbook(BytesIO(data), read_only=True, data_only=True)
+    try:
+        for name in sheet_names:
+            holdings.extend(_parse_sheet(workbook[name].iter_rows(values_only=True), name, profile))
+    finally:
+        workbook.close()
+    return holdings
+
+def count_pdf_pages(data):
+    with pdfplumber.open(BytesIO(data)) as pdf:
+        return len(pdf.pages)
+
+def extract_pdf_tables(data, page_numbers):
+    """Return the tables (lists of rows) found on the given PDF pages, page by page"""
+    with pdfplumber.open(BytesIO(data)) as pdf:
+        return [pdf.pages[number].extract_tables() for number in page_numbers]
+
+def _split(items, parts):
+    """Split items into at most parts contiguous, similar-sized groups"""
+    parts = max(1, min(parts, len(items)))
+    size, extra = divmod(len(items), parts)
+    groups, start = [], 0
+    for index in range(parts):
+        end = start + size + (index < extra)
+        groups.append(items[start:end])
+        start = end
+    return groups
+
+class FileIngestor:
+    """
+    Download and parse portfolio files with a shared process pool
+
+    fetch_bytes(url) returns a file's contents (so downloads go through
+    the scraper's HTTP cache). Every workbook is split into groups of
+    sheets, every PDF into groups of pages, and the groups are parsed in
+    parallel. workers=1 parses in the calling thread.
+    """
+
+    def __init__(self, fetch_bytes, workers=DEFAULT_FILE_WORKERS, max_files=DEFAULT_MAX_FILES):
+        self.fetch_bytes = fetch_bytes
+        self.workers = max(1, workers)
+        self.max_files = max_files
+        self._executor = None
+        if self.workers > 1:
+            # Spawned workers do not inherit locks held by the scraper's threads
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context('spawn')
+            )
+
+    def _run(self, fn, *args):
+        if self._executor is None:
+            return _Done(fn(*args))
+        return self._executor.submit(fn, *args)
+
+    def supported(self, url):
+        extension = file_extension(url)
+        if extension == '.pdf':
+            return PDF_AVAILABLE
+        return EXCEL_AVAILABLE
+
+    def ingest(self, amc_name, links, profile=None):
+        """
+        Download and parse every supported file in links, returning all holdings found
+        With a layout profile, only the files it wants are read, with its parser
+        """
+        links = [url for url in links if self.supported(url)]
+        if profile is not None:
+            links = [url for url in links if profile.wants_file(url)]
+        holdings = []
+        for url in links[:self.max_files]:
+            try:
+                data = self.fetch_bytes(url)
+                with get_tracer().span('parse_file', url=url, bytes=len(data)) as span:
+                    if file_extension(url) == '.pdf':
+                        found = self._ingest_pdf(data, profile)
+                    else:
+                        found = self._ingest_excel(data, file_extension(url), profile)
+                    span.set(holdings=len(found))
+            except Exception as e:
+                print(f"⚠️  Could not parse {url}: {e}")
+                continue
+
+            print(f"📑 {amc_name}: {len(found)} holdings from {os.path.basename(urlparse(url).path)}")
+            for holding in found:
+                holding['source_url'] = url
+            holdings.extend(found)
+        return holdings
+
+    def _ingest_excel(self, data, extension, profile=None):
+        if extension == '.xls':
+            sheet_names = list(pd.read_excel(BytesIO(data), sheet_name=None, nrows=0))
+        else:
+            sheet_names = list_sheets(data)
+        futures = [
+            self._run(parse_excel_sheets, data, group, extension, profile)
+            for group in _split(sheet_names, self.workers)
+        ]
+        return [holding for future in futures for holding in future.result()]
+
+    def _ingest_pdf(self, data, profile=None):
+        pages = list(range(count_pdf_pages(data)))
+        futures = [self._run(extract_pdf_tables, data, group) for group in _split(pages, self.workers)]
+
+        # Tables continue across pages, so headers and schemes are tracked in page order
+        holdings, header, scheme = [], None, None
+        for future in futures:
+            for tables in future.result():
+                for table in tables:
+                    if profile is not None:
+                        found, header, scheme = profile.parse_grid(table, scheme=scheme, header=header)
+                    else:
+                        found, header, scheme = grid_to_holdings(table, scheme, header)
+                    holdings.extend(found)
+        return holdings
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+class _Done:
+    """Result holder with the Future interface, for work run without the pool"""
+
+    def __init__(self, value):
+        self.value = value
+
+    def result(self):
+        return self.value
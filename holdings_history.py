@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Historical holdings store
+Keeps every monthly run in one indexed SQLite database, so questions like
+"holdings of ISIN X over the last 24 months" do not need to read and
+concatenate every monthly CSV
+"""
+
+import sqlite3
+from contextlib import contextmanager
+import pandas as pd
+
+from normalization import HOLDINGS_COLUMNS, NUMERIC_COLUMNS
+
+DEFAULT_HISTORY_DB = 'holdings_history.db'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS holdings (
+    month TEXT NOT NULL,
+    amc TEXT,
+    scheme_name TEXT,
+    stock_name TEXT,
+    isin TEXT,
+    sector TEXT,
+    quantity REAL,
+    market_value REAL,
+    weight_percent REAL,
+    portfolio_date TEXT,
+    scraped_date TEXT,
+    source_url TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_holdings_month_amc ON holdings (month, amc);
+CREATE INDEX IF NOT EXISTS idx_holdings_isin_month ON holdings (isin, month);
+CREATE INDEX IF NOT EXISTS idx_holdings_scheme_month ON holdings (scheme_name, month);
+CREATE INDEX IF NOT EXISTS idx_holdings_stock_month ON holdings (stock_name, month);
+"""
+
+class HoldingsHistory:
+    """
+    Month-partitioned holdings history in SQLite
+
+    Every row carries a 'YYYY-MM' month taken from its portfolio_date (the
+    disclosure's "as on" date), or its scraped_date when the source gave
+    none, so a disclosure scraped early the next month is still filed
+    under the month it describes.
+    Appending an AMC's holdings for a month replaces whatever was stored
+    for that AMC and month before, so re-running a month is idempotent.
+    """
+
+    def __init__(self, path=DEFAULT_HISTORY_DB):
+        self.path = path
+        with self._connect() as conn:
+            # Databases from before portfolio_date was kept get the column added
+            existing = [row[1] for row in conn.execute("PRAGMA table_info(holdings)")]
+            if existing and 'portfolio_date' not in existing:
+                conn.execute("ALTER TABLE holdings ADD COLUMN portfolio_date TEXT")
+            conn.executescript(_SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def append(self, df, month=None):
+        """Store a batch of normalized holdings, replacing earlier rows for the same AMC and month"""
+        if df.empty:
+            return
+
+        batch = df.reindex(columns=HOLDINGS_COLUMNS)
+        if month is None:
+            dates = batch['portfolio_date'].astype(object).fillna(batch['scraped_date'].astype(object))
+            month = pd.to_datetime(dates, errors='coerce').dt.strftime('%Y-%m')
+            month = month.fillna(pd.Timestamp.now().strftime('%Y-%m'))
+        batch.insert(0, 'month', month)
+
+        rows = batch.astype(object).where(batch.notna(), None)
+        # Named columns, the table of an older database has portfolio_date last
+        with self._connect() as conn:
+            conn.executemany(
+                "DELETE FROM holdings WHERE month = ? AND amc IS ?",
+                batch[['month', 'amc']].drop_duplicates().astype(object).itertuples(index=False)
+            )
+            conn.executemany(
+                f"INSERT INTO holdings ({', '.join(rows.columns)}) VALUES ({', '.join('?' * len(rows.columns))})",
+                rows.itertuples(index=False)
+            )
+
+    def query(self, sql, params=()):
+        """Run a SQL query against the holdings table and return a DataFrame"""
+        with self._connect() as conn:
+            df = pd.read_sql_query(sql, conn, params=params)
+
+        # Columns that are entirely NULL come back as objects
+        for col in df.columns.intersection(NUMERIC_COLUMNS):
+            df[col] = df[col].astype('float64')
+        return df
+
+    def months(self):
+        """Return every stored month, oldest first"""
+        return self.query("SELECT DISTINCT month FROM holdings ORDER BY month")['month'].tolist()
+
+    def _since(self, last_months):
+        months = self.months()
+        if last_months is None or not months:
+            return '0000-00'
+        return months[-last_months:][0]
+
+    def snapshot(self, month, columns=None):
+        """Return all holdings for one month"""
+        select = ', '.join(columns) if columns else '*'
+        return self.query(f"SELECT {select} FROM holdings WHERE month = ?", (month,))
+
+    def recent(self, last_months=6, columns=None):
+        """Return all holdings for the last N stored months, with their month"""
+        select = ', '.join(['month'] + [col for col in columns if col != 'month']) if columns else '*'
+        return self.query(
+            f"SELECT {select} FROM holdings WHERE month >= ? ORDER BY month",
+            (self._since(last_months),)
+        )
+
+    def isin_history(self, isin, last_months=24):
+        """Return every scheme's holding of one ISIN over the last N stored months"""
+        return self.query(
+            "SELECT * FROM holdings WHERE isin = ? AND month >= ? ORDER BY month, amc, scheme_name",
+            (isin, self._since(last_months))
+        )
+
+    def stock_history(self, stock_name, last_months=24):
+        """Return every scheme's holding of one stock name over the last N stored months"""
+        return self.query(
+            "SELECT * FROM holdings WHERE stock_name = ? AND month >= ? ORDER BY month, amc, scheme_name",
+            (stock_name, self._since(last_months))
+        )
+
+    def scheme_history(self, scheme_name, last_months=None):
+        """Return one scheme's holdings over time"""
+        return self.query(
+            "SELECT * FROM holdings WHERE scheme_name = ? AND month >= ? ORDER BY month, weight_percent DESC",
+            (scheme_name, self._since(last_months))
+        )
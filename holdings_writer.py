@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Streaming output for scraped holdings
+Appends each AMC's holdings to the output file as soon as the AMC is
+done, so memory stays bounded and completed AMCs survive a crash
+"""
+
+import os
+import shutil
+import pandas as pd
+
+from normalization import normalize_holdings, HOLDINGS_COLUMNS, NUMERIC_COLUMNS
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PARQUET_AVAILABLE = True
+except ImportError:
+    PARQUET_AVAILABLE = False
+
+LATEST_FILE = 'mutual_fund_holdings_latest.csv'
+LATEST_PARQUET_FILE = 'mutual_fund_holdings_latest.parquet'
+
+# Repeated strings are dictionary-encoded in Parquet and loaded as categoricals
+if PARQUET_AVAILABLE:
+    HOLDINGS_SCHEMA = pa.schema([
+        (col, pa.float64() if col in NUMERIC_COLUMNS else pa.dictionary(pa.int32(), pa.string()))
+        for col in HOLDINGS_COLUMNS
+    ])
+
+def publish_latest(output_file, latest_file=LATEST_FILE):
+    """
+    Atomically point latest_file at output_file
+
+    Uses a hardlink so the data is not serialized a second time, and
+    falls back to a copy on filesystems without hardlinks. Readers see
+    either the old or the new file, never a partial one.
+    """
+    tmp_path = f"{latest_file}.{os.getpid()}.tmp"
+    try:
+        os.link(output_file, tmp_path)
+    except OSError:
+        shutil.copyfile(output_file, tmp_path)
+    os.replace(tmp_path, latest_file)
+
+class HoldingsWriter:
+    """
+    Append-only writer for holdings, one batch per AMC
+
+    output_stem is the file name without extension, formats any of 'csv'
+    and 'parquet'. Each AMC's batch is written as soon as it is handed
+    over: CSV batches are flushed and fsynced, each Parquet batch becomes
+    one row group. With a HoldingsHistory every batch is also appended to
+    the history store. Only small running statistics plus a sample are
+    kept in memory, so a crash loses nothing that was written.
+
+    With order (the configured AMC names), close() puts the batches in
+    that order whatever order the AMCs finished in, copying one batch at
+    a time, so concurrent runs produce the same file row for row.
+    """
+
+    def __init__(self, output_stem, formats=('csv',), history=None, order=None):
+        if 'parquet' in formats and not PARQUET_AVAILABLE:
+            raise ImportError("Parquet output needs pyarrow: pip install pyarrow")
+
+        self.output_files = {fmt: f"{output_stem}.{fmt}" for fmt in formats}
+        self.history = history
+        self.rows = 0
+        self.amcs = set()
+        self.schemes = set()
+        self.stocks = set()
+        self.sample = None
+        self._sample_position = None
+        self._rank = {name: index for index, name in enumerate(order or [])}
+        # (AMC name, CSV byte range) of every batch, in the order they were written
+        self._batches = []
+
+        # Start from new files rather than truncating ones that latest may be linked to
+        for path in self.output_files.values():
+            if os.path.exists(path):
+                os.remove(path)
+
+        self._file = None
+        self._parquet = None
+        if 'csv' in self.output_files:
+            self._file = open(self.output_files['csv'], 'wb')
+            self._file.write(pd.DataFrame(columns=HOLDINGS_COLUMNS).to_csv(index=False).encode('utf-8'))
+        if 'parquet' in self.output_files:
+            self._parquet = pq.ParquetWriter(self.output_files['parquet'], HOLDINGS_SCHEMA)
+
+    def _position(self, amc_name):
+        """Place of an AMC in the configured order, AMCs outside it go last"""
+        return self._rank.get(amc_name, len(self._rank))
+
+    def write(self, amc_name, holdings):
+        """Append one AMC's holdings to the output"""
+        if not holdings:
+            return
+
+        df = normalize_holdings(pd.DataFrame(holdings), label=amc_name)
+
+        span = None
+        if self._file is not None:
+            start = self._file.tell()
+            self._file.write(df.to_csv(header=False, index=False).encode('utf-8'))
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            span = (start, self._file.tell())
+        if self._parquet is not None:
+            self._parquet.write_table(pa.Table.from_pandas(df, schema=HOLDINGS_SCHEMA, preserve_index=False))
+        if self.history is not None:
+            self.history.append(df)
+
+        self.rows += len(df)
+        self.amcs.add(amc_name)
+        self.schemes.update(df['scheme_name'].dropna().unique())
+        self.stocks.update(df['stock_name'].dropna().unique())
+        # The sample comes from the first AMC in configured order
+        if self._sample_position is None or self._position(amc_name) < self._sample_position:
+            self.sample = df.head()
+            self._sample_position = self._position(amc_name)
+        self._batches.append((amc_name, span))
+
+    def _restore_order(self):
+        """Rewrite the closed outputs with the batches in configured order, one batch at a time"""
+        order = sorted(range(len(self._batches)), key=lambda index: self._position(self._batches[index][0]))
+        if order == list(range(len(self._batches))):
+            return
+
+        if 'csv' in self.output_files:
+            path = self.output_files['csv']
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(path, 'rb') as source, open(tmp_path, 'wb') as target:
+                # The header is everything before the first batch
+                target.write(source.read(min(span[0] for _, span in self._batches)))
+                for index in order:
+                    start, end = self._batches[index][1]
+                    source.seek(start)
+                    target.write(source.read(end - start))
+                target.flush()
+                os.fsync(target.fileno())
+            os.replace(tmp_path, path)
+
+        if 'parquet' in self.output_files:
+            path = self.output_files['parquet']
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            source = pq.ParquetFile(path)
+            with pq.ParquetWriter(tmp_path, HOLDINGS_SCHEMA) as target:
+                # Row group i is the i-th batch written
+                for index in order:
+                    target.write_table(source.read_row_group(index))
+            source.close()
+            os.replace(tmp_path, path)
+
+    def close(self, publish=True):
+        """Finish the outputs in configured order and, if publish is set, make them the latest files"""
+        if self._file is not None:
+            self._file.close()
+        if self._parquet is not None:
+            self._parquet.close()
+
+        if self.rows == 0:
+            for path in self.output_files.values():
+                os.remove(path)
+            return False
+
+        self._restore_order()
+        if publish:
+            latest_files = {'csv': LATEST_FILE, 'parquet': LATEST_PARQUET_FILE}
+            for fmt, path in self.output_files.items():
+                publish_latest(path, latest_files[fmt])
+        return True
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+On-disk HTTP response cache
+Keeps AMC pages and portfolio files on disk and revalidates them
+with conditional requests, so unchanged pages are not downloaded again
+"""
+
+import os
+import json
+import time
+import hashlib
+import threading
+
+from http_client import get_client
+
+DEFAULT_CACHE_DIR = '.http_cache'
+DEFAULT_TTL_SECONDS = 6 * 3600
+DEFAULT_MAX_BYTES = 500 * 1024 * 1024
+
+class CacheMiss(Exception):
+    """Raised in offline mode when a URL has never been cached"""
+
+class HTTPCache:
+    """
+    Response cache keyed by a hash of the URL
+
+    Each entry is a body file plus a JSON metadata file holding the
+    ETag/Last-Modified validators and the SHA-256 digest of the body.
+    Entries younger than ttl are served without any request, older ones
+    are revalidated with If-None-Match/If-Modified-Since and a 304 is
+    served from disk. In offline mode the network is never touched.
+    Downloads go through client (the shared HTTPClient by default).
+    The cache size is scanned from disk once and then kept as a running
+    total, so eviction only walks the directory when it is over max_bytes.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, ttl=DEFAULT_TTL_SECONDS,
+                 max_bytes=DEFAULT_MAX_BYTES, offline=False, client=None):
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.offline = offline
+        self.client = client
+        self.stats = {'hits': 0, 'revalidated': 0, 'downloads': 0, 'evictions': 0}
+        self._lock = threading.Lock()
+        self._size = None
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _paths(self, url):
+        key = hashlib.sha256(url.encode('utf-8')).hexdigest()
+        base = os.path.join(self.cache_dir, key)
+        return base + '.json', base + '.body'
+
+    def _read_meta(self, meta_path):
+        try:
+            with open(meta_path, 'r') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def _write_atomic(self, path, data, mode='wb'):
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, mode) as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def _count(self, stat):
+        with self._lock:
+            self.stats[stat] += 1
+
+    def lookup(self, url):
+        """Return the cached metadata for url, or None if not cached"""
+        meta_path, body_path = self._paths(url)
+        meta = self._read_meta(meta_path)
+        if meta is None or not os.path.exists(body_path):
+            return None
+        return meta
+
+    def get(self, url):
+        """Return the response body for url as bytes, using the cache when possible"""
+        meta_path, body_path = self._paths(url)
+        meta = self.lookup(url)
+        now = time.time()
+
+        if meta is not None:
+            if self.offline or now - meta['fetched_at'] < self.ttl:
+                return self._serve(meta, meta_path, body_path, 'hits')
+        elif self.offline:
+            raise CacheMiss(f"{url} is not in the cache ({self.cache_dir}) and offline mode is on")
+
+        headers = {}
+        if meta is not None:
+            if meta.get('etag'):
+                headers['If-None-Match'] = meta['etag']
+            if meta.get('last_modified'):
+                headers['If-Modified-Since'] = meta['last_modified']
+
+        response = (self.client or get_client()).get(url, headers=headers)
+
+        if response.status_code == 304 and meta is not None:
+            meta['fetched_at'] = now
+            return self._serve(meta, meta_path, body_path, 'revalidated')
+
+        response.raise_for_status()
+        body = response.content
+        meta = {
+            'url': url,
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'content_type': response.headers.get('Content-Type'),
+            'encoding': response.encoding or response.apparent_encoding,
+            'sha256': hashlib.sha256(body).hexdigest(),
+            'size': len(body),
+            'fetched_at': now,
+            'accessed_at': now,
+        }
+        replaced = self.lookup(url)
+        self._write_atomic(body_path, body)
+        self._write_atomic(meta_path, json.dumps(meta), mode='w')
+        self._count('downloads')
+        self._grow(len(body) - (replaced or {}).get('size', 0))
+        return body
+
+    def _grow(self, delta):
+        """Add delta bytes to the running cache size and evict once it exceeds max_bytes"""
+        with self._lock:
+            if self._size is not None:
+                self._size += delta
+            over = self._size is None or self._size > self.max_bytes
+        if over:
+            self.evict()
+
+    def _serve(self, meta, meta_path, body_path, stat):
+        with open(body_path, 'rb') as f:
+            body = f.read()
+        meta['accessed_at'] = time.time()
+        self._write_atomic(meta_path, json.dumps(meta), mode='w')
+        self._count(stat)
+        return body
+
+    def get_text(self, url):
+        """Return the response body for url decoded as text"""
+        body = self.get(url)
+        meta = self.lookup(url) or {}
+        return body.decode(meta.get('encoding') or 'utf-8', errors='replace')
+
+    def evict(self):
+        """Drop least recently used entries until the cache fits in max_bytes"""
+        with self._lock:
+            entries = []
+            total = 0
+            for name in os.listdir(self.cache_dir):
+                if not name.endswith('.json'):
+                    continue
+                meta_path = os.path.join(self.cache_dir, name)
+                meta = self._read_meta(meta_path)
+                if meta is None:
+                    continue
+                entries.append((meta.get('accessed_at', 0), meta.get('size', 0), meta_path))
+                total += meta.get('size', 0)
+
+            for _, size, meta_path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                body_path = meta_path[:-len('.json')] + '.body'
+                for path in (meta_path, body_path):
+                    try:
+                        os.remove(path)
+                    except FileNotFoundError:
+                        pass
+                total -= size
+                self.stats['evictions'] += 1
+            self._size = total
+
+    def print_summary(self):
+        """Print cache statistics for this run"""
+        print(
+            f"🗄️  HTTP cache: {self.stats['hits']} hits, {self.stats['revalidated']} revalidated (304), "
+            f"{self.stats['downloads']} downloads, {self.stats['evictions']} evictions"
+        )
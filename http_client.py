@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Shared HTTP client
+One pooled keep-alive session for every download, with connect/read
+timeouts, retries with exponential backoff on 429/5xx (honoring
+Retry-After), a cap on concurrent requests per host and per-host
+transfer metrics
+"""
+
+import time
+import random
+import threading
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+DEFAULT_CONNECT_TIMEOUT = 10.0
+DEFAULT_READ_TIMEOUT = 60.0
+DEFAULT_MAX_RETRIES = 4
+DEFAULT_BACKOFF_SECONDS = 1.0
+MAX_BACKOFF_SECONDS = 120.0
+DEFAULT_MAX_PER_HOST = 4
+DEFAULT_POOL_SIZE = 20
+DEFAULT_HOST_DELAY = 2.0
+RETRY_STATUS = {429, 500, 502, 503, 504}
+USER_AGENT = 'Mozilla/5.0 (compatible; mutual-fund-holdings-scraper)'
+
+def retry_after_seconds(response):
+    """Seconds to wait from a Retry-After header (delta seconds or HTTP date), or None"""
+    value = response.headers.get('Retry-After')
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+class HostRateLimiter:
+    """
+    Enforce a minimum delay between requests to the same host
+    Different hosts are never delayed by each other
+    """
+
+    def __init__(self, min_interval=DEFAULT_HOST_DELAY):
+        self.min_interval = min_interval
+        self._lock = threading.Lock()
+        self._next_slot = {}
+
+    def wait(self, url):
+        """Block until the host of url may be contacted again"""
+        host = urlparse(url).netloc.lower()
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            # Reserve the slot before sleeping so other threads queue behind it
+            self._next_slot[host] = slot + self.min_interval
+        delay = slot - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+class HTTPClient:
+    """
+    Thread-safe HTTP client shared by all fetch paths
+
+    Connections are kept alive in a pool per host. Timeouts, connection
+    errors and 429/5xx responses are retried up to max_retries times,
+    waiting backoff * 2^attempt seconds with jitter, or as long as the
+    server's Retry-After asks. Every attempt, retries included, starts
+    at least host_delay seconds after the previous one to the same host,
+    and at most max_per_host requests run against one host at a time.
+    metrics holds requests, retries, failures, bytes and seconds per host.
+    """
+
+    def __init__(self, connect_timeout=DEFAULT_CONNECT_TIMEOUT, read_timeout=DEFAULT_READ_TIMEOUT,
+                 max_retries=DEFAULT_MAX_RETRIES, backoff=DEFAULT_BACKOFF_SECONDS,
+                 max_per_host=DEFAULT_MAX_PER_HOST, pool_size=DEFAULT_POOL_SIZE, host_delay=DEFAULT_HOST_DELAY):
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_per_host = max_per_host
+        self.rate_limiter = HostRateLimiter(host_delay)
+        self.metrics = {}
+        self._lock = threading.Lock()
+        self._host_slots = {}
+
+        self.session = requests.Session()
+        self.session.headers['User-Agent'] = USER_AGENT
+        # Retries are handled here, so they can honor Retry-After and be counted
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def _host(self, url):
+        return urlparse(url).netloc.lower()
+
+    def _slots(self, host):
+        with self._lock:
+            if host not in self._host_slots:
+                self._host_slots[host] = threading.BoundedSemaphore(self.max_per_host)
+                self.metrics[host] = {'requests': 0, 'retries': 0, 'failures': 0, 'bytes': 0, 'seconds': 0.0}
+            return self._host_slots[host]
+
+    def _record(self, host, **increments):
+        with self._lock:
+            for key, value in increments.items():
+                self.metrics[host][key] += value
+
+    def _delay(self, attempt, response=None):
+        delay = retry_after_seconds(response) if response is not None else None
+        if delay is None:
+            delay = self.backoff * 2 ** attempt * random.uniform(0.5, 1.5)
+        return min(delay, MAX_BACKOFF_SECONDS)
+
+    def request(self, method, url, **kwargs):
+        """
+        Send a request, retrying timeouts, connection errors and 429/5xx
+
+        Returns the final response (which may still be an error status
+        once retries run out); raises the last exception if every attempt
+        failed to connect. With stream=True the body is left unread for
+        the caller to iterate, and its bytes are counted from Content-Length.
+        """
+        host = self._host(url)
+        slots = self._slots(host)
+        kwargs.setdefault('timeout', self.timeout)
+        stream = kwargs.get('stream', False)
+
+        for attempt in range(self.max_retries + 1):
+            self.rate_limiter.wait(url)
+            start = time.perf_counter()
+            try:
+                with slots:
+                    response = self.session.request(method, url, **kwargs)
+                    size = int(response.headers.get('Content-Length') or 0) if stream else len(response.content)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                self._record(host, requests=1, seconds=time.perf_counter() - start)
+                if attempt == self.max_retries:
+                    self._record(host, failures=1)
+                    raise
+                delay = self._delay(attempt)
+                print(f"🔁 {host}: {type(e).__name__}, retrying in {delay:.1f}s...")
+                self._record(host, retries=1)
+                time.sleep(delay)
+                continue
+
+            self._record(host, requests=1, bytes=size, seconds=time.perf_counter() - start)
+            if response.status_code not in RETRY_STATUS or attempt == self.max_retries:
+                if response.status_code >= 400:
+                    self._record(host, failures=1)
+                return response
+
+            delay = self._delay(attempt, response)
+            response.close()
+            print(f"🔁 {host}: HTTP {response.status_code}, retrying in {delay:.1f}s...")
+            self._record(host, retries=1)
+            time.sleep(delay)
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def print_summary(self):
+        """Print transfer metrics per host"""
+        if not self.metrics:
+            return
+        print("\n" + "="*60)
+        print("🌐 HTTP TRANSFERS")
+        print("="*60)
+        for host, stats in sorted(self.metrics.items(), key=lambda item: -item[1]['bytes']):
+            print(
+                f"{host:<45} {stats['requests']:>4} req  {stats['retries']:>3} retries  "
+                f"{stats['failures']:>3} failed  {stats['bytes'] / (1024 * 1024):>8.1f} MB  {stats['seconds']:>7.1f}s"
+            )
+
+_default_client = None
+_default_lock = threading.Lock()
+
+def get_client():
+    """Return the process-wide client, created with default settings on first use"""
+    global _default_client
+    with _default_lock:
+        if _default_client is None:
+            _default_client = HTTPClient()
+        return _default_client
+
+def set_client(client):
+    """Replace the process-wide client, e.g. with one built from command line options"""
+    global _default_client
+    with _default_lock:
+        _default_client = client
+    return client
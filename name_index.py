@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+Name resolution for schemes and stocks
+Normalizes free-text names ("HDFC Bank Ltd." / "HDFC BANK LIMITED"),
+resolves them to canonical keys through an exact lookup with a trigram
+index as fallback, and canonicalizes whole holdings tables in one pass
+"""
+
+import re
+import numpy as np
+import pandas as pd
+
+# Words that do not tell two companies apart
+STOCK_NOISE_WORDS = {'the', 'ltd', 'limited', 'pvt', 'private', 'inc', 'plc', 'corp', 'corporation', 'co', 'company'}
+
+# Share of the query's trigrams a candidate must contain to be a fuzzy match
+DEFAULT_MIN_SCORE = 0.7
+
+def name_key(name):
+    """Lookup key for a name: lower case, '&' as 'and', punctuation and extra spaces dropped"""
+    text = str(name).lower().replace('&', ' and ')
+    return ' '.join(re.sub(r'[^a-z0-9]+', ' ', text).split())
+
+def stock_key(name):
+    """name_key without legal suffixes such as Ltd / Limited / Corporation"""
+    return ' '.join(word for word in name_key(name).split() if word not in STOCK_NOISE_WORDS)
+
+def trigrams(key):
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def _factorize(series):
+    """
+    Integer codes (-1 = missing) and sorted distinct values of a column,
+    using categorical codes when present. Sorted values make ties between
+    equally common spellings independent of row order.
+    """
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        codes, categories = series.cat.codes.to_numpy(), series.cat.categories.to_numpy(dtype=object)
+        order = np.argsort(categories.astype(str), kind='stable')
+        if (order != np.arange(len(order))).any():
+            rank = np.empty(len(order) + 1, dtype=np.int64)
+            rank[order], rank[-1] = np.arange(len(order)), -1
+            codes, categories = rank[codes], categories[order]
+        return codes, categories
+    codes, uniques = pd.factorize(series, sort=True, use_na_sentinel=True)
+    return codes, np.asarray(uniques, dtype=object)
+
+def _rebuild(series, values, codes):
+    """Column like series (categorical or object) holding values[codes], missing where a code is -1"""
+    small = pd.Categorical(values)
+    row_codes = np.append(small.codes, -1)[codes]
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return pd.Series(pd.Categorical.from_codes(row_codes, small.categories), index=series.index, name=series.name)
+    return pd.Series(np.append(small.categories.to_numpy(dtype=object), None)[row_codes], index=series.index,
+                     name=series.name, dtype=object)
+
+class NameIndex:
+    """
+    Resolve free-text names to canonical keys
+
+    names and keys are parallel sequences; when several names normalize
+    to the same string, the first one's key wins, so pass the preferred
+    (most common) spellings first. Exact normalized names resolve through
+    a dict. Anything else goes through a trigram inverted index: the
+    candidate containing the largest share of the query's trigrams wins
+    (ties broken by Dice similarity), if that share is at least
+    min_score. Results are memoized per query.
+    """
+
+    def __init__(self, names, keys, normalize=name_key, min_score=DEFAULT_MIN_SCORE):
+        self.normalize = normalize
+        self.min_score = min_score
+        self._exact = {}
+        for name, key in zip(names, keys):
+            if isinstance(name, str) and not pd.isna(key):
+                self._exact.setdefault(normalize(name), key)
+        self._exact.pop('', None)
+
+        self._names = list(self._exact)
+        self._keys = [self._exact[name] for name in self._names]
+        postings = {}
+        sizes = np.empty(len(self._names), dtype=np.int64)
+        for position, name in enumerate(self._names):
+            grams = trigrams(name)
+            sizes[position] = len(grams)
+            for gram in grams:
+                postings.setdefault(gram, []).append(position)
+        self._postings = {gram: np.array(ids, dtype=np.int64) for gram, ids in postings.items()}
+        self._sizes = sizes
+        self._memo = {}
+
+    def __len__(self):
+        return len(self._names)
+
+    def match(self, name):
+        """Return (key, score) for the best match of name, or (None, 0.0); exact matches score 1.0"""
+        if not isinstance(name, str):
+            return None, 0.0
+        query = self.normalize(name)
+        if query in self._exact:
+            return self._exact[query], 1.0
+        if query in self._memo:
+            return self._memo[query]
+
+        result = (None, 0.0)
+        grams = trigrams(query) if query else set()
+        lists = [self._postings[gram] for gram in grams if gram in self._postings]
+        if lists:
+            ids, common = np.unique(np.concatenate(lists), return_counts=True)
+            coverage = common / len(grams)
+            dice = 2 * common / (len(grams) + self._sizes[ids])
+            best = np.lexsort((-dice, -coverage))[0]
+            if coverage[best] >= self.min_score:
+                result = (self._keys[ids[best]], float(coverage[best]))
+        self._memo[query] = result
+        return result
+
+    def lookup(self, name):
+        """Canonical key for name, or None if nothing matches well enough"""
+        return self.match(name)[0]
+
+    def lookup_many(self, names):
+        """Canonical keys for a sequence of names, resolving each distinct name once"""
+        codes, uniques = pd.factorize(pd.Series(names, dtype=object), use_na_sentinel=True)
+        keys = np.array([self.lookup(name) for name in uniques] + [None], dtype=object)
+        return keys[codes]
+
+def _ranked_pairs(df, counts=None):
+    """
+    Distinct (stock_name, isin) pairs with their row counts, most common first
+
+    counts gives the number of rows each row of df stands for (default 1).
+    Returns (names, isins, counts, inverse) where inverse maps every row
+    of df to its pair.
+    """
+    name_codes, names = _factorize(df['stock_name'])
+    if 'isin' in df.columns:
+        isin_codes, isins = _factorize(df['isin'])
+    else:
+        isin_codes, isins = np.full(len(df), -1), np.array([], dtype=object)
+
+    combined = (name_codes.astype(np.int64) + 1) * (len(isins) + 1) + (isin_codes.astype(np.int64) + 1)
+    pairs, inverse = np.unique(combined, return_inverse=True)
+    counts = np.bincount(inverse, weights=counts, minlength=len(pairs))
+    pair_names = np.append(names, None)[pairs // (len(isins) + 1) - 1]
+    pair_isins = np.append(isins, None)[pairs % (len(isins) + 1) - 1]
+
+    order = np.argsort(-counts, kind='stable')
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order))
+    return pair_names[order], pair_isins[order], counts[order], rank[inverse]
+
+def build_stock_index(df, min_score=DEFAULT_MIN_SCORE):
+    """NameIndex of stock names to ISINs, from the holdings that have both"""
+    names, isins, _, _ = _ranked_pairs(df)
+    known = np.array([isinstance(name, str) and isinstance(isin, str) for name, isin in zip(names, isins)], dtype=bool)
+    return NameIndex(names[known], isins[known], normalize=stock_key, min_score=min_score)
+
+def build_scheme_index(df, min_score=DEFAULT_MIN_SCORE):
+    """NameIndex of scheme names to their canonical (most common) spelling"""
+    codes, names = _factorize(df['scheme_name'])
+    counts = np.bincount(codes[codes >= 0], minlength=len(names))
+    names = names[np.argsort(-counts, kind='stable')]
+    return NameIndex(names, names, min_score=min_score)
+
+def canonicalize_holdings(df, counts=None):
+    """
+    Give every stock and scheme one spelling and fill ISINs from stock names
+
+    Stocks are grouped by ISIN; holdings without one take the ISIN of a
+    holding whose name is the same after normalization (never a fuzzy
+    match, so similar names of different companies stay apart). Each
+    stock and each scheme then gets its most common spelling (ties go to
+    the first in sort order). Works on the distinct names only and
+    returns a new DataFrame. counts, for already deduplicated names, is
+    the number of holdings each row stands for.
+    """
+    df = df.copy()
+    if counts is not None:
+        counts = np.asarray(counts, dtype='float64')
+
+    if 'stock_name' in df.columns:
+        names, isins, _, inverse = _ranked_pairs(df, counts)
+        keys = [stock_key(name) if isinstance(name, str) else '' for name in names]
+
+        # ISIN of each normalized name, taken from its most common pair with one
+        isin_of_key = {}
+        for key, isin in zip(keys, isins):
+            if key and isinstance(isin, str):
+                isin_of_key.setdefault(key, isin)
+
+        groups = np.array([
+            isin if isinstance(isin, str) else isin_of_key.get(key, f"name:{key}" if key else None)
+            for key, isin in zip(keys, isins)
+        ], dtype=object)
+        # Pairs are in order of row count, so the first name seen per group is its most common one
+        display = {}
+        for group, name in zip(groups, names):
+            if group is not None and isinstance(name, str):
+                display.setdefault(group, name)
+
+        canonical_names = np.array([display.get(group) for group in groups], dtype=object)
+        df['stock_name'] = _rebuild(df['stock_name'], canonical_names, inverse)
+        if 'isin' in df.columns:
+            canonical_isins = np.array([
+                isin_of_key.get(key, isin) if not isinstance(isin, str) else isin for key, isin in zip(keys, isins)
+            ], dtype=object)
+            df['isin'] = _rebuild(df['isin'], canonical_isins, inverse)
+
+    if 'scheme_name' in df.columns:
+        codes, names = _factorize(df['scheme_name'])
+        known = codes >= 0
+        scheme_counts = np.bincount(codes[known], weights=None if counts is None else counts[known], minlength=len(names))
+        display = {}
+        for position in np.argsort(-scheme_counts, kind='stable'):
+            display.setdefault(name_key(names[position]), names[position])
+        canonical = np.array([display[name_key(name)] for name in names], dtype=object)
+        df['scheme_name'] = _rebuild(df['scheme_name'], canonical, codes)
+
+    return df
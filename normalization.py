@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Holdings normalization
+Maps whatever columns the LLM or pd.read_html produced onto the canonical
+holdings schema and parses Indian-format numbers, units and ISINs with
+vectorized operations over the whole DataFrame
+"""
+
+import re
+import numpy as np
+import pandas as pd
+
+# Canonical holdings schema
+HOLDINGS_COLUMNS = [
+    'amc', 'scheme_name', 'stock_name', 'isin', 'sector',
+    'quantity', 'market_value', 'weight_percent',
+    'portfolio_date', 'scraped_date', 'source_url',
+]
+CATEGORICAL_COLUMNS = [
+    'amc', 'scheme_name', 'stock_name', 'isin', 'sector', 'portfolio_date', 'scraped_date', 'source_url',
+]
+NUMERIC_COLUMNS = ['quantity', 'market_value', 'weight_percent']
+
+# Header patterns for each canonical column, checked in this order
+# (weights before values so "% to Net Assets" is not read as a value)
+COLUMN_PATTERNS = [
+    ('amc', r'^amc$'),
+    ('scraped_date', r'^scraped[ _]date$'),
+    ('portfolio_date', r'^(portfolio|disclosure)[ _]date$|^as on( date)?$'),
+    ('source_url', r'^source[ _]url$'),
+    ('isin', r'\bisin'),
+    ('weight_percent', r'%|percent|weight|to net assets|to nav|to aum|allocation'),
+    ('market_value', r'market|fair value|value|amount|exposure'),
+    # Only a header that is just "Shares" counts them; "Equity Shares" names the security
+    ('quantity', r'quantity|\bqty\b|(no\.?|number) of shares|^shares( held)?$|units'),
+    ('scheme_name', r'scheme|fund name'),
+    ('sector', r'sector|industry'),
+    ('stock_name', r'instrument|issuer|security|company|stock|equity|holding|^name$'),
+]
+
+# Multipliers to rupees for units named in headers or next to values
+UNIT_PATTERNS = [
+    (r'crore|\bcrs?\b', 1e7),
+    (r'lakh|\blacs?\b|\blakhs?\b', 1e5),
+    (r'million|\bmn\b', 1e6),
+    (r'thousand', 1e3),
+]
+
+_ISIN_FORMAT = r'^[A-Z]{2}[A-Z0-9]{9}[0-9]$'
+_MISSING_VALUES = r'^(?:|-+|nil|na|n/a|none|nan|null)$'
+# "Portfolio as on 31-Mar-2026" in the title rows of a disclosure
+_AS_ON = re.compile(r'\bas\s+(?:on|at)\b\s*:?\s*([0-9a-z][0-9a-z ,./-]*)', re.I)
+
+# Currency markers, removed before the digits so the dot of "Rs." is not read as a decimal point
+_CURRENCY = r'\brs\b\.?|\binr\b|₹'
+
+def canonical_column(header):
+    """Return the canonical column name for a raw header, or None if unrecognised"""
+    text = str(header).strip().lower().replace('_', ' ')
+    for column, pattern in COLUMN_PATTERNS:
+        if re.search(pattern, text):
+            return column
+    return None
+
+def header_multiplier(header):
+    """Return the rupee multiplier implied by a header such as 'Market Value (Rs. in Lakhs)'"""
+    text = str(header).lower()
+    for pattern, multiplier in UNIT_PATTERNS:
+        if re.search(pattern, text):
+            return multiplier
+    return 1.0
+
+def _map_unique(series, fn):
+    """Apply a vectorized fn to the distinct values of series only, then broadcast back"""
+    codes, uniques = pd.factorize(series, use_na_sentinel=True)
+    mapped = np.asarray(fn(pd.Series(uniques, dtype=object)))
+    result = np.full(len(series), np.nan, dtype=mapped.dtype if mapped.dtype.kind == 'f' else object)
+    has_value = codes >= 0
+    result[has_value] = mapped[codes[has_value]]
+    return pd.Series(result, index=series.index)
+
+def _parse_numbers(values, default_multiplier=1.0):
+    """Parse strings like '₹1,23,456.7', 'Rs. 1,234.50', '(1,234)', '5.2%' or '12.5 Cr' into floats"""
+    text = values.astype(str).str.strip().str.lower()
+
+    # Units written next to a value override the unit from the header
+    multiplier = pd.Series(default_multiplier, index=text.index)
+    for pattern, factor in UNIT_PATTERNS:
+        multiplier = multiplier.mask(text.str.contains(pattern, regex=True), factor)
+
+    negative = text.str.match(r'^\(.*\)$') | text.str.startswith('-')
+    digits = text.str.replace(_CURRENCY, '', regex=True)
+    # Only a dot followed by a digit is a decimal point ("12.5 crs." ends in a full stop)
+    digits = digits.str.replace(r'\.(?![0-9])', '', regex=True)
+    digits = digits.str.replace(r'[^0-9.]', '', regex=True)
+    digits = digits.mask(text.str.match(_MISSING_VALUES))
+
+    number = pd.to_numeric(digits, errors='coerce') * multiplier
+    return number.mask(negative, -number).to_numpy(dtype='float64')
+
+def parse_numeric_column(series, multiplier=1.0):
+    """Parse a column of Indian-format numbers, scaling by the unit from its header"""
+    if pd.api.types.is_numeric_dtype(series):
+        return series.astype('float64') * multiplier
+    return _map_unique(series, lambda values: _parse_numbers(values, multiplier)).astype('float64')
+
+def isin_checksum_valid(isins):
+    """Return a boolean array: does each 12-character ISIN pass its Luhn check digit"""
+    isins = np.asarray(isins, dtype=object)
+    if len(isins) == 0:
+        return np.zeros(0, dtype=bool)
+
+    chars = np.frombuffer(''.join(isins).encode('ascii'), dtype=np.uint8).reshape(-1, 12).astype(np.int64)
+    # Digits stay 0-9, letters become 10-35 and contribute two digits
+    values = np.where(chars >= ord('A'), chars - ord('A') + 10, chars - ord('0'))
+    tens = np.where(values >= 10, values // 10, -1)
+    ones = values % 10
+
+    digits = np.stack([tens, ones], axis=2).reshape(len(isins), 24)
+    present = digits >= 0
+    # Position of every digit counted from the right, check digit = 0
+    from_right = np.cumsum(present[:, ::-1], axis=1)[:, ::-1] - 1
+    doubled = np.where(present & (from_right % 2 == 1), digits * 2, digits)
+    doubled = np.where(doubled > 9, doubled - 9, doubled)
+    total = np.where(present, doubled, 0).sum(axis=1)
+    return total % 10 == 0
+
+def normalize_isins(series):
+    """Uppercase and validate ISINs, returning NaN where the code is malformed"""
+    def clean(values):
+        text = values.astype(str).str.upper().str.replace(r'[^A-Z0-9]', '', regex=True)
+        valid = np.array(text.str.match(_ISIN_FORMAT), dtype=bool)
+        valid[valid] = isin_checksum_valid(text[valid].to_numpy())
+        return text.where(valid).to_numpy(dtype=object)
+    return _map_unique(series, clean)
+
+def _parse_dates(values):
+    """Parse dates written in any common format into 'YYYY-MM-DD' strings (NaN if unreadable)"""
+    text = values.astype(str).str.strip()
+    dates = pd.to_datetime(text, errors='coerce', dayfirst=True, format='mixed')
+    return dates.dt.strftime('%Y-%m-%d').to_numpy(dtype=object)
+
+def normalize_dates(series):
+    """Parse a column of dates into 'YYYY-MM-DD' strings, parsing each distinct value once"""
+    return _map_unique(series, _parse_dates)
+
+def disclosure_date(text):
+    """Return the 'as on' date of a title like 'Portfolio as on March 31, 2026' as 'YYYY-MM-DD', or None"""
+    match = _AS_ON.search(str(text))
+    if match is None:
+        return None
+    date = _parse_dates(pd.Series([match.group(1).strip(' ,./-')]))[0]
+    return None if pd.isna(date) else date
+
+def _clean_strings(series):
+    def clean(values):
+        text = values.astype(str).str.replace(r'\s+', ' ', regex=True).str.strip()
+        return text.mask(text.str.lower().str.match(_MISSING_VALUES)).to_numpy(dtype=object)
+    return _map_unique(series, clean)
+
+def normalize_holdings(df, label=None):
+    """
+    Normalize a holdings DataFrame to the canonical schema
+
+    Column aliases are mapped to HOLDINGS_COLUMNS (the first matching
+    column wins, later ones only fill its gaps), numbers are parsed with
+    units from headers and values applied so market_value is in rupees,
+    ISINs are validated and strings are tidied. Unrecognised columns are
+    dropped. Every step works on whole columns (distinct values only for
+    strings), never row by row.
+    """
+    columns = {}
+    unknown = []
+
+    for header in df.columns:
+        canonical = canonical_column(header)
+        if canonical is None:
+            unknown.append(str(header))
+            continue
+
+        series = df[header]
+        if isinstance(series, pd.DataFrame):
+            series = series.iloc[:, 0]
+
+        if canonical in NUMERIC_COLUMNS:
+            multiplier = header_multiplier(header) if canonical == 'market_value' else 1.0
+            series = pd.Series(parse_numeric_column(series, multiplier), index=df.index)
+        elif canonical == 'isin':
+            series = normalize_isins(series)
+        elif canonical == 'portfolio_date':
+            series = normalize_dates(series)
+        else:
+            series = _clean_strings(series)
+
+        if canonical in columns:
+            columns[canonical] = columns[canonical].combine_first(series)
+        else:
+            columns[canonical] = series
+
+    if unknown:
+        source = f" from {label}" if label else ""
+        print(f"⚠️  Ignoring unrecognised columns{source}: {', '.join(unknown)}")
+
+    normalized = pd.DataFrame(columns, index=df.index).reindex(columns=HOLDINGS_COLUMNS)
+    for col in HOLDINGS_COLUMNS:
+        normalized[col] = normalized[col].astype('float64' if col in NUMERIC_COLUMNS else object)
+    return normalized
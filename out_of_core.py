@@ -0,0 +1,447 @@
+#!/usr/bin/env python3
+"""
+Out-of-core analysis
+Runs the analysis templates on holdings files larger than memory, such
+as several years of monthly history. The file is memory-mapped and
+streamed in row-group batches; every batch is reduced to partial
+aggregates, which are combined as they come in. Memory depends on the
+number of distinct stocks, schemes and months, not on the number of rows.
+"""
+
+import os
+import argparse
+from functools import cached_property
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    ARROW_AVAILABLE = True
+except ImportError:
+    ARROW_AVAILABLE = False
+
+import analysis_templates as at
+from holdings_history import HoldingsHistory, DEFAULT_HISTORY_DB
+from name_index import canonicalize_holdings
+from normalization import HOLDINGS_COLUMNS, NUMERIC_COLUMNS, CATEGORICAL_COLUMNS
+
+DEFAULT_HISTORY_FILE = 'holdings_history.parquet'
+DEFAULT_BATCH_ROWS = 250_000
+HISTORY_ROW_GROUP_ROWS = 250_000
+# Partial aggregates are combined every this many batches
+COMPACT_EVERY = 8
+
+ARROW_SUFFIXES = ('.arrow', '.feather', '.ipc')
+AGGREGATE_COLUMNS = [
+    'amc', 'scheme_name', 'stock_name', 'isin', 'sector', 'market_value', 'weight_percent', 'month',
+    'portfolio_date', 'scraped_date',
+]
+
+def export_history(path=DEFAULT_HISTORY_FILE, db_path=DEFAULT_HISTORY_DB, months=None):
+    """
+    Write the SQLite history to a Parquet file for out-of-core analysis
+
+    Rows are written one month at a time, sorted by month, in row groups
+    of at most HISTORY_ROW_GROUP_ROWS, so only one month is ever in memory
+    and readers can skip row groups by month. Returns path.
+    """
+    if not ARROW_AVAILABLE:
+        raise ImportError("Out-of-core analysis needs pyarrow: pip install pyarrow")
+
+    history = HoldingsHistory(db_path)
+    schema = pa.schema([('month', pa.dictionary(pa.int32(), pa.string()))] + [
+        (col, pa.float64() if col in NUMERIC_COLUMNS else pa.dictionary(pa.int32(), pa.string()))
+        for col in HOLDINGS_COLUMNS
+    ])
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    rows = 0
+    with pq.ParquetWriter(tmp_path, schema) as writer:
+        for month in history.months():
+            if months is not None and month not in months:
+                continue
+            snapshot = history.snapshot(month).reindex(columns=schema.names)
+            for col in schema.names:
+                if col not in NUMERIC_COLUMNS:
+                    snapshot[col] = snapshot[col].astype('category')
+            writer.write_table(
+                pa.Table.from_pandas(snapshot, schema=schema, preserve_index=False),
+                row_group_size=HISTORY_ROW_GROUP_ROWS
+            )
+            rows += len(snapshot)
+    os.replace(tmp_path, path)
+    print(f"💾 Exported {rows:,} holdings to {path}")
+    return path
+
+def _row_groups(parquet_file, months):
+    """Row groups whose month statistics overlap months (all of them without statistics)"""
+    groups = list(range(parquet_file.num_row_groups))
+    names = parquet_file.schema_arrow.names
+    if months is None or 'month' not in names:
+        return groups
+    position = names.index('month')
+    first, last = min(months), max(months)
+    selected = []
+    for group in groups:
+        stats = parquet_file.metadata.row_group(group).column(position).statistics
+        if stats is None or not stats.has_min_max or (stats.min <= last and stats.max >= first):
+            selected.append(group)
+    return selected
+
+def _arrow_batches(path, columns, batch_rows):
+    reader = pa.ipc.open_file(pa.memory_map(path, 'r'))
+    for index in range(reader.num_record_batches):
+        batch = reader.get_batch(index).select(columns)
+        for offset in range(0, batch.num_rows, batch_rows):
+            yield batch.slice(offset, batch_rows)
+
+def file_columns(path):
+    """Column names of a Parquet or Arrow IPC file, read from its schema only"""
+    if path.endswith(ARROW_SUFFIXES):
+        return pa.ipc.open_file(pa.memory_map(path, 'r')).schema.names
+    return pq.read_schema(path, memory_map=True).names
+
+def iter_batches(path, columns=None, months=None, batch_rows=DEFAULT_BATCH_ROWS):
+    """
+    Yield a holdings file as DataFrames of at most batch_rows rows
+
+    Parquet and Arrow IPC files are memory-mapped and read one batch at
+    a time, with string columns as categoricals. With months, only rows
+    of those 'YYYY-MM' months are returned (Parquet row groups outside
+    them are not read at all).
+    """
+    if not ARROW_AVAILABLE:
+        raise ImportError("Out-of-core analysis needs pyarrow: pip install pyarrow")
+
+    arrow = path.endswith(ARROW_SUFFIXES)
+    names = file_columns(path)
+
+    selected = names if columns is None else [col for col in columns if col in names]
+    read = list(selected)
+    if months is not None:
+        # The month filter needs a month, or the dates it is taken from
+        date_cols = ['month'] if 'month' in names else ['portfolio_date', 'scraped_date']
+        date_cols = [col for col in date_cols if col in names]
+        read += [col for col in date_cols if col not in read]
+
+    if arrow:
+        batches = _arrow_batches(path, read, batch_rows)
+    else:
+        parquet_file = pq.ParquetFile(
+            path, memory_map=True, read_dictionary=[col for col in read if col not in NUMERIC_COLUMNS]
+        )
+        groups = _row_groups(parquet_file, months)
+        batches = parquet_file.iter_batches(batch_size=batch_rows, row_groups=groups, columns=read) if groups else ()
+
+    for batch in batches:
+        df = batch.to_pandas()
+        if months is not None:
+            df = df[at.holding_months(df).isin(months).to_numpy()][selected]
+        if len(df):
+            yield df
+
+class _Partials:
+    """Partial aggregates of one kind, combined every COMPACT_EVERY batches"""
+
+    def __init__(self, combine):
+        self.combine = combine
+        self.parts = []
+
+    def add(self, part):
+        self.parts.append(part)
+        if len(self.parts) >= COMPACT_EVERY:
+            self.parts = [self.result()]
+
+    def result(self):
+        return self.combine(pd.concat(self.parts)) if self.parts else None
+
+def _sum_by_index(frame):
+    return frame.groupby(level=list(range(frame.index.nlevels)), dropna=False).sum()
+
+def _distinct(frame):
+    return frame[~frame.index.duplicated()]
+
+def _key(series):
+    """Group key column as plain strings, so partials of batches with different categories line up"""
+    return series.astype(object)
+
+class OutOfCoreContext(at.AnalysisContext):
+    """
+    AnalysisContext over a Parquet or Arrow file that is not loaded into memory
+
+    The aggregates (per stock, scheme, AMC, sector and month, and the
+    AMCs holding each stock) are computed in one streaming pass over the
+    file on first use, so every analysis built on them (most held stocks,
+    sector allocation, AMC comparison, hidden gems, month-over-month
+    changes, most held over time, the monthly report) runs unchanged.
+    Scheme metrics and high conviction bets stream the file again, keeping
+    only the rows they need. Counts match the in-memory path exactly; sums
+    can differ in the last floating point digit, as they are added up in
+    another order. With canonicalize, names are canonicalized exactly as
+    load_data() does, from a first pass that counts every distinct
+    spelling. months limits the data to those 'YYYY-MM' months.
+
+    There is no df: analyses that compare whole portfolios (portfolio
+    overlap, similar schemes) need the holdings in memory via load_data().
+    """
+
+    def __init__(self, path, months=None, canonicalize=True, batch_rows=DEFAULT_BATCH_ROWS):
+        if not ARROW_AVAILABLE:
+            raise ImportError("Out-of-core analysis needs pyarrow: pip install pyarrow")
+        self.path = path
+        self.months = [months] if isinstance(months, str) else months
+        self.canonicalize = canonicalize
+        self.batch_rows = batch_rows
+
+    @cached_property
+    def columns(self):
+        return pd.Index(file_columns(self.path))
+
+    def batches(self, columns=None, months=None):
+        months = self.months if months is None else months
+        return iter_batches(self.path, columns=columns, months=months, batch_rows=self.batch_rows)
+
+    @cached_property
+    def _names(self):
+        """Canonical (stock_name, isin) per scraped pair and scheme name per scraped name"""
+        pairs = _Partials(_sum_by_index)
+        schemes = _Partials(_sum_by_index)
+        for df in self.batches(['stock_name', 'isin', 'scheme_name']):
+            pairs.add(df.groupby([_key(df['stock_name']), _key(df['isin'])], dropna=False).size())
+            schemes.add(df.groupby(_key(df['scheme_name'])).size())
+
+        names = {}
+        if pairs.parts:
+            counts = pairs.result()
+            scraped = counts.index.to_frame(index=False)
+            canonical = canonicalize_holdings(scraped, counts=counts.to_numpy())
+            names['stock'] = pd.DataFrame({
+                'stock_name': scraped['stock_name'], 'isin': scraped['isin'],
+                'canonical_stock_name': canonical['stock_name'], 'canonical_isin': canonical['isin'],
+            })
+        if schemes.parts:
+            counts = schemes.result()
+            canonical = canonicalize_holdings(pd.DataFrame({'scheme_name': counts.index}), counts=counts.to_numpy())
+            names['scheme'] = dict(zip(counts.index, canonical['scheme_name']))
+        return names
+
+    def _canonical(self, df):
+        """One batch with canonical names, as load_data() would have it"""
+        df = df.assign(stock_name=_key(df['stock_name']), isin=_key(df['isin']), scheme_name=_key(df['scheme_name']))
+        stocks = self._names.get('stock')
+        if stocks is not None:
+            merged = df[['stock_name', 'isin']].merge(stocks, on=['stock_name', 'isin'], how='left')
+            df['stock_name'] = merged['canonical_stock_name'].to_numpy()
+            df['isin'] = merged['canonical_isin'].to_numpy()
+        if 'scheme' in self._names:
+            df['scheme_name'] = df['scheme_name'].map(self._names['scheme'])
+        return df
+
+    def _prepared_batches(self, columns, months=None):
+        for df in self.batches(columns, months):
+            if self.canonicalize:
+                yield self._canonical(df)
+            else:
+                yield df.assign(**{col: _key(df[col]) for col in df.columns.intersection(CATEGORICAL_COLUMNS)})
+
+    @cached_property
+    def _aggregates(self):
+        totals = {
+            name: _Partials(_sum_by_index)
+            for name in ['stock', 'scheme', 'amc', 'sector', 'monthly']
+        }
+        pairs = {name: _Partials(_distinct) for name in ['stock_amc', 'amc_scheme', 'amc_stock', 'sector_stock']}
+        records, total_value, num_batches = 0, 0.0, 0
+
+        for df in self._prepared_batches(AGGREGATE_COLUMNS):
+            num_batches += 1
+            if 'sector' not in df.columns:
+                df['sector'] = None
+            records += len(df)
+            total_value += df['market_value'].sum()
+            weights = df['weight_percent']
+
+            totals['stock'].add(pd.DataFrame({
+                'num_schemes': df['scheme_name'].notna(), 'total_value': df['market_value'],
+                'weight_sum': weights, 'weight_count': weights.notna(),
+            }).groupby(df['stock_name']).sum())
+            totals['scheme'].add(pd.DataFrame({
+                'num_holdings': df['stock_name'].notna(), 'total_value': df['market_value'], 'total_weight': weights,
+            }).groupby(df['scheme_name']).sum())
+            totals['amc'].add(pd.DataFrame({
+                'total_value': df['market_value'], 'weight_sum': weights, 'weight_count': weights.notna(),
+            }).groupby(df['amc']).sum())
+            totals['sector'].add(pd.DataFrame({
+                'total_value': df['market_value'], 'num_holdings': df['scheme_name'].notna(),
+                'weight_sum': weights, 'weight_count': weights.notna(),
+            }).groupby(df['sector']).sum())
+            months = at.holding_months(df)
+            totals['monthly'].add(pd.DataFrame({
+                'num_schemes': df['scheme_name'].notna(), 'total_value': df['market_value'],
+            }).groupby([months, df['stock_name']]).sum())
+
+            for name, (key, value) in {
+                'stock_amc': ('stock_name', 'amc'), 'amc_scheme': ('amc', 'scheme_name'),
+                'amc_stock': ('amc', 'stock_name'), 'sector_stock': ('sector', 'stock_name'),
+            }.items():
+                pairs[name].add(pd.DataFrame(index=pd.MultiIndex.from_frame(df[[key, value]].dropna())))
+
+        print(f"📦 Streamed {records:,} holdings from {self.path} in {num_batches} batches")
+        return {
+            'totals': {name: partials.result() for name, partials in totals.items()},
+            'pairs': {name: partials.result() for name, partials in pairs.items()},
+            'records': records,
+            'total_value': total_value,
+        }
+
+    def _distinct_count(self, pairs, index):
+        """Distinct values per key of a pairs aggregate, 0 for keys without any"""
+        counts = pd.Series(0, index=index, dtype='int64')
+        if pairs is not None and len(pairs):
+            per_key = pairs.index.get_level_values(0).value_counts()
+            counts = per_key.reindex(index, fill_value=0).astype('int64')
+        return counts.to_numpy()
+
+    def _totals(self, name, index_name):
+        totals = self._aggregates['totals'][name]
+        if totals is None:
+            return pd.DataFrame(index=pd.Index([], name=index_name))
+        return totals.sort_index().rename_axis(index_name)
+
+    @staticmethod
+    def _mean(totals):
+        return (totals['weight_sum'] / totals['weight_count'].replace(0, np.nan)).astype('float64')
+
+    @cached_property
+    def stock_stats(self):
+        totals = self._totals('stock', 'stock_name')
+        return pd.DataFrame({
+            'num_schemes': totals['num_schemes'].astype('int64'),
+            'total_value': totals['total_value'],
+            'avg_weight': self._mean(totals),
+            'num_amcs': self._distinct_count(self._aggregates['pairs']['stock_amc'], totals.index),
+        }, index=totals.index)
+
+    @cached_property
+    def scheme_stats(self):
+        totals = self._totals('scheme', 'scheme_name')
+        return pd.DataFrame({
+            'num_holdings': totals['num_holdings'].astype('int64'),
+            'total_value': totals['total_value'],
+            'total_weight': totals['total_weight'],
+        }, index=totals.index)
+
+    @cached_property
+    def amc_stats(self):
+        totals = self._totals('amc', 'amc')
+        return pd.DataFrame({
+            'num_schemes': self._distinct_count(self._aggregates['pairs']['amc_scheme'], totals.index),
+            'num_stocks': self._distinct_count(self._aggregates['pairs']['amc_stock'], totals.index),
+            'total_value': totals['total_value'],
+            'avg_weight': self._mean(totals),
+        }, index=totals.index)
+
+    @cached_property
+    def sector_stats(self):
+        totals = self._totals('sector', 'sector')
+        if totals.empty:
+            return None
+        return pd.DataFrame({
+            'total_value': totals['total_value'],
+            'num_stocks': self._distinct_count(self._aggregates['pairs']['sector_stock'], totals.index),
+            'num_holdings': totals['num_holdings'].astype('int64'),
+            'avg_weight': self._mean(totals),
+        }, index=totals.index)
+
+    @cached_property
+    def monthly_stock_stats(self):
+        totals = self._aggregates['totals']['monthly']
+        if totals is None:
+            return pd.DataFrame(columns=['num_schemes', 'total_value'],
+                                index=pd.MultiIndex.from_tuples([], names=['month', 'stock_name']))
+        totals = totals.sort_index().rename_axis(['month', 'stock_name'])
+        return totals.assign(num_schemes=totals['num_schemes'].astype('int64'))
+
+    @cached_property
+    def scheme_metrics(self):
+        # Scored on the latest month like the in-memory path, in a pass of its
+        # own over only that month's rows; positions carry everything the
+        # metrics look at, summed per scheme and security
+        if not at.has_scheme_weights(self):
+            return None
+        columns = ['amc', 'scheme_name', 'stock_name', 'isin', 'weight_percent']
+        months = self.monthly_stock_stats.index.get_level_values('month').unique()
+        positions = _Partials(_sum_by_index)
+        for df in self._prepared_batches(columns, [max(months)] if len(months) > 1 else None):
+            positions.add(df.groupby(columns[:4], dropna=False)['weight_percent'].sum())
+        if not positions.parts:
+            return at.compute_scheme_metrics(pd.DataFrame(columns=columns))
+        return at.compute_scheme_metrics(positions.result().reset_index())
+
+    @cached_property
+    def stock_amcs(self):
+        pairs = self._aggregates['pairs']['stock_amc']
+        if pairs is None:
+            return pd.Series(dtype=object, index=pd.Index([], name='stock_name'))
+        pairs = pairs.index.to_frame(index=False)
+        return at.join_samples(pairs['stock_name'], pairs['amc'], unique=True)
+
+    def holdings_above(self, min_weight):
+        columns = ['amc', 'scheme_name', 'stock_name', 'isin', 'weight_percent']
+        kept = [df[(df['weight_percent'] > min_weight).to_numpy()] for df in self._prepared_batches(columns)]
+        return pd.concat(kept, ignore_index=True) if kept else pd.DataFrame(columns=columns)
+
+    @cached_property
+    def summary(self):
+        return {
+            'amcs': len(self.amc_stats),
+            'schemes': len(self.scheme_stats),
+            'stocks': len(self.stock_stats),
+            'records': self._aggregates['records'],
+            'total_value': self._aggregates['total_value'],
+        }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Analyze a holdings history too large for memory, streaming it from a Parquet or Arrow file"
+    )
+    parser.add_argument(
+        '--input', default=DEFAULT_HISTORY_FILE,
+        help="Parquet or Arrow file of holdings (default: %(default)s)"
+    )
+    parser.add_argument(
+        '--export-history', action='store_true',
+        help=f"First write the history database ({DEFAULT_HISTORY_DB}) to --input"
+    )
+    parser.add_argument(
+        '--month', default=None,
+        help="Month (YYYY-MM) for the report and month-over-month changes (default: the latest)"
+    )
+    parser.add_argument(
+        '--output', default='monthly_analysis_report.txt',
+        help="Report file (default: %(default)s)"
+    )
+    args = parser.parse_args(argv)
+
+    if args.export_history:
+        export_history(args.input)
+    elif not os.path.exists(args.input):
+        print(f"❌ {args.input} not found; use --export-history to create it from {DEFAULT_HISTORY_DB}")
+        return
+
+    history = OutOfCoreContext(args.input)
+    trend = at.analyze_most_held_over_time(history)
+    months = [] if trend is None else list(history.monthly_stock_stats.index.get_level_values('month').unique())
+    if not months:
+        return
+    month = args.month or months[-1]
+
+    current = OutOfCoreContext(args.input, months=month)
+    earlier = [m for m in months if m < month]
+    if earlier:
+        at.analyze_mom_changes(current, OutOfCoreContext(args.input, months=earlier[-1]))
+    at.generate_monthly_report(current, args.output)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+"""
+Parallel report runner
+Runs the analysis templates as a dependency graph in worker processes.
+The holdings are written once to an uncompressed Arrow IPC file that
+every worker memory-maps instead of being pickled to each process. The
+numeric columns stay on the shared pages; each worker holds its own copy
+of the string columns' categorical codes (a byte or two per row). Prints
+the same analyses and writes the same report as running them one by one,
+followed by a per-analysis timing table. With --out-of-core the file is
+streamed instead of loaded (see out_of_core.py).
+"""
+
+import os
+import io
+import time
+import shutil
+import argparse
+import tempfile
+from contextlib import redirect_stdout
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from functools import cached_property
+
+try:
+    import pyarrow as pa
+    ARROW_AVAILABLE = True
+except ImportError:
+    ARROW_AVAILABLE = False
+
+import analysis_templates as at
+from holdings_writer import LATEST_PARQUET_FILE
+from out_of_core import OutOfCoreContext
+
+DEFAULT_REPORT_FILE = 'monthly_analysis_report.txt'
+
+def _aggregate(name):
+    return lambda context, results, options: getattr(context, name)
+
+def _write_report(context, results, options):
+    print("\n" + "="*60)
+    print("📄 GENERATING COMPREHENSIVE REPORT")
+    print("="*60)
+    at.write_monthly_report(
+        results['summary'], results['most_held_stocks'], results['sector_allocation'],
+        results['amc_strategies'], options.get('output_file', DEFAULT_REPORT_FILE)
+    )
+
+# name -> (label, function(context, results, options), dependencies)
+# Tasks named after an AnalysisContext aggregate are computed once and
+# handed to the tasks that need them; output is printed in this order
+REPORT_TASKS = {
+    'stock_stats': (None, _aggregate('stock_stats'), ()),
+    'scheme_stats': (None, _aggregate('scheme_stats'), ()),
+    'amc_stats': (None, _aggregate('amc_stats'), ()),
+    'sector_stats': (None, _aggregate('sector_stats'), ()),
+    'scheme_metrics': (None, _aggregate('scheme_metrics'), ()),
+    'summary': (None, _aggregate('summary'), ('stock_stats', 'scheme_stats', 'amc_stats')),
+    'most_held_stocks': (
+        "1️⃣  Running Most Held Stocks Analysis...",
+        lambda context, results, options: at.analyze_most_held_stocks(context, top_n=20),
+        ('stock_stats',),
+    ),
+    'concentrated_bets': (
+        "2️⃣  Running Concentrated Bets Analysis...",
+        lambda context, results, options: at.analyze_concentrated_bets(context),
+        (),
+    ),
+    'sector_allocation': (
+        "3️⃣  Running Sector Allocation Analysis...",
+        lambda context, results, options: at.analyze_sector_allocation(context),
+        ('sector_stats',),
+    ),
+    'amc_strategies': (
+        "4️⃣  Running AMC Strategy Comparison...",
+        lambda context, results, options: at.analyze_amc_strategies(context),
+        ('amc_stats', 'scheme_metrics'),
+    ),
+    'hidden_gems': (
+        "5️⃣  Finding Hidden Gems...",
+        lambda context, results, options: at.find_hidden_gems(context),
+        ('stock_stats',),
+    ),
+    'scheme_concentration': (
+        "6️⃣  Scoring Scheme Concentration...",
+        lambda context, results, options: at.analyze_scheme_metrics(context),
+        ('scheme_metrics',),
+    ),
+    'report': (
+        "7️⃣  Generating Comprehensive Report...",
+        _write_report,
+        ('summary', 'most_held_stocks', 'sector_allocation', 'amc_strategies'),
+    ),
+}
+
+def _topological_order(tasks):
+    """Task names with every task after its dependencies, otherwise in declaration order"""
+    order, state = [], {}
+
+    def visit(name, path):
+        if state.get(name) == 'done':
+            return
+        if name in path:
+            raise ValueError(f"Dependency cycle: {' -> '.join(path + [name])}")
+        if name not in tasks:
+            raise KeyError(f"Unknown task: {name}")
+        for dependency in tasks[name][2]:
+            visit(dependency, path + [name])
+        state[name] = 'done'
+        order.append(name)
+
+    for name in tasks:
+        visit(name, [])
+    return order
+
+def _execute(context, name, results, options):
+    """
+    Run one task on context with its dependencies' results
+    Returns (result, printed output, seconds)
+    """
+    _, function, dependencies = REPORT_TASKS[name]
+    for dependency in dependencies:
+        # A shared aggregate saves this process from computing it again
+        if isinstance(getattr(type(context), dependency, None), cached_property):
+            context.__dict__.setdefault(dependency, results[dependency])
+
+    output = io.StringIO()
+    start = time.perf_counter()
+    with redirect_stdout(output):
+        result = function(context, results, options)
+    return result, output.getvalue(), time.perf_counter() - start
+
+def write_shared(df, path):
+    """Write df as an uncompressed Arrow IPC file, which readers can memory-map without copying"""
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with pa.OSFile(tmp_path, 'wb') as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(tmp_path, path)
+
+def read_shared(path):
+    """
+    DataFrame over a memory-mapped Arrow IPC file written by write_shared
+
+    Numeric columns without missing values are zero-copy views of the
+    mapped file, shared by every worker through the page cache. pandas
+    cannot use Arrow dictionary indices as categorical codes, so the codes
+    of the string columns, and numeric columns with missing values, are
+    copied into this process once.
+    """
+    table = pa.ipc.open_file(pa.memory_map(path, 'r')).read_all()
+    return table.to_pandas(split_blocks=True)
+
+_worker_context = None
+
+def _init_worker(path):
+    global _worker_context
+    _worker_context = at.AnalysisContext(read_shared(path))
+
+def _run_in_worker(name, results, options):
+    result, output, seconds = _execute(_worker_context, name, results, options)
+    return result, output, seconds, os.getpid()
+
+def run_report(df, workers=None, output_file=DEFAULT_REPORT_FILE):
+    """
+    Run every analysis in REPORT_TASKS and write the monthly report
+
+    Tasks whose dependencies are done run in parallel in up to workers
+    processes (default: one per CPU), each reading the holdings from a
+    shared memory-mapped Arrow file. Each task's printed output is
+    captured and shown in task order, so it reads the same as a
+    sequential run. With workers=1, or without pyarrow, everything runs
+    in this process, as it does for an OutOfCoreContext, whose analyses
+    share its streaming passes over the file. Returns {task: result} and
+    prints a timing table.
+    """
+    context = at.get_context(df)
+    workers = workers or os.cpu_count() or 1
+    options = {'output_file': output_file}
+    order = _topological_order(REPORT_TASKS)
+    if workers > 1 and not ARROW_AVAILABLE:
+        print("⚠️  pyarrow not installed, running the analyses in this process")
+        workers = 1
+    if workers > 1 and isinstance(context, OutOfCoreContext):
+        print("ℹ️  Streaming the file once for all analyses, running them in this process")
+        workers = 1
+
+    results, outputs, timings = {}, {}, {}
+    printed = 0
+    run_start = time.perf_counter()
+
+    def finish(name, result, output, seconds, worker, started):
+        nonlocal printed
+        results[name] = result
+        outputs[name] = output
+        timings[name] = {
+            'seconds': seconds, 'worker': worker,
+            'start': started - run_start, 'end': time.perf_counter() - run_start,
+        }
+        # Print finished tasks in task order, as far as they are complete
+        while printed < len(order) and order[printed] in results:
+            label = REPORT_TASKS[order[printed]][0]
+            if label:
+                print(f"\n{label}")
+            print(outputs.pop(order[printed]), end='')
+            printed += 1
+
+    if workers == 1:
+        for name in order:
+            started = time.perf_counter()
+            result, output, seconds = _execute(context, name, results, options)
+            finish(name, result, output, seconds, os.getpid(), started)
+        print_timings(timings, time.perf_counter() - run_start, workers)
+        return results
+
+    tmp_dir = tempfile.mkdtemp(prefix='report_runner_')
+    try:
+        path = os.path.join(tmp_dir, 'holdings.arrow')
+        share_start = time.perf_counter()
+        write_shared(context.df, path)
+        timings['share_data'] = {
+            'seconds': time.perf_counter() - share_start, 'worker': os.getpid(),
+            'start': share_start - run_start, 'end': time.perf_counter() - run_start,
+        }
+
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(path,)) as pool:
+            running = {}
+            while len(results) < len(order):
+                submitted = {name for name, _ in running.values()}
+                for name in order:
+                    dependencies = REPORT_TASKS[name][2]
+                    if name in results or name in submitted:
+                        continue
+                    if all(dependency in results for dependency in dependencies):
+                        future = pool.submit(
+                            _run_in_worker, name, {dependency: results[dependency] for dependency in dependencies}, options
+                        )
+                        running[future] = (name, time.perf_counter())
+
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    name, started = running.pop(future)
+                    result, output, seconds, worker = future.result()
+                    finish(name, result, output, seconds, worker, started)
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    print_timings(timings, time.perf_counter() - run_start, workers)
+    return results
+
+def print_timings(timings, wall_seconds, workers):
+    """Print per-task run time, worker process and start/end within the run"""
+    print("\n" + "="*60)
+    print("⏱️  ANALYSIS TIMING")
+    print("="*60)
+    print(f"{'task':<22} {'seconds':>8} {'worker':>8} {'start':>8} {'end':>8}")
+    for name, timing in sorted(timings.items(), key=lambda item: item[1]['start']):
+        print(
+            f"{name:<22} {timing['seconds']:>8.2f} {timing['worker']:>8} "
+            f"{timing['start']:>8.2f} {timing['end']:>8.2f}"
+        )
+    busy = sum(timing['seconds'] for timing in timings.values())
+    print(f"\n{busy:.2f}s of analyses in {wall_seconds:.2f}s wall time on {workers} worker(s)")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run all analyses and write the monthly report")
+    parser.add_argument(
+        '--input', default=None,
+        help="Holdings file (default: the latest Parquet file, or the latest CSV)"
+    )
+    parser.add_argument(
+        '--workers', type=int, default=os.cpu_count() or 1,
+        help="Worker processes; 1 runs everything in this process (default: %(default)s)"
+    )
+    parser.add_argument(
+        '--output', default=DEFAULT_REPORT_FILE,
+        help="Report file (default: %(default)s)"
+    )
+    parser.add_argument(
+        '--out-of-core', action='store_true',
+        help="Stream --input (Parquet or Arrow) instead of loading it, for files larger than memory"
+    )
+    args = parser.parse_args(argv)
+
+    print("="*60)
+    print("🚀 MUTUAL FUND HOLDINGS ANALYSIS")
+    print("="*60)
+
+    if args.out_of_core:
+        path = args.input or LATEST_PARQUET_FILE
+        if not os.path.exists(path):
+            print(f"❌ {path} not found")
+            return
+        data = OutOfCoreContext(path)
+    else:
+        data = at.load_data(args.input)
+    run_report(data, workers=args.workers, output_file=args.output)
+
+    print("\n" + "="*60)
+    print("✅ ANALYSIS COMPLETE!")
+    print("="*60)
+    print(f"\nCheck '{args.output}' for detailed report")
+
+if __name__ == "__main__":
+    main()
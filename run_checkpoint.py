@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Checkpoints for resumable scrape runs
+Every AMC's holdings and status are saved as soon as it finishes, so a
+run that is killed or times out can be resumed and only repeats the
+AMCs that were missing or failed
+"""
+
+import os
+import json
+import shutil
+import threading
+from datetime import datetime
+
+from run_manifest import DEFAULT_STATE_DIR, _slugify
+
+def _write_atomic(path, data):
+    """Write JSON to path via a synced temporary file, so path is always complete"""
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, default=str)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+class RunCheckpoint:
+    """
+    Per-AMC progress of the current scrape run
+
+    checkpoint/run.json holds the run's output file stem, its start time
+    and the status of every AMC finished so far; checkpoint/holdings/ has
+    one JSON file per completed AMC. Holdings are written before the
+    status that points at them and every file is replaced atomically, so
+    the checkpoint is consistent wherever the run stops. An AMC is done
+    only if it finished without an error and with holdings; AMCs that
+    failed or found nothing are scraped again on resume.
+    """
+
+    def __init__(self, state_dir=DEFAULT_STATE_DIR):
+        self.dir = os.path.join(state_dir, 'checkpoint')
+        self.path = os.path.join(self.dir, 'run.json')
+        self.holdings_dir = os.path.join(self.dir, 'holdings')
+        self._lock = threading.Lock()
+
+        try:
+            with open(self.path, 'r') as f:
+                self.run = json.load(f)
+        except (FileNotFoundError, ValueError):
+            self.run = None
+
+    def start(self, output_stem):
+        """Begin a new run, discarding the previous checkpoint"""
+        shutil.rmtree(self.dir, ignore_errors=True)
+        os.makedirs(self.holdings_dir)
+        self.run = {
+            'output_stem': output_stem,
+            'started_at': datetime.now().isoformat(timespec='seconds'),
+            'amcs': {},
+        }
+        _write_atomic(self.path, self.run)
+
+    def resumable(self):
+        """True if there is a checkpoint of a run started this month"""
+        return self.run is not None and self.run['started_at'][:7] == datetime.now().strftime('%Y-%m')
+
+    @property
+    def output_stem(self):
+        return self.run['output_stem']
+
+    @property
+    def started_at(self):
+        return self.run['started_at']
+
+    def done(self, amc_name):
+        """True if amc_name completed with holdings in this run"""
+        entry = self.run['amcs'].get(amc_name)
+        return (
+            entry is not None and entry['status'] == 'done'
+            and os.path.exists(os.path.join(self.holdings_dir, entry['holdings_file']))
+        )
+
+    def record(self, result):
+        """Save one AMC's scrape result: its holdings first, then its status"""
+        amc_name = result['amc']
+        done = result['error'] is None and bool(result['holdings'])
+        holdings_file = f"{_slugify(amc_name)}.json"
+        if done:
+            _write_atomic(os.path.join(self.holdings_dir, holdings_file), result['holdings'])
+
+        with self._lock:
+            self.run['amcs'][amc_name] = {
+                'status': 'done' if done else 'failed',
+                'url': result['url'],
+                'method': result['method'],
+                'num_holdings': len(result['holdings']),
+                'seconds': result['seconds'],
+                'error': result['error'] or (None if done else 'no holdings found'),
+                'holdings_file': holdings_file if done else None,
+                'finished_at': datetime.now().isoformat(timespec='seconds'),
+            }
+            _write_atomic(self.path, self.run)
+
+    def load(self, amc_name):
+        """Result dict, with holdings, of an AMC completed earlier in this run"""
+        entry = self.run['amcs'][amc_name]
+        with open(os.path.join(self.holdings_dir, entry['holdings_file']), 'r') as f:
+            holdings = json.load(f)
+        return {
+            'amc': amc_name, 'url': entry['url'], 'holdings': holdings, 'seconds': 0.0,
+            'error': None, 'reused': False, 'resumed': True, 'method': entry['method'],
+        }
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Run manifest for incremental scraping
+Remembers a fingerprint of every AMC source document together with the
+holdings extracted from it, so unchanged AMCs can skip extraction
+"""
+
+import os
+import re
+import json
+import hashlib
+import threading
+from datetime import datetime
+
+DEFAULT_STATE_DIR = '.scrape_state'
+
+# Parts of a page that change on every request without the portfolio changing
+_VOLATILE_HTML = re.compile(r'<script\b.*?</script>|<style\b.*?</style>|<!--.*?-->', re.I | re.S)
+_WHITESPACE = re.compile(r'\s+')
+
+def fingerprint_source(content):
+    """Return a SHA-256 fingerprint of a source document, ignoring scripts and whitespace"""
+    stable = _WHITESPACE.sub(' ', _VOLATILE_HTML.sub('', content)).strip()
+    return hashlib.sha256(stable.encode('utf-8')).hexdigest()
+
+def _slugify(amc_name):
+    return re.sub(r'[^a-z0-9]+', '_', amc_name.lower()).strip('_')
+
+class RunManifest:
+    """
+    Per-AMC record of source fingerprints and stored holdings
+
+    manifest.json maps each AMC to the fingerprint of the document its
+    holdings were extracted from and the method used. The holdings
+    themselves live in one JSON file per AMC under holdings/.
+    """
+
+    def __init__(self, state_dir=DEFAULT_STATE_DIR):
+        self.state_dir = state_dir
+        self.path = os.path.join(state_dir, 'manifest.json')
+        self.holdings_dir = os.path.join(state_dir, 'holdings')
+        self._lock = threading.Lock()
+        os.makedirs(self.holdings_dir, exist_ok=True)
+
+        try:
+            with open(self.path, 'r') as f:
+                self.entries = json.load(f).get('amcs', {})
+        except (FileNotFoundError, ValueError):
+            self.entries = {}
+
+    def _write_atomic(self, path, data):
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f, default=str)
+        os.replace(tmp_path, path)
+
+    def lookup(self, amc_name, fingerprint, method):
+        """Return stored holdings if amc_name was extracted from the same source, else None"""
+        entry = self.entries.get(amc_name)
+        if not entry or entry['fingerprint'] != fingerprint or entry['method'] != method:
+            return None
+
+        try:
+            with open(os.path.join(self.holdings_dir, entry['holdings_file']), 'r') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def record(self, amc_name, url, fingerprint, method, holdings):
+        """Store freshly extracted holdings and their source fingerprint"""
+        holdings_file = f"{_slugify(amc_name)}.json"
+        self._write_atomic(os.path.join(self.holdings_dir, holdings_file), holdings)
+
+        with self._lock:
+            self.entries[amc_name] = {
+                'url': url,
+                'fingerprint': fingerprint,
+                'method': method,
+                'holdings_file': holdings_file,
+                'num_holdings': len(holdings),
+                'extracted_at': datetime.now().isoformat(timespec='seconds'),
+            }
+            self._write_atomic(self.path, {'amcs': self.entries})
@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""
+Run tracing and profiling
+Timed spans for every stage of a scrape run (fetch, parse, LLM, write,
+per AMC) with byte, row and token counts, written as an OpenTelemetry
+style JSON trace plus a per-stage summary. Optionally profiles the
+spans marked as hot with cProfile and tracemalloc.
+"""
+
+import os
+import io
+import json
+import time
+import pstats
+import cProfile
+import secrets
+import threading
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+
+DEFAULT_TRACE_DIR = os.path.join('.scrape_state', 'traces')
+SERVICE_NAME = 'mutual-fund-holdings-scraper'
+
+# Span attributes added up per stage in the summary
+SUMMED_ATTRIBUTES = ('bytes', 'rows', 'holdings', 'tokens', 'chunks', 'files')
+PROFILE_TOP_FUNCTIONS = 30
+PROFILE_TOP_ALLOCATIONS = 25
+
+def format_bytes(size):
+    if size >= 1024 * 1024:
+        return f"{size / (1024 * 1024):.1f}MB"
+    return f"{size / 1024:.1f}KB"
+
+class Span:
+    """One timed operation; attributes can be set while it runs"""
+
+    def __init__(self, tracer, name, parent_id, attributes):
+        self.tracer = tracer
+        self.name = name
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.attributes = dict(attributes)
+        self.status = 'OK'
+        self.error = None
+        self.start_ns = time.time_ns()
+        self._start = time.perf_counter()
+        self.seconds = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def to_dict(self):
+        return {
+            'traceId': self.tracer.trace_id,
+            'spanId': self.span_id,
+            'parentSpanId': self.parent_id,
+            'name': self.name,
+            'startTimeUnixNano': self.start_ns,
+            'endTimeUnixNano': self.start_ns + int((self.seconds or 0) * 1e9),
+            'durationMs': round((self.seconds or 0) * 1000, 3),
+            'attributes': self.attributes,
+            'status': {'code': self.status, **({'message': self.error} if self.error else {})},
+        }
+
+class Tracer:
+    """
+    Thread-safe collector of spans for one run
+
+    Spans nest per thread; a span opened in a worker thread with no open
+    parent hangs off the first span of the run, or off an explicit
+    parent (a span id from current_span_id in the submitting thread).
+    With a Profiler, spans opened with profile=True are profiled.
+    """
+
+    def __init__(self, profiler=None):
+        self.trace_id = secrets.token_hex(16)
+        self.profiler = profiler
+        self.spans = []
+        self.root_id = None
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _stack(self):
+        if not hasattr(self._local, 'stack'):
+            self._local.stack = []
+        return self._local.stack
+
+    def current_span_id(self):
+        stack = self._stack()
+        return stack[-1].span_id if stack else self.root_id
+
+    @contextmanager
+    def span(self, name, parent=None, profile=False, **attributes):
+        """Time the enclosed block as a span; yields the Span so attributes can be set"""
+        stack = self._stack()
+        span = Span(self, name, parent or self.current_span_id(), attributes)
+        with self._lock:
+            if self.root_id is None:
+                self.root_id = span.span_id
+        stack.append(span)
+        profiling = profile and self.profiler is not None and self.profiler.start(name)
+        try:
+            yield span
+        except BaseException as e:
+            span.status, span.error = 'ERROR', f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            if profiling:
+                self.profiler.stop(name)
+            span.seconds = time.perf_counter() - span._start
+            stack.pop()
+            with self._lock:
+                self.spans.append(span)
+
+    def summary(self):
+        """Per stage: span count, total and max seconds, errors and summed counters"""
+        stages = {}
+        with self._lock:
+            spans = list(self.spans)
+        for span in spans:
+            stage = stages.setdefault(span.name, {'count': 0, 'seconds': 0.0, 'max_seconds': 0.0, 'errors': 0})
+            stage['count'] += 1
+            stage['seconds'] += span.seconds
+            stage['max_seconds'] = max(stage['max_seconds'], span.seconds)
+            stage['errors'] += span.status == 'ERROR'
+            for key in SUMMED_ATTRIBUTES:
+                value = span.attributes.get(key)
+                if isinstance(value, (int, float)):
+                    stage[key] = stage.get(key, 0) + value
+        return stages
+
+    def write(self, trace_dir=DEFAULT_TRACE_DIR, resource=None):
+        """Write the spans and summary to trace_dir/trace_<time>.json and return its path"""
+        os.makedirs(trace_dir, exist_ok=True)
+        path = os.path.join(trace_dir, f"trace_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{self.trace_id[:8]}.json")
+        with self._lock:
+            spans = sorted(self.spans, key=lambda span: span.start_ns)
+        document = {
+            'resourceSpans': [{
+                'resource': {'attributes': {'service.name': SERVICE_NAME, **(resource or {})}},
+                'scopeSpans': [{'scope': {'name': 'run_trace'}, 'spans': [span.to_dict() for span in spans]}],
+            }],
+            'summary': self.summary(),
+        }
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(document, f, indent=1, default=str)
+        os.replace(tmp_path, path)
+        return path
+
+    def print_summary(self):
+        """Print time and counters per stage, slowest first"""
+        stages = self.summary()
+        if not stages:
+            return
+        print("\n" + "="*60)
+        print("🔬 STAGE TIMING")
+        print("="*60)
+        for name, stage in sorted(stages.items(), key=lambda item: -item[1]['seconds']):
+            counters = "  ".join(
+                f"{key}={format_bytes(stage[key])}" if key == 'bytes' else f"{key}={stage[key]:,}"
+                for key in SUMMED_ATTRIBUTES if key in stage
+            )
+            errors = f"  ❌ {stage['errors']}" if stage['errors'] else ""
+            print(
+                f"{name:<14} {stage['count']:>5}x  {stage['seconds']:>8.2f}s total  "
+                f"{stage['max_seconds']:>7.2f}s max  {counters}{errors}"
+            )
+
+class Profiler:
+    """
+    cProfile and tracemalloc for the hot stages of a run
+
+    Only spans in the main thread are profiled (the outermost profiled
+    span wins) and the results are merged per stage name: before Python
+    3.12 cProfile only sees the thread it is enabled in, and from 3.12 on
+    only one profile can be active in the whole process. Spans in other
+    threads are still traced, just not profiled. tracemalloc traces the
+    whole process from when the Profiler is created until write().
+    """
+
+    def __init__(self):
+        self.stats = {}
+        self._lock = threading.Lock()
+        self._profile = None
+        tracemalloc.start()
+
+    def start(self, name):
+        if threading.current_thread() is not threading.main_thread() or self._profile is not None:
+            return False
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Another profiling tool is active (e.g. the run is under python -m cProfile)
+            return False
+        self._profile = profile
+        return True
+
+    def stop(self, name):
+        profile, self._profile = self._profile, None
+        profile.disable()
+        with self._lock:
+            if name in self.stats:
+                self.stats[name].add(profile)
+            else:
+                self.stats[name] = pstats.Stats(profile)
+
+    def write(self, directory):
+        """
+        Write one .prof file per stage (for snakeviz/pstats), plus
+        profile.txt with the top functions per stage and the top
+        allocation sites; returns the directory
+        """
+        os.makedirs(directory, exist_ok=True)
+        # The profiler's own bookkeeping is not part of the run
+        snapshot = tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, module.__file__) for module in (cProfile, pstats, tracemalloc)
+        ])
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        report = io.StringIO()
+        for name, stats in sorted(self.stats.items()):
+            stats.dump_stats(os.path.join(directory, f"{name}.prof"))
+            report.write(f"{'='*60}\n{name}: top {PROFILE_TOP_FUNCTIONS} functions by cumulative time\n{'='*60}\n")
+            stats.stream = report
+            stats.sort_stats('cumulative').print_stats(PROFILE_TOP_FUNCTIONS)
+
+        report.write(f"{'='*60}\nMemory: peak {peak / (1024 * 1024):.1f} MB, still allocated {current / (1024 * 1024):.1f} MB\n")
+        report.write(f"Top {PROFILE_TOP_ALLOCATIONS} allocation sites\n{'='*60}\n")
+        for stat in snapshot.statistics('lineno')[:PROFILE_TOP_ALLOCATIONS]:
+            report.write(f"{stat}\n")
+
+        with open(os.path.join(directory, 'profile.txt'), 'w') as f:
+            f.write(report.getvalue())
+        return directory
+
+_default_tracer = Tracer()
+_default_lock = threading.Lock()
+
+def get_tracer():
+    """Return the process-wide tracer"""
+    with _default_lock:
+        return _default_tracer
+
+def set_tracer(tracer):
+    """Replace the process-wide tracer, e.g. with one that profiles"""
+    global _default_tracer
+    with _default_lock:
+        _default_tracer = tracer
+    return tracer
@@ -6,12 +6,33 @@ Automatically extracts stock holdings from Indian AMC websites
 
 import os
 import json
+import hashlib
+import argparse
 import pandas as pd
-import requests
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 from io import StringIO
 import time
 
+from http_client import (
+    HTTPClient, get_client, set_client, DEFAULT_CONNECT_TIMEOUT, DEFAULT_READ_TIMEOUT, DEFAULT_MAX_RETRIES,
+    DEFAULT_HOST_DELAY,
+)
+from http_cache import HTTPCache, DEFAULT_CACHE_DIR, DEFAULT_TTL_SECONDS, DEFAULT_MAX_BYTES
+from run_manifest import RunManifest, fingerprint_source, DEFAULT_STATE_DIR
+from extraction_cache import ExtractionCache, extraction_key, DEFAULT_MAX_ENTRIES
+from chunked_extraction import (
+    split_source, extract_chunks, merge_holdings, make_llm_slots,
+    DEFAULT_CHUNK_CHARS, DEFAULT_LLM_WORKERS,
+)
+from holdings_writer import HoldingsWriter, PARQUET_AVAILABLE, LATEST_FILE, LATEST_PARQUET_FILE
+from holdings_history import HoldingsHistory, DEFAULT_HISTORY_DB
+from file_ingestion import FileIngestor, find_portfolio_links, DEFAULT_FILE_WORKERS, DEFAULT_MAX_FILES
+from amc_profiles import get_profile, table_rows
+from amfi_master import load_amfi_master, DEFAULT_MAX_AGE_SECONDS as DEFAULT_AMFI_MAX_AGE
+from run_trace import Tracer, Profiler, get_tracer, set_tracer, DEFAULT_TRACE_DIR
+from run_checkpoint import RunCheckpoint
+
 # Load environment variables from .env file if it exists
 try:
     from dotenv import load_dotenv
@@ -28,6 +49,79 @@ except ImportError:
     print("⚠️  ScrapegraphAI not available, using basic scraping")
     USE_AI = False
 
+# Shared on-disk HTTP cache, set up by main (None = always download)
+HTTP_CACHE = None
+
+# Persistent LLM extraction cache, set up by main (None = always extract)
+EXTRACTION_CACHE = None
+
+# Parser for linked XLSX/XLS/PDF portfolio files, set up by main (None = pages only)
+FILE_INGESTOR = None
+
+# AMFI scheme master lookup service, set up by main (None = keep scraped scheme names)
+AMFI_MASTER = None
+
+# Chunk size for large documents and the cap on LLM calls in flight across all AMCs
+CHUNK_CHARS = DEFAULT_CHUNK_CHARS
+LLM_WORKERS = DEFAULT_LLM_WORKERS
+LLM_SLOTS = make_llm_slots(DEFAULT_LLM_WORKERS)
+
+EXTRACTION_PROMPT = """Extract all stock holdings from this mutual fund portfolio. 
+            For each stock, extract:
+            - Scheme Name (name of the mutual fund scheme)
+            - Stock Name (company name)
+            - ISIN code (12-character code)
+            - Quantity (number of shares held)
+            - Market Value (in rupees)
+            - Weight or Percentage of portfolio
+            - Portfolio Date (the "as on" date of the portfolio, if shown)
+            
+            Return as a structured list of dictionaries.
+            If data is in PDF, extract from tables.
+            """
+
+def fetch_text(url):
+    """Fetch a URL as text, through the HTTP cache when it is enabled"""
+    with get_tracer().span('fetch', url=url) as span:
+        if HTTP_CACHE is not None:
+            text = HTTP_CACHE.get_text(url)
+        else:
+            response = get_client().get(url)
+            response.raise_for_status()
+            text = response.text
+        span.set(bytes=len(text.encode('utf-8')))
+        return text
+
+# Version of every file downloaded without the HTTP cache and not yet fingerprinted (see linked_file_version)
+FILE_VERSIONS = {}
+
+def response_version(response, content=None):
+    """ETag/Last-Modified of a response, or the digest of content if the server sends neither"""
+    validators = [response.headers.get('ETag'), response.headers.get('Last-Modified')]
+    if any(validators):
+        return '|'.join(value or '' for value in validators)
+    return None if content is None else hashlib.sha256(content).hexdigest()
+
+def fetch_bytes(url):
+    """Fetch a URL as raw bytes (for portfolio files), through the HTTP cache when it is enabled"""
+    with get_tracer().span('fetch', url=url) as span:
+        if HTTP_CACHE is not None:
+            content = HTTP_CACHE.get(url)
+        else:
+            response = get_client().get(url)
+            response.raise_for_status()
+            content = response.content
+            FILE_VERSIONS[url] = response_version(response, content)
+        span.set(bytes=len(content))
+        return content
+
+def read_html_tables(content):
+    """pd.read_html on a fetched page, timed as its own stage"""
+    with get_tracer().span('parse_html', bytes=len(content)) as span:
+        found = pd.read_html(StringIO(content))
+        span.set(tables=len(found))
+        return found
+
 def get_groq_config():
     """Get Groq API configuration"""
     api_key = os.environ.get('GROQ_API_KEY')
@@ -58,53 +152,123 @@ def load_amc_urls():
             "ICICI Prudential MF": "https://www.icicipruamc.com/downloads/portfolio",
         }
 
-def get_amfi_scheme_master():
-    """Download complete scheme master list from AMFI"""
-    print("\n📥 Downloading scheme master list from AMFI...")
+def get_amfi_scheme_master(state_dir=DEFAULT_STATE_DIR, max_age=DEFAULT_AMFI_MAX_AGE, offline=False):
+    """Load the AMFI scheme master (stored between runs, refreshed from AMFI when stale)"""
+    print("\n📥 Loading scheme master list from AMFI...")
     
     try:
-        url = "https://portal.amfiindia.com/DownloadSchemeData_Po.aspx?mf=0"
-        response = requests.get(url, timeout=30)
-        response.raise_for_status()
-        
-        # Parse CSV
-        df = pd.read_csv(StringIO(response.text), sep=';')
-        
-        print(f"✅ Found {len(df)} schemes from {df['AMC Name'].nunique()} AMCs")
-        return df
+        with get_tracer().span('amfi_master', profile=True) as span:
+            master = load_amfi_master(state_dir, max_age=max_age, offline=offline)
+            span.set(rows=len(master))
+        print(f"✅ Found {len(master)} schemes from {master.num_amcs} AMCs")
+        return master
     
     except Exception as e:
         print(f"❌ Error downloading AMFI data: {e}")
-        return pd.DataFrame()
+        return None
 
-def scrape_amc_portfolio_ai(amc_name, url, config):
-    """Scrape portfolio using AI (ScrapegraphAI)"""
-    print(f"\n🤖 AI-scraping {amc_name}...")
+def apply_scheme_master(amc_name, holdings):
+    """
+    Give holdings AMFI's scheme names and check fund unit ISINs against AMFI
     
+    Each distinct scraped scheme name is looked up once; names AMFI does
+    not know are kept as scraped. Mutual fund unit ISINs (INF...) that
+    AMFI does not list are reported.
+    """
+    names = {holding['scheme_name'] for holding in holdings if isinstance(holding.get('scheme_name'), str)}
+    resolved = {name: AMFI_MASTER.resolve_scheme_name(name) for name in names}
+    for holding in holdings:
+        canonical = resolved.get(holding.get('scheme_name'))
+        if canonical:
+            holding['scheme_name'] = canonical
+    
+    unknown = {
+        str(holding['isin']).strip().upper() for holding in holdings
+        if str(holding.get('isin') or '').strip().upper().startswith('INF')
+    }
+    unknown = {isin for isin in unknown if not AMFI_MASTER.is_known_isin(isin)}
+    matched = sum(1 for canonical in resolved.values() if canonical)
+    print(f"🔗 {amc_name}: {matched} of {len(names)} schemes matched the AMFI master")
+    if unknown:
+        print(f"⚠️  {amc_name}: {len(unknown)} fund unit ISINs not in the AMFI master")
+
+def get_total_tokens(graph):
+    """Return the total tokens a finished ScrapegraphAI run used, if it reports them"""
     try:
+        for info in graph.get_execution_info():
+            if info.get('node_name') == 'TOTAL RESULT':
+                return int(info.get('total_tokens', 0))
+    except Exception:
+        pass
+    return None
+
+def run_llm_extraction(source, config, cacheable=True, parent=None):
+    """
+    Run one SmartScraperGraph extraction, through the extraction cache when enabled
+    parent is the span of the AMC when this runs in a chunk worker thread
+    """
+    model = config['llm']['model']
+    with get_tracer().span('llm', parent=parent, model=model, chars=len(source)) as span:
+        cache_key = None
+        if EXTRACTION_CACHE is not None and cacheable:
+            cache_key = extraction_key(EXTRACTION_PROMPT, model, source)
+            result = EXTRACTION_CACHE.get(cache_key)
+            if result is not None:
+                span.set(cache_hit=True, holdings=len(result))
+                return result
+        
         smart_scraper = SmartScraperGraph(
-            prompt="""Extract all stock holdings from this mutual fund portfolio. 
-            For each stock, extract:
-            - Scheme Name (name of the mutual fund scheme)
-            - Stock Name (company name)
-            - ISIN code (12-character code)
-            - Quantity (number of shares held)
-            - Market Value (in rupees)
-            - Weight or Percentage of portfolio
-            
-            Return as a structured list of dictionaries.
-            If data is in PDF, extract from tables.
-            """,
-            source=url,
+            prompt=EXTRACTION_PROMPT,
+            source=source,
             config=config
         )
         
+        start = time.perf_counter()
         result = smart_scraper.run()
+        tokens = get_total_tokens(smart_scraper)
+        span.set(cache_hit=False, latency_seconds=time.perf_counter() - start, tokens=tokens or 0)
         
         if isinstance(result, dict) and 'stocks' in result:
             result = result['stocks']
+        if isinstance(result, list):
+            span.set(holdings=len(result))
+        
+        # Only cache real extractions, an empty result may be a transient failure
+        if cache_key is not None and isinstance(result, list) and result:
+            EXTRACTION_CACHE.put(
+                cache_key, model, result,
+                seconds=time.perf_counter() - start,
+                tokens=tokens
+            )
+        
+        return result
+
+def scrape_amc_portfolio_ai(amc_name, url, config, content=None):
+    """Scrape portfolio using AI (ScrapegraphAI)"""
+    print(f"\n🤖 AI-scraping {amc_name}...")
+    
+    try:
+        # Hand an already fetched page to the model instead of the URL,
+        # split into table-level chunks when it is too big for one prompt
+        if content is not None:
+            chunks = split_source(content, max_chars=CHUNK_CHARS)
+        else:
+            chunks = [url]
+        
+        if len(chunks) > 1:
+            print(f"✂️  Split {amc_name} into {len(chunks)} chunks")
         
-        if isinstance(result, list) and len(result) > 0:
+        # Chunks are extracted in worker threads, their spans belong to this AMC
+        parent = get_tracer().current_span_id()
+        results = extract_chunks(
+            chunks,
+            lambda chunk: run_llm_extraction(chunk, config, cacheable=content is not None, parent=parent),
+            LLM_SLOTS,
+            max_workers=LLM_WORKERS
+        )
+        result = merge_holdings(results)
+        
+        if len(result) > 0:
             print(f"✅ Extracted {len(result)} holdings from {amc_name}")
             return result
         else:
@@ -115,13 +279,16 @@ def scrape_amc_portfolio_ai(amc_name, url, config):
         print(f"❌ Error scraping {amc_name}: {e}")
         return []
 
-def scrape_amc_portfolio_basic(amc_name, url):
+def scrape_amc_portfolio_basic(amc_name, url, content=None):
     """Basic scraping fallback (without AI)"""
     print(f"\n📄 Basic scraping {amc_name}...")
     
     try:
+        if content is None:
+            content = fetch_text(url)
+        
         # Try to get HTML tables
-        tables = pd.read_html(url)
+        tables = read_html_tables(content)
         
         if tables:
             print(f"✅ Found {len(tables)} tables from {amc_name}")
@@ -137,90 +304,526 @@ def scrape_amc_portfolio_basic(amc_name, url):
         print(f"❌ Error scraping {amc_name}: {e}")
         return []
 
-def main():
-    """Main scraping function"""
-    print("="*60)
-    print("🚀 MUTUAL FUND HOLDINGS SCRAPER")
-    print("="*60)
-    print(f"📅 Run Date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-    
-    # Get AMFI scheme master
-    schemes_df = get_amfi_scheme_master()
+def scrape_amc_portfolio_profile(amc_name, url, content, profile):
+    """Parse an AMC's portfolio files (or page tables) with its registered layout profile (no AI)"""
+    print(f"\n🧩 Profile parsing {amc_name}...")
     
-    # Load AMC URLs
-    amc_urls = load_amc_urls()
-    print(f"\n📋 Configured to scrape {len(amc_urls)} AMCs")
+    try:
+        holdings = []
+        if FILE_INGESTOR is not None:
+            links = find_portfolio_links(content, url, max_files=FILE_INGESTOR.max_files)
+            holdings = FILE_INGESTOR.ingest(amc_name, links, profile=profile)
+        
+        if not holdings and profile.page_tables:
+            for table in read_html_tables(content):
+                holdings.extend(profile.parse_grid(table_rows(table))[0])
+        
+        if holdings:
+            print(f"✅ Parsed {len(holdings)} holdings from {amc_name} with its layout profile")
+        else:
+            print(f"⚠️  {amc_name} layout profile matched nothing")
+        return holdings
     
-    # Get AI config if available
-    config = None
-    if USE_AI:
-        try:
-            config = get_groq_config()
-            print("✅ AI scraping enabled (using Groq)")
-        except ValueError as e:
-            print(f"⚠️  {e}")
-            print("⚠️  Falling back to basic scraping")
+    except Exception as e:
+        print(f"❌ Error profile parsing {amc_name}: {e}")
+        return []
+
+def scrape_amc_portfolio_files(amc_name, url, content):
+    """Parse the portfolio spreadsheets and PDFs linked from an AMC page (no AI)"""
+    links = find_portfolio_links(content, url, max_files=FILE_INGESTOR.max_files)
+    if not links:
+        return []
     
-    # Scrape all AMCs
-    all_holdings = []
+    print(f"\n📑 Parsing {len(links)} portfolio files linked from {amc_name}...")
+    holdings = FILE_INGESTOR.ingest(amc_name, links)
+    if holdings:
+        print(f"✅ Parsed {len(holdings)} holdings from {amc_name} files")
+    else:
+        print(f"⚠️  No holdings found in {amc_name} files")
+    return holdings
+
+def linked_file_version(url, downloaded=False):
+    """
+    Version of a linked portfolio file, for the run manifest
+
+    Through the HTTP cache the file is revalidated and the digest of its
+    body is used (parsing then reads it from disk). Without the cache,
+    downloaded means the file was just fetched for extraction and the
+    ETag/Last-Modified (or body digest) of that download are used;
+    otherwise a HEAD request gives them, and the file is downloaded only
+    if the server sends neither.
+    """
+    try:
+        if HTTP_CACHE is not None:
+            HTTP_CACHE.get(url)
+            return (HTTP_CACHE.lookup(url) or {}).get('sha256', '')
+        version = FILE_VERSIONS.pop(url, None) if downloaded else None
+        if version is not None:
+            return version
+        response = get_client().request('HEAD', url, allow_redirects=True)
+        version = response_version(response) if response.ok else None
+        if version is not None:
+            return version
+        fetch_bytes(url)
+        return FILE_VERSIONS.pop(url)
+    except Exception as e:
+        # An unreachable file never matches, so the AMC is re-extracted once it is back
+        return f"unavailable: {e}"
+
+def source_fingerprint(url, content, downloaded=False):
+    """
+    Fingerprint of an AMC's page together with every portfolio file linked from it
+    downloaded is set after extraction, when the files were just fetched
+    """
+    fingerprint = fingerprint_source(content)
+    if FILE_INGESTOR is None:
+        return fingerprint
+    links = find_portfolio_links(content, url, max_files=FILE_INGESTOR.max_files)
+    if not links:
+        return fingerprint
+    versions = [fingerprint] + [f"{link} {linked_file_version(link, downloaded)}" for link in links]
+    return hashlib.sha256('\n'.join(versions).encode('utf-8')).hexdigest()
+
+def scrape_amc(amc_name, url, config=None, manifest=None, incremental=True):
+    """
+    Scrape a single AMC and return a result dict with holdings and timing
     
-    for amc_name, url in amc_urls.items():
+    AMCs with a registered layout profile are parsed with it first, then
+    linked portfolio files generically; AI (or basic) scraping of the page
+    is only used when those give no holdings. result['method'] records the
+    path that produced the holdings. With a run manifest, holdings are
+    reused instead of re-extracted when the page and the portfolio files
+    it links to have the same fingerprint as last time (unless incremental
+    is False), and freshly extracted holdings are recorded for the next
+    run. An AMC without a manifest entry has nothing to compare with, so
+    its fingerprint is only taken after extraction, from the files it
+    just downloaded. Requests are
+    rate limited per host by the shared HTTP client
+    """
+    with get_tracer().span('amc', profile=True, amc=amc_name) as span:
+        start = time.perf_counter()
+        result = {
+            'amc': amc_name, 'url': url, 'holdings': [], 'seconds': 0.0,
+            'error': None, 'reused': False, 'method': None,
+        }
+        
         try:
-            # Use AI scraping if available, otherwise basic
-            if USE_AI and config:
-                holdings = scrape_amc_portfolio_ai(amc_name, url, config)
-            else:
-                holdings = scrape_amc_portfolio_basic(amc_name, url)
+            # Layout profile, then linked files, then AI scraping if available, otherwise basic
+            profile = get_profile(amc_name)
+            page_method = 'ai' if USE_AI and config else 'basic'
+            methods = (
+                (['profile'] if profile is not None else [])
+                + (['files'] if FILE_INGESTOR is not None else [])
+                + [page_method]
+            )
+            
+            content = None
+            if manifest is not None or HTTP_CACHE is not None or FILE_INGESTOR is not None or profile is not None:
+                content = fetch_text(url)
+            
+            holdings = None
+            fingerprint = None
+            if manifest is not None and incremental and amc_name in manifest.entries:
+                fingerprint = source_fingerprint(url, content)
+                for method in methods:
+                    holdings = manifest.lookup(amc_name, fingerprint, method)
+                    if holdings is not None:
+                        print(f"\n♻️  {amc_name} unchanged since last run, reusing {len(holdings)} holdings")
+                        result['reused'] = True
+                        result['method'] = method
+                        break
             
-            # Add metadata to each holding
+            if holdings is None:
+                for method in methods:
+                    if method == 'profile':
+                        holdings = scrape_amc_portfolio_profile(amc_name, url, content, profile)
+                    elif method == 'files':
+                        holdings = scrape_amc_portfolio_files(amc_name, url, content)
+                    elif method == 'ai':
+                        holdings = scrape_amc_portfolio_ai(amc_name, url, config, content)
+                    else:
+                        holdings = scrape_amc_portfolio_basic(amc_name, url, content)
+                    if holdings:
+                        break
+                result['method'] = method
+                
+                if manifest is not None and holdings:
+                    if fingerprint is None:
+                        fingerprint = source_fingerprint(url, content, downloaded=True)
+                    manifest.record(amc_name, url, fingerprint, method, holdings)
+            
+            # Add metadata to each holding (holdings from files keep the file as their source)
+            scraped_date = datetime.now().strftime('%Y-%m-%d')
             for holding in holdings:
                 holding['amc'] = amc_name
-                holding['scraped_date'] = datetime.now().strftime('%Y-%m-%d')
-                holding['source_url'] = url
+                holding['scraped_date'] = scraped_date
+                holding.setdefault('source_url', url)
             
-            all_holdings.extend(holdings)
+            if AMFI_MASTER is not None and holdings:
+                apply_scheme_master(amc_name, holdings)
             
-            # Rate limiting - be nice to servers
-            time.sleep(2)
+            result['holdings'] = holdings
         
         except Exception as e:
             print(f"❌ Failed to scrape {amc_name}: {e}")
-            continue
-    
-    # Create DataFrame
-    if all_holdings:
-        df = pd.DataFrame(all_holdings)
-        
-        # Standardize column names
-        df.columns = df.columns.str.lower().str.replace(' ', '_').str.replace('%', 'percent')
+            result['error'] = str(e)
         
+        result['seconds'] = time.perf_counter() - start
+        span.set(method=result['method'], holdings=len(result['holdings']), reused=result['reused'])
+        if result['error']:
+            span.status, span.error = 'ERROR', result['error']
+    return result
+
+def scrape_all_amcs(amc_urls, config=None, workers=1, manifest=None, incremental=True, on_result=None):
+    """
+    Scrape every AMC, optionally with a bounded pool of worker threads
+    
+    workers caps how many AMCs are scraped at once (1 = sequential); the
+    gap between hits to the same host is kept by the shared HTTP client.
+    on_result is called with each result as soon as its AMC completes; the
+    holdings are then released and only their count is kept in the result.
+    """
+    results = {}
+    
+    def finish(result):
+        result['num_holdings'] = len(result['holdings'])
+        if on_result is not None:
+            on_result(result)
+            result['holdings'] = []
+        results[result['amc']] = result
+    
+    if workers <= 1:
+        for amc_name, url in amc_urls.items():
+            finish(scrape_amc(amc_name, url, config, manifest, incremental))
+    else:
+        print(f"⚡ Concurrent mode: {workers} workers, {get_client().rate_limiter.min_interval}s per-host delay")
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                executor.submit(scrape_amc, amc_name, url, config, manifest, incremental): amc_name
+                for amc_name, url in amc_urls.items()
+            }
+            for future in as_completed(futures):
+                result = future.result()
+                finish(result)
+                print(f"⏱️  {result['amc']} finished in {result['seconds']:.1f}s")
+    
+    # Keep the configured AMC order regardless of completion order
+    return [results[amc_name] for amc_name in amc_urls]
+
+def print_timing_report(results, wall_seconds):
+    """Print per-AMC timing for a scrape run"""
+    print("\n" + "="*60)
+    print("⏱️  PER-AMC TIMING")
+    print("="*60)
+    
+    for result in sorted(results, key=lambda r: r['seconds'], reverse=True):
+        if result['error']:
+            status = "❌"
+        elif result.get('resumed'):
+            status = "⏭️ "
+        elif result['reused']:
+            status = "♻️ "
+        else:
+            status = "✅" if result['num_holdings'] else "⚠️ "
+        print(
+            f"{status} {result['amc']:<40} {result.get('method') or '-':<8} "
+            f"{result['seconds']:>7.1f}s  {result['num_holdings']:>6} holdings"
+        )
+    
+    # Which extraction path each AMC took, and what it cost in total
+    by_method = {}
+    for result in results:
+        count, seconds = by_method.get(result.get('method') or '-', (0, 0.0))
+        by_method[result.get('method') or '-'] = (count + 1, seconds + result['seconds'])
+    print("\n" + "  ".join(f"{method}: {count} AMCs in {seconds:.1f}s" for method, (count, seconds) in by_method.items()))
+    
+    total_seconds = sum(result['seconds'] for result in results)
+    print(f"\nWall-clock time: {wall_seconds:.1f}s (sum of per-AMC time: {total_seconds:.1f}s)")
+    
+    reused = sum(1 for result in results if result['reused'])
+    if reused:
+        print(f"♻️  Reused {reused} unchanged AMCs, extracted {len(results) - reused} AMCs")
+    
+    resumed = sum(1 for result in results if result.get('resumed'))
+    if resumed:
+        print(f"⏭️  Took {resumed} AMCs from the checkpoint of the interrupted run")
+
+def parse_args(argv=None):
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description="Mutual Fund Holdings Scraper")
+    parser.add_argument(
+        '--workers', type=int, default=1,
+        help="Number of AMCs to scrape at once (default: 1, sequential)"
+    )
+    parser.add_argument(
+        '--host-delay', type=float, default=DEFAULT_HOST_DELAY,
+        help="Minimum seconds between requests (retries and linked files included) to the same host (default: %(default)s)"
+    )
+    parser.add_argument(
+        '--connect-timeout', type=float, default=DEFAULT_CONNECT_TIMEOUT,
+        help="Seconds to wait for a connection to a website (default: %(default)s)"
+    )
+    parser.add_argument(
+        '--read-timeout', type=float, default=DEFAULT_READ_TIMEOUT,
+        help="Seconds to wait for a website to send data (default: %(default)s)"
+    )
+    parser.add_argument(
+        '--retries', type=int, default=DEFAULT_MAX_RETRIES,
+        help="Retries for timeouts, rate limits (429) and server errors (5xx) (default: %(default)s)"
+    )
+    parser.add_argument(
+        '--cache-dir', default=DEFAULT_CACHE_DIR,
+        help=f"Directory for the on-disk HTTP cache (default: {DEFAULT_CACHE_DIR})"
+    )
+    parser.add_argument(
+        '--cache-ttl', type=float, default=DEFAULT_TTL_SECONDS / 3600,
+        help="Hours a cached page is used without revalidation (default: %(default)s)"
+    )
+    parser.add_argument(
+        '--cache-max-mb', type=float, default=DEFAULT_MAX_BYTES / (1024 * 1024),
+        help="Maximum HTTP cache size in MB before old entries are evicted (default: %(default)s)"
+    )
+    parser.add_argument(
+        '--no-cache', action='store_true',
+        help="Always download pages instead of using the HTTP cache"
+    )
+    parser.add_argument(
+        '--offline', action='store_true',
+        help="Serve every page from the HTTP cache and never touch the network"
+    )
+    parser.add_argument(
+        '--state-dir', default=DEFAULT_STATE_DIR,
+        help=f"Directory for the run manifest and stored holdings (default: {DEFAULT_STATE_DIR})"
+    )
+    parser.add_argument(
+        '--amfi-max-age', type=float, default=DEFAULT_AMFI_MAX_AGE / 3600,
+        help="Hours the stored AMFI scheme master is used before checking AMFI for a new one (default: %(default)s)"
+    )
+    parser.add_argument(
+        '--resume', action='store_true',
+        help="Continue this month's interrupted run: only scrape AMCs that are missing or failed"
+    )
+    parser.add_argument(
+        '--full', action='store_true',
+        help="Re-extract every AMC even if its portfolio page has not changed"
+    )
+    parser.add_argument(
+        '--llm-cache-size', type=int, default=DEFAULT_MAX_ENTRIES,
+        help="Maximum cached LLM extraction results, 0 disables the cache (default: %(default)s)"
+    )
+    parser.add_argument(
+        '--llm-workers', type=int, default=DEFAULT_LLM_WORKERS,
+        help="Maximum LLM calls in flight across all AMCs (default: %(default)s)"
+    )
+    parser.add_argument(
+        '--chunk-chars', type=int, default=DEFAULT_CHUNK_CHARS,
+        help="Split pages larger than this many characters into chunks for the LLM (default: %(default)s)"
+    )
+    parser.add_argument(
+        '--file-workers', type=int, default=DEFAULT_FILE_WORKERS,
+        help="Processes parsing portfolio spreadsheets and PDFs (default: %(default)s, one per core)"
+    )
+    parser.add_argument(
+        '--max-files', type=int, default=DEFAULT_MAX_FILES,
+        help="Maximum portfolio files parsed per AMC page (default: %(default)s)"
+    )
+    parser.add_argument(
+        '--no-files', action='store_true',
+        help="Do not look for linked XLSX/XLS/PDF portfolio files, only scrape the pages"
+    )
+    parser.add_argument(
+        '--trace-dir', default=DEFAULT_TRACE_DIR,
+        help=f"Directory for the JSON timing trace of each run (default: {DEFAULT_TRACE_DIR})"
+    )
+    parser.add_argument(
+        '--profile', action='store_true',
+        help="Also profile the hot stages with cProfile and tracemalloc (slower, implies --workers 1)"
+    )
+    parser.add_argument(
+        '--format', choices=['csv', 'parquet', 'both'], default='both',
+        help="Output file format; Parquet needs pyarrow (default: %(default)s)"
+    )
+    parser.add_argument(
+        '--history-db', default=DEFAULT_HISTORY_DB,
+        help=f"SQLite database that every run is appended to (default: {DEFAULT_HISTORY_DB})"
+    )
+    parser.add_argument(
+        '--no-history', action='store_true',
+        help="Do not append this run to the history database"
+    )
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    """
+    Main scraping function
+    Returns {format: path} of the output files, or None if nothing was
+    extracted; the holdings are streamed to those files, not kept in memory
+    """
+    global HTTP_CACHE, EXTRACTION_CACHE, FILE_INGESTOR, AMFI_MASTER, CHUNK_CHARS, LLM_WORKERS, LLM_SLOTS
+    args = parse_args(argv)
+    
+    CHUNK_CHARS = args.chunk_chars
+    LLM_WORKERS = max(1, args.llm_workers)
+    LLM_SLOTS = make_llm_slots(LLM_WORKERS)
+    
+    if args.offline and args.no_cache:
+        raise SystemExit("❌ --offline needs the HTTP cache, it cannot be combined with --no-cache")
+    
+    client = set_client(HTTPClient(
+        connect_timeout=args.connect_timeout, read_timeout=args.read_timeout, max_retries=args.retries,
+        host_delay=args.host_delay
+    ))
+    
+    if not args.no_cache:
+        HTTP_CACHE = HTTPCache(
+            cache_dir=args.cache_dir,
+            ttl=args.cache_ttl * 3600,
+            max_bytes=int(args.cache_max_mb * 1024 * 1024),
+            offline=args.offline,
+            client=client,
+        )
+    
+    print("="*60)
+    print("🚀 MUTUAL FUND HOLDINGS SCRAPER")
+    print("="*60)
+    print(f"📅 Run Date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    
+    # Every stage below is timed into the run trace; --profile also profiles the hot ones
+    if args.profile and args.workers > 1:
+        # Only the main thread is profiled, so AMCs are scraped in it one at a time
+        print("ℹ️  --profile scrapes one AMC at a time (--workers 1)")
+        args.workers = 1
+    tracer = set_tracer(Tracer(Profiler() if args.profile else None))
+    try:
+        with tracer.span('run', workers=args.workers, offline=args.offline, full=args.full):
+            # Get AMFI scheme master
+            AMFI_MASTER = get_amfi_scheme_master(args.state_dir, args.amfi_max_age * 3600, args.offline)
+            
+            # Load AMC URLs
+            amc_urls = load_amc_urls()
+            print(f"\n📋 Configured to scrape {len(amc_urls)} AMCs")
+            
+            # Get AI config if available
+            config = None
+            if USE_AI:
+                try:
+                    config = get_groq_config()
+                    print("✅ AI scraping enabled (using Groq)")
+                except ValueError as e:
+                    print(f"⚠️  {e}")
+                    print("⚠️  Falling back to basic scraping")
+            
+            # Scrape all AMCs - rate limiting is per host to be nice to servers
+            manifest = RunManifest(args.state_dir)
+            
+            if config and args.llm_cache_size > 0:
+                EXTRACTION_CACHE = ExtractionCache(
+                    os.path.join(args.state_dir, 'extraction_cache.db'), max_entries=args.llm_cache_size
+                )
+            
+            # Each AMC's holdings are appended to the output as soon as it completes, in configured order on close
+            formats = ['csv', 'parquet'] if args.format == 'both' else [args.format]
+            if 'parquet' in formats and not PARQUET_AVAILABLE:
+                print("⚠️  pyarrow not installed, writing CSV only")
+                formats = ['csv']
+            history = None if args.no_history else HoldingsHistory(args.history_db)
+            if not args.no_files:
+                FILE_INGESTOR = FileIngestor(fetch_bytes, workers=args.file_workers, max_files=args.max_files)
+            
+            # Every finished AMC is checkpointed, so a killed run can be resumed with --resume
+            checkpoint = RunCheckpoint(args.state_dir)
+            output_stem = f"mutual_fund_holdings_{datetime.now().strftime('%Y%m%d')}"
+            if args.resume and checkpoint.resumable():
+                output_stem = checkpoint.output_stem
+                pending = {amc_name: url for amc_name, url in amc_urls.items() if not checkpoint.done(amc_name)}
+                print(
+                    f"⏭️  Resuming the run started {checkpoint.started_at}: "
+                    f"{len(amc_urls) - len(pending)} AMCs done, {len(pending)} to scrape"
+                )
+            else:
+                if args.resume:
+                    print("ℹ️  No checkpoint from this month to resume, starting a new run")
+                checkpoint.start(output_stem)
+                pending = dict(amc_urls)
+            writer = HoldingsWriter(output_stem, formats, history, order=list(amc_urls))
+            
+            def write_result(result):
+                with tracer.span('write', profile=True, amc=result['amc'], rows=len(result['holdings'])):
+                    writer.write(result['amc'], result['holdings'])
+            
+            def finish_result(result):
+                checkpoint.record(result)
+                write_result(result)
+            
+            run_start = time.perf_counter()
+            try:
+                # The outputs are rebuilt, AMCs done before the interruption come from the checkpoint
+                resumed = []
+                for amc_name in amc_urls:
+                    if amc_name not in pending:
+                        result = checkpoint.load(amc_name)
+                        write_result(result)
+                        result['num_holdings'] = len(result['holdings'])
+                        result['holdings'] = []
+                        resumed.append(result)
+                
+                scraped = scrape_all_amcs(
+                    pending, config, workers=args.workers,
+                    manifest=manifest, incremental=not args.full,
+                    on_result=finish_result
+                )
+                by_amc = {result['amc']: result for result in resumed + scraped}
+                results = [by_amc[amc_name] for amc_name in amc_urls]
+            except BaseException:
+                # Keep the AMCs written so far, but do not publish a partial run as latest
+                writer.close(publish=False)
+                raise
+            finally:
+                if FILE_INGESTOR is not None:
+                    FILE_INGESTOR.close()
+            with tracer.span('publish', profile=True):
+                has_data = writer.close()
+    finally:
+        trace_file = tracer.write(args.trace_dir, resource={'run.date': datetime.now().isoformat(timespec='seconds')})
+        profile_dir = None
+        if tracer.profiler is not None:
+            profile_dir = tracer.profiler.write(os.path.splitext(trace_file)[0] + '_profile')
+    
+    print_timing_report(results, time.perf_counter() - run_start)
+    
+    tracer.print_summary()
+    print(f"\n🔬 Trace saved to: {trace_file}")
+    if profile_dir is not None:
+        print(f"🔬 Profiles saved to: {profile_dir} (see profile.txt)")
+    client.print_summary()
+    if HTTP_CACHE is not None:
+        HTTP_CACHE.print_summary()
+    if EXTRACTION_CACHE is not None:
+        EXTRACTION_CACHE.print_summary()
+    
+    if has_data:
         # Summary statistics
         print("\n" + "="*60)
         print("📊 SCRAPING COMPLETE!")
         print("="*60)
-        print(f"✅ Total AMCs scraped: {df['amc'].nunique()}")
-        print(f"✅ Total holdings records: {len(df)}")
-        
-        if 'scheme_name' in df.columns:
-            print(f"✅ Total schemes: {df['scheme_name'].nunique()}")
-        
-        if 'stock_name' in df.columns:
-            print(f"✅ Total unique stocks: {df['stock_name'].nunique()}")
-        
-        # Save to CSV
-        output_file = f"mutual_fund_holdings_{datetime.now().strftime('%Y%m%d')}.csv"
-        df.to_csv(output_file, index=False)
-        print(f"\n💾 Data saved to: {output_file}")
+        print(f"✅ Total AMCs scraped: {len(writer.amcs)}")
+        print(f"✅ Total holdings records: {writer.rows}")
+        print(f"✅ Total schemes: {len(writer.schemes)}")
+        print(f"✅ Total unique stocks: {len(writer.stocks)}")
         
-        # Also save as latest
-        df.to_csv('mutual_fund_holdings_latest.csv', index=False)
-        print(f"💾 Latest copy saved to: mutual_fund_holdings_latest.csv")
+        print()
+        latest_files = {'csv': LATEST_FILE, 'parquet': LATEST_PARQUET_FILE}
+        for fmt, output_file in writer.output_files.items():
+            print(f"💾 Data saved to: {output_file}")
+            print(f"💾 Latest copy saved to: {latest_files[fmt]}")
+        if history is not None:
+            print(f"🗃️  History updated: {history.path}")
         
         # Display sample
         print("\n📋 Sample data (first 5 rows):")
-        print(df.head())
+        print(writer.sample)
         
-        return df
+        return writer.output_files
     
     else:
         print("\n❌ No data extracted from any AMC")
@@ -0,0 +1,85 @@
+"""
+Shared test fixtures
+Tests run against the modules at the repository root and a local
+http.server stub instead of real AMC websites
+"""
+
+import os
+import sys
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+class StubServer:
+    """
+    Local HTTP server answering each path with scripted responses
+
+    routes maps a path to a list of (status, headers, body) tuples,
+    served one per request; the last one repeats. requests records
+    (path, request headers, monotonic time) of every request, methods
+    its method (HEAD is answered like GET, without the body) and ports
+    the client port it came from, which repeats when a connection is
+    kept alive.
+    """
+
+    def __init__(self):
+        self.routes = {}
+        self.requests = []
+        self.methods = []
+        self.ports = []
+        self._lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                with stub._lock:
+                    stub.requests.append((self.path, dict(self.headers), time.monotonic()))
+                    stub.methods.append(self.command)
+                    stub.ports.append(self.client_address[1])
+                    responses = stub.routes.get(self.path, [(404, {}, b'not found')])
+                    status, headers, body = responses.pop(0) if len(responses) > 1 else responses[0]
+                if callable(body):
+                    body = body(self)
+                if isinstance(body, str):
+                    body = body.encode('utf-8')
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                if self.command != 'HEAD':
+                    self.wfile.write(body)
+
+            do_HEAD = do_GET
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+
+    def url(self, path):
+        return f"http://127.0.0.1:{self.httpd.server_port}{path}"
+
+    def hits(self, path, method=None):
+        return [
+            request for request, request_method in zip(self.requests, self.methods)
+            if request[0] == path and method in (None, request_method)
+        ]
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+@pytest.fixture
+def stub_server():
+    server = StubServer()
+    yield server
+    server.close()
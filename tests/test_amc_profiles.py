@@ -0,0 +1,35 @@
+"""Tests for the generic SEBI disclosure layout profile"""
+
+import pytest
+
+from amc_profiles import get_profile, register_profile, sebi_profile, PROFILES
+
+SEBI_SHEET = [
+    ['Alpha Equity Fund', None, None, None, None, None],
+    ['Portfolio as on 30-Sep-2026', None, None, None, None, None],
+    ['Name of the Instrument', 'ISIN', 'Industry', 'Quantity', 'Market/Fair Value (Rs. in Lacs)', '% to Net Assets'],
+    ['Equity & Equity related', None, None, None, None, None],
+    ['Infosys Ltd', 'INE009A01021', 'IT - Software', '1,00,000', '1,850.25', '5.25%'],
+    ['HDFC Bank Ltd', 'INE040A01034', 'Banks', '50,000', '820.00', '2.10%'],
+    ['Sub Total', None, None, None, '2,670.25', '7.35%'],
+]
+
+def test_sebi_profile_parses_a_disclosure_sheet():
+    holdings, _, scheme = sebi_profile('lakh').parse_grid(SEBI_SHEET, sheet_name='EQF')
+
+    assert scheme == 'Alpha Equity Fund'
+    assert [holding['stock_name'] for holding in holdings] == ['Infosys Ltd', 'HDFC Bank Ltd']
+    assert holdings[0]['market_value'] == pytest.approx(185_025_000.0)
+    assert holdings[0]['quantity'] == 100_000.0
+    assert holdings[1]['weight_percent'] == 2.1
+    assert {holding['portfolio_date'] for holding in holdings} == {'2026-09-30'}
+
+def test_no_amc_is_registered_by_default():
+    assert PROFILES == {}
+    assert get_profile('SBI Mutual Fund') is None
+
+def test_registered_profile_is_returned(monkeypatch):
+    monkeypatch.setattr('amc_profiles.PROFILES', {})
+    profile = register_profile('DSP Mutual Fund', sebi_profile('crore'))
+
+    assert get_profile('DSP Mutual Fund') is profile
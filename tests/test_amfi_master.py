@@ -0,0 +1,73 @@
+"""Tests for loading the AMFI scheme master through the HTTP cache"""
+
+import pytest
+
+import amfi_master
+from amfi_master import load_amfi_master, master_path
+from http_client import HTTPClient
+
+MASTER = (
+    "AMC;Code;Scheme Name;Scheme Type;Scheme Category;Scheme NAV Name;Scheme Minimum Amount;"
+    "Launch Date;Closure Date;ISIN Div Payout/ ISIN GrowthISIN Div Reinvestment\n"
+    "Alpha Mutual Fund;100001;Alpha Equity Fund;Open Ended;Equity Scheme - Flexi Cap Fund;"
+    "Alpha Equity Fund - Direct Plan - Growth;500;01-Jan-2013;;INF000A01011\n"
+)
+SECOND_SCHEME = (
+    "Beta Mutual Fund;100002;Beta Value Fund;Open Ended;Equity Scheme - Value Fund;"
+    "Beta Value Fund - Regular Plan - Growth;500;01-Jan-2015;;INF000B01019\n"
+)
+
+@pytest.fixture
+def client():
+    return HTTPClient(host_delay=0, backoff=0.01)
+
+def test_stale_master_is_revalidated_and_kept_on_304(stub_server, tmp_path, client):
+    stub_server.routes['/master'] = [(200, {'ETag': '"v1"'}, MASTER), (304, {}, b'')]
+    url = stub_server.url('/master')
+
+    first = load_amfi_master(str(tmp_path), max_age=0, client=client, url=url)
+    second = load_amfi_master(str(tmp_path), max_age=0, client=client, url=url)
+
+    assert len(first) == len(second) == 1
+    assert second.resolve_scheme_name('alpha equity fund direct plan growth') == 'Alpha Equity Fund'
+    assert stub_server.hits('/master')[1][1].get('If-None-Match') == '"v1"'
+
+def test_fresh_master_is_used_without_a_request(stub_server, tmp_path, client):
+    stub_server.routes['/master'] = [(200, {}, MASTER)]
+    url = stub_server.url('/master')
+
+    load_amfi_master(str(tmp_path), client=client, url=url)
+    master = load_amfi_master(str(tmp_path), client=client, url=url)
+
+    assert len(stub_server.hits('/master')) == 1
+    assert master.lookup_isin('INF000A01011')['scheme_code'] == 100001
+
+def test_changed_master_is_parsed_again(stub_server, tmp_path, client):
+    stub_server.routes['/master'] = [(200, {'ETag': '"v1"'}, MASTER), (200, {'ETag': '"v2"'}, MASTER + SECOND_SCHEME)]
+    url = stub_server.url('/master')
+
+    load_amfi_master(str(tmp_path), max_age=0, client=client, url=url)
+    master = load_amfi_master(str(tmp_path), max_age=0, client=client, url=url)
+
+    assert len(master) == 2
+    assert master.num_amcs == 2
+
+def test_offline_without_a_stored_master_is_empty(tmp_path, client):
+    master = load_amfi_master(str(tmp_path), offline=True, client=client, url='http://127.0.0.1:9/master')
+
+    assert len(master) == 0
+
+@pytest.mark.parametrize('parquet', [True, False])
+def test_stored_master_round_trips(stub_server, tmp_path, client, monkeypatch, parquet):
+    if parquet and not amfi_master.PARQUET_AVAILABLE:
+        pytest.skip("pyarrow not installed")
+    monkeypatch.setattr(amfi_master, 'PARQUET_AVAILABLE', parquet)
+    stub_server.routes['/master'] = [(200, {}, MASTER)]
+    url = stub_server.url('/master')
+
+    load_amfi_master(str(tmp_path), client=client, url=url)
+    assert master_path(str(tmp_path)).endswith('.parquet' if parquet else '.pkl')
+    master = load_amfi_master(str(tmp_path), offline=True, client=client, url=url)
+
+    assert master.scheme(100001)['amc'] == 'Alpha Mutual Fund'
+    assert str(master.table['amc'].dtype) == 'category'
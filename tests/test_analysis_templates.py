@@ -0,0 +1,192 @@
+"""Tests for the analysis templates"""
+
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks'))
+
+import analysis_templates as at
+import report_runner
+from synthetic_holdings import generate_holdings
+
+REPORT_COLUMNS = ['amc', 'scheme_name', 'stock_name', 'market_value', 'weight_percent']
+
+def test_full_report_runs_without_a_date_column(tmp_path, capsys):
+    df = generate_holdings(1_000).drop(columns=['portfolio_date', 'scraped_date'])
+
+    results = report_runner.run_report(df, workers=1, output_file=str(tmp_path / 'report.txt'))
+
+    assert results['amc_strategies']['avg_active_share'].notna().all()
+    assert len(results['scheme_metrics']) == df['scheme_name'].nunique()
+    assert results['summary']['records'] == len(df)
+    assert (tmp_path / 'report.txt').exists()
+
+def test_report_runs_on_projected_columns(tmp_path, capsys):
+    path = str(tmp_path / 'holdings.parquet')
+    generate_holdings(1_000).to_parquet(path)
+
+    full = at.analyze_amc_strategies(at.load_data(path))
+    projected = at.load_data(path, columns=REPORT_COLUMNS)
+    at.generate_monthly_report(projected, str(tmp_path / 'report.txt'))
+
+    pd.testing.assert_frame_equal(at.analyze_amc_strategies(projected), full)
+    assert 'AMC STRATEGY COMPARISON' in (tmp_path / 'report.txt').read_text()
+
+def test_holdings_without_dates_have_no_month():
+    df = pd.DataFrame({'stock_name': ['A', 'B']})
+
+    assert at.holding_months(df).isna().all()
+
+def brute_force_scheme_metrics(df, benchmark=None):
+    """Scheme metrics with plain pandas, one scheme at a time"""
+    df = df.assign(security=df['isin'].astype(object).fillna(df['stock_name'].astype(object)))
+    positions = {
+        scheme: group.groupby('security')['weight_percent'].sum()
+        for scheme, group in df.groupby('scheme_name')
+    }
+    shares = {scheme: weights / weights.sum() for scheme, weights in positions.items()}
+    if benchmark is None:
+        reference = pd.concat(shares, axis=1).fillna(0).mean(axis=1)
+    else:
+        reference = benchmark / benchmark.sum()
+    rows = {}
+    for scheme, weights in positions.items():
+        share = shares[scheme]
+        securities = share.index.union(reference.index)
+        rows[scheme] = {
+            'num_holdings': len(weights),
+            'weight_sum': weights.sum(),
+            'top10_weight': weights.sort_values(ascending=False).head(10).sum(),
+            'hhi': (share ** 2).sum() * 10000,
+            'active_share': 0.5 * (
+                share.reindex(securities, fill_value=0) - reference.reindex(securities, fill_value=0)
+            ).abs().sum() * 100,
+        }
+    return pd.DataFrame.from_dict(rows, orient='index').rename_axis('scheme_name')
+
+@pytest.fixture
+def holdings():
+    df = generate_holdings(2_000).drop(columns=['portfolio_date', 'scraped_date'])
+    # Repeated rows of a security and a holding without ISIN
+    df = pd.concat([df, df.head(20)], ignore_index=True)
+    df.loc[5, 'isin'] = None
+    return df
+
+@pytest.mark.parametrize('with_benchmark', [False, True])
+def test_scheme_metrics_match_brute_force(holdings, with_benchmark):
+    benchmark = None
+    if with_benchmark:
+        isins = holdings['isin'].dropna().unique()[:30]
+        benchmark = pd.Series(range(1, len(isins) + 1), index=isins, dtype='float64')
+
+    metrics = at.compute_scheme_metrics(holdings, benchmark=benchmark)
+    expected = brute_force_scheme_metrics(holdings, benchmark)
+
+    columns = ['num_holdings', 'weight_sum', 'top10_weight', 'hhi', 'active_share']
+    pd.testing.assert_frame_equal(
+        metrics[columns].sort_index(), expected[columns].sort_index(), check_dtype=False, check_index_type=False
+    )
+
+def test_amc_comparison_without_weights_falls_back_to_counts(capsys):
+    df = generate_holdings(1_000).assign(weight_percent=float('nan'))
+
+    amc_analysis = at.analyze_amc_strategies(df)
+
+    expected = amc_analysis['num_unique_stocks'] / amc_analysis['num_schemes']
+    pd.testing.assert_series_equal(amc_analysis['avg_stocks_per_scheme'], expected, check_names=False)
+    assert 'avg_active_share' not in amc_analysis
+    assert at.analyze_scheme_metrics(df) is None
+
+@pytest.mark.parametrize('limit', [None, 1, 3])
+def test_join_samples_matches_groupby_apply(limit):
+    df = pd.DataFrame({
+        'stock_name': ['A', 'B', 'A', 'C', 'A', 'B', None, 'A', 'C', 'A'],
+        'amc': ['X', 'Y', 'Y', 'X', 'X', 'Z', 'X', None, 'X', 'Z'],
+    })
+    present = df.dropna()
+
+    expected = present.groupby('stock_name')['amc'].agg(lambda x: ', '.join(x.head(limit)))
+    expected_unique = present.groupby('stock_name')['amc'].agg(lambda x: ', '.join(x.unique()[:limit]))
+
+    pd.testing.assert_series_equal(
+        at.join_samples(df['stock_name'], df['amc'], limit=limit), expected, check_index_type=False, check_names=False
+    )
+    pd.testing.assert_series_equal(
+        at.join_samples(df['stock_name'], df['amc'], limit=limit, unique=True), expected_unique,
+        check_index_type=False, check_names=False,
+    )
+
+def test_join_samples_on_categoricals_matches_groupby_apply():
+    df = generate_holdings(2_000)
+    present = df.dropna(subset=['stock_name', 'amc'])
+
+    expected = present.groupby('stock_name', observed=True)['amc'].agg(lambda x: ', '.join(x.unique()))
+
+    joined = at.join_samples(df['stock_name'], df['amc'], unique=True)
+    pd.testing.assert_series_equal(joined, expected, check_index_type=False, check_categorical=False, check_names=False)
+
+def test_load_data_projects_parquet_and_raw_csv_columns(tmp_path, capsys):
+    pd.DataFrame({
+        'AMC': ['X', 'X'],
+        'Name of the Instrument': ['Infosys Ltd', 'Reliance Industries'],
+        'Market Value (Rs. in Lakhs)': ['1,234.5', '100'],
+        '% to NAV': ['5.2%', '1.1%'],
+        'Scheme Name': ['Alpha Fund', 'Alpha Fund'],
+    }).to_csv(tmp_path / 'old.csv', index=False)
+
+    df = at.load_data(str(tmp_path / 'old.csv'), columns=['stock_name', 'weight_percent'], canonicalize=False)
+
+    assert list(df.columns) == ['stock_name', 'weight_percent']
+    assert isinstance(df['stock_name'].dtype, pd.CategoricalDtype)
+    assert df['weight_percent'].tolist() == [5.2, 1.1]
+
+    path = str(tmp_path / 'holdings.parquet')
+    generate_holdings(500).to_parquet(path)
+    projected = at.load_data(path, columns=REPORT_COLUMNS)
+
+    assert list(projected.columns) == REPORT_COLUMNS
+    assert isinstance(projected['amc'].dtype, pd.CategoricalDtype)
+
+def test_holding_months_prefer_the_portfolio_date():
+    df = pd.DataFrame({
+        'portfolio_date': ['2026-09-30', None, None],
+        'scraped_date': ['2026-10-04', '2026-10-04', None],
+    })
+
+    assert at.holding_months(df).tolist() == ['2026-09', '2026-10', None]
+
+def test_most_held_stocks_match_a_direct_groupby(capsys):
+    df = generate_holdings(2_000)
+
+    expected = df.groupby('stock_name', observed=True).agg({
+        'scheme_name': 'count', 'market_value': 'sum', 'weight_percent': 'mean', 'amc': 'nunique',
+    }).rename(columns={
+        'scheme_name': 'num_schemes', 'market_value': 'total_value_cr',
+        'weight_percent': 'avg_weight_pct', 'amc': 'num_amcs',
+    })
+    expected['total_value_cr'] = expected['total_value_cr'] / 10000000
+    expected = expected.sort_values('num_schemes', ascending=False).head(20)
+
+    pd.testing.assert_frame_equal(at.analyze_most_held_stocks(at.AnalysisContext(df)), expected)
+
+def test_aggregates_are_computed_once_per_context(monkeypatch, capsys):
+    context = at.AnalysisContext(generate_holdings(2_000))
+    at.analyze_most_held_stocks(context)
+    at.analyze_amc_strategies(context)
+
+    # No further groupby over the holdings themselves, only over the small aggregates
+    calls = []
+    groupby = pd.DataFrame.groupby
+    def counting_groupby(self, *args, **kwargs):
+        if self is context.df:
+            calls.append(args)
+        return groupby(self, *args, **kwargs)
+    monkeypatch.setattr(pd.DataFrame, 'groupby', counting_groupby)
+    at.analyze_most_held_stocks(context)
+    at.analyze_amc_strategies(context)
+
+    assert calls == []
+    assert at.get_context(context) is context
@@ -0,0 +1,31 @@
+"""Tests for merging chunked LLM extraction results"""
+
+from chunked_extraction import merge_holdings
+
+def _holding(stock, quantity, isin='INE000A01010', scheme='Alpha Equity Fund'):
+    return {'scheme_name': scheme, 'isin': isin, 'stock_name': stock, 'quantity': quantity, 'market_value': quantity * 10}
+
+def test_rows_repeated_by_a_later_chunk_are_dropped():
+    first = [_holding('Infosys Ltd', 100), _holding('TCS Ltd', 50, isin='INE467B01029')]
+    second = [_holding('Infosys Ltd', 100), _holding('HDFC Bank Ltd', 70, isin='INE040A01034')]
+
+    merged = merge_holdings([first, {'stocks': second}])
+
+    assert [holding['stock_name'] for holding in merged] == ['Infosys Ltd', 'TCS Ltd', 'HDFC Bank Ltd']
+
+def test_same_security_with_different_positions_is_kept():
+    first = [_holding('Bharti Airtel Ltd', 100)]
+    second = [_holding('Bharti Airtel Ltd - Partly Paid', 20)]
+
+    assert len(merge_holdings([first, second])) == 2
+
+def test_identical_rows_within_one_chunk_are_kept():
+    chunk = [_holding('Infosys Ltd', 100), _holding('Infosys Ltd', 100)]
+
+    assert len(merge_holdings([chunk])) == 2
+
+def test_same_security_in_another_scheme_is_kept():
+    first = [_holding('Infosys Ltd', 100)]
+    second = [_holding('Infosys Ltd', 100, scheme='Beta Flexi Cap Fund')]
+
+    assert len(merge_holdings([first, second])) == 2
@@ -0,0 +1,44 @@
+"""Tests for the SQLite extraction cache"""
+
+import time
+
+from extraction_cache import ExtractionCache, extraction_key
+
+def test_key_depends_on_prompt_model_and_content():
+    key = extraction_key('prompt', 'model', 'content')
+
+    assert key == extraction_key('prompt', 'model', 'content')
+    assert key != extraction_key('other prompt', 'model', 'content')
+    assert key != extraction_key('prompt', 'other model', 'content')
+    assert key != extraction_key('prompt', 'model', 'other content')
+
+def test_hit_returns_the_result_and_counts_the_savings(tmp_path):
+    cache = ExtractionCache(str(tmp_path / 'cache.db'))
+    key = extraction_key('prompt', 'model', 'content')
+
+    assert cache.get(key) is None
+    cache.put(key, 'model', [{'stock_name': 'Infosys', 'weight_percent': 5.2}], seconds=3.5, tokens=1200)
+
+    assert cache.get(key) == [{'stock_name': 'Infosys', 'weight_percent': 5.2}]
+    assert cache.stats == {'hits': 1, 'misses': 1, 'seconds_saved': 3.5, 'tokens_saved': 1200}
+
+def test_entries_are_shared_between_instances(tmp_path):
+    path = str(tmp_path / 'cache.db')
+    ExtractionCache(path).put('key', 'model', {'holdings': []})
+
+    assert ExtractionCache(path).get('key') == {'holdings': []}
+
+def test_least_recently_used_entry_is_evicted(tmp_path):
+    cache = ExtractionCache(str(tmp_path / 'cache.db'), max_entries=2)
+    cache.put('a', 'model', 'A')
+    time.sleep(0.01)
+    cache.put('b', 'model', 'B')
+    time.sleep(0.01)
+    # Reading a makes b the least recently used
+    assert cache.get('a') == 'A'
+    time.sleep(0.01)
+    cache.put('c', 'model', 'C')
+
+    assert cache.get('b') is None
+    assert cache.get('a') == 'A'
+    assert cache.get('c') == 'C'
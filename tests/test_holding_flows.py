@@ -0,0 +1,64 @@
+"""Tests for the multi-month holding flow engine"""
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks'))
+
+import analysis_templates as at
+from synthetic_holdings import generate_holdings
+
+def merge_based_flows(snapshots):
+    """Flows of every pair of consecutive months from one outer merge per pair"""
+    df = snapshots.assign(
+        month=at.holding_months(snapshots),
+        scheme_name=snapshots['scheme_name'].astype(object),
+        security=at.security_key(snapshots),
+    )
+    positions = df.groupby(['month', 'scheme_name', 'security'])[['quantity', 'market_value', 'weight_percent']].sum()
+    months = sorted(df['month'].unique())
+    pairs = []
+    for previous, month in zip(months, months[1:]):
+        before, now = positions.loc[previous], positions.loc[month]
+        both = before.index.unique('scheme_name').intersection(now.index.unique('scheme_name'))
+        merged = before.join(now, how='outer', lsuffix='_previous').fillna(0)
+        merged = merged[merged.index.get_level_values('scheme_name').isin(both)]
+        change = merged['quantity'] - merged['quantity_previous']
+        merged['flow'] = np.select(
+            [~merged.index.isin(before.index), ~merged.index.isin(now.index), change > 0, change < 0],
+            ['entry', 'exit', 'increase', 'decrease'], default='unchanged'
+        )
+        pairs.append(merged.assign(month=month, previous_month=previous).reset_index())
+    return pd.concat(pairs, ignore_index=True)
+
+def test_flows_match_a_merge_based_diff():
+    snapshots = generate_holdings(1_200, num_months=3, seed=3)
+    snapshots['isin'] = snapshots['isin'].astype(object)
+    snapshots.loc[10, 'isin'] = None
+    # A scheme missing from the middle month is left out of both pairs around it
+    missing = snapshots['scheme_name'].cat.categories[0]
+    snapshots = snapshots[~((snapshots['scheme_name'] == missing) & (snapshots['scraped_date'] == '2024-02-29'))]
+
+    flows = at.compute_holding_flows(snapshots)
+    expected = merge_based_flows(snapshots)
+
+    columns = ['month', 'previous_month', 'scheme_name', 'isin', 'flow', 'quantity_previous', 'quantity', 'weight_percent']
+    actual = flows.astype({col: object for col in ['month', 'previous_month', 'scheme_name', 'isin', 'flow']})
+    actual = actual[columns].sort_values(columns[:4]).reset_index(drop=True)
+    expected = expected.rename(columns={'security': 'isin'})[columns].sort_values(columns[:4]).reset_index(drop=True)
+    pd.testing.assert_frame_equal(actual, expected, check_dtype=False)
+    assert missing not in set(flows['scheme_name'])
+    assert {'entry', 'exit', 'increase', 'decrease'} <= set(flows['flow'])
+
+def test_flows_from_a_month_column_match_flows_from_dates():
+    snapshots = generate_holdings(600, num_months=2, seed=5)
+
+    from_dates = at.compute_holding_flows(snapshots)
+    from_months = at.compute_holding_flows(
+        snapshots.drop(columns=['portfolio_date', 'scraped_date']).assign(month=at.holding_months(snapshots))
+    )
+
+    pd.testing.assert_frame_equal(from_months, from_dates)
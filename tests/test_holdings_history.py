@@ -0,0 +1,69 @@
+"""Tests for the SQLite holdings history"""
+
+import sqlite3
+
+import pandas as pd
+
+from holdings_history import HoldingsHistory
+from normalization import normalize_holdings
+
+def _holdings(amc, scraped_date, portfolio_date=None, stocks=('Infosys Ltd', 'HDFC Bank Ltd')):
+    return normalize_holdings(pd.DataFrame({
+        'amc': amc,
+        'scheme_name': f'{amc} Equity Fund',
+        'stock_name': list(stocks),
+        'isin': ['INE009A01021', 'INE040A01034'][:len(stocks)],
+        'weight_percent': [5.0, 3.0][:len(stocks)],
+        'portfolio_date': portfolio_date,
+        'scraped_date': scraped_date,
+    }))
+
+def test_month_comes_from_the_portfolio_date(tmp_path):
+    history = HoldingsHistory(str(tmp_path / 'history.db'))
+
+    # The September disclosure is scraped in October
+    history.append(_holdings('A', '2026-10-04', '30-Sep-2026'))
+    # No disclosure date, the scrape date is all there is
+    history.append(_holdings('B', '2026-10-04'))
+
+    months = history.query("SELECT amc, month FROM holdings GROUP BY amc ORDER BY amc")
+    assert months['month'].tolist() == ['2026-09', '2026-10']
+
+def test_appending_a_month_again_replaces_it(tmp_path):
+    history = HoldingsHistory(str(tmp_path / 'history.db'))
+
+    history.append(_holdings('A', '2026-09-30'))
+    history.append(_holdings('B', '2026-09-30'))
+    history.append(_holdings('A', '2026-09-30', stocks=['Infosys Ltd']))
+
+    snapshot = history.snapshot('2026-09')
+    assert len(snapshot) == 3
+    assert snapshot.groupby('amc').size().to_dict() == {'A': 1, 'B': 2}
+
+def test_queries_cover_the_last_months(tmp_path):
+    history = HoldingsHistory(str(tmp_path / 'history.db'))
+    for month in ['2026-07-31', '2026-08-31', '2026-09-30']:
+        history.append(_holdings('A', month))
+
+    assert history.months() == ['2026-07', '2026-08', '2026-09']
+    assert history.isin_history('INE009A01021', last_months=2)['month'].tolist() == ['2026-08', '2026-09']
+    assert len(history.stock_history('HDFC Bank Ltd', last_months=None)) == 3
+    assert history.recent(last_months=1, columns=['stock_name'])['month'].unique().tolist() == ['2026-09']
+    assert history.scheme_history('A Equity Fund')['weight_percent'].dtype == 'float64'
+
+def test_older_database_gets_the_portfolio_date_column(tmp_path):
+    path = str(tmp_path / 'history.db')
+    with sqlite3.connect(path) as conn:
+        conn.execute(
+            "CREATE TABLE holdings (month TEXT NOT NULL, amc TEXT, scheme_name TEXT, stock_name TEXT, "
+            "isin TEXT, sector TEXT, quantity REAL, market_value REAL, weight_percent REAL, "
+            "scraped_date TEXT, source_url TEXT)"
+        )
+        conn.execute("INSERT INTO holdings (month, amc, stock_name) VALUES ('2026-08', 'A', 'Infosys Ltd')")
+    conn.close()
+
+    history = HoldingsHistory(path)
+    history.append(_holdings('A', '2026-10-04', '2026-09-30'))
+
+    assert history.months() == ['2026-08', '2026-09']
+    assert history.snapshot('2026-09')['portfolio_date'].unique().tolist() == ['2026-09-30']
@@ -0,0 +1,75 @@
+"""Tests for the streaming holdings writer"""
+
+import pandas as pd
+
+from holdings_writer import HoldingsWriter
+
+def _holdings(amc, count=2):
+    return [
+        {'amc': amc, 'scheme_name': f'{amc} Equity Fund', 'stock_name': f'Stock {index}', 'weight_percent': 1.0}
+        for index in range(count)
+    ]
+
+def test_amcs_are_written_in_configured_order(tmp_path):
+    writer = HoldingsWriter(str(tmp_path / 'holdings'), order=['A', 'B', 'C'])
+
+    writer.write('C', _holdings('C'))
+    writer.write('A', _holdings('A'))
+    writer.write('B', _holdings('B'))
+    assert writer.close(publish=False)
+
+    df = pd.read_csv(tmp_path / 'holdings.csv')
+    assert list(df['amc'].drop_duplicates()) == ['A', 'B', 'C']
+    assert len(df) == 6
+
+def test_failed_amc_does_not_hold_back_the_rest(tmp_path):
+    writer = HoldingsWriter(str(tmp_path / 'holdings'), order=['A', 'B', 'C'])
+
+    writer.write('C', _holdings('C'))
+    writer.write('B', [])
+    writer.write('A', _holdings('A'))
+    writer.close(publish=False)
+
+    assert list(pd.read_csv(tmp_path / 'holdings.csv')['amc'].drop_duplicates()) == ['A', 'C']
+
+def test_finished_amcs_are_on_disk_before_close(tmp_path):
+    writer = HoldingsWriter(str(tmp_path / 'holdings'), order=['A', 'B', 'C'])
+
+    # C and B finish while A is still running, then the run crashes
+    writer.write('C', _holdings('C'))
+    writer.write('B', _holdings('B'))
+
+    assert list(pd.read_csv(tmp_path / 'holdings.csv')['amc'].drop_duplicates()) == ['C', 'B']
+    writer.close(publish=False)
+    assert list(pd.read_csv(tmp_path / 'holdings.csv')['amc'].drop_duplicates()) == ['B', 'C']
+
+def test_parquet_batches_are_put_in_configured_order(tmp_path):
+    writer = HoldingsWriter(str(tmp_path / 'holdings'), formats=('csv', 'parquet'), order=['A', 'B', 'C'])
+
+    writer.write('B', _holdings('B', count=3))
+    writer.write('D', _holdings('D'))
+    writer.write('A', _holdings('A'))
+    writer.write('C', _holdings('C'))
+    writer.close(publish=False)
+
+    parquet = pd.read_parquet(tmp_path / 'holdings.parquet')
+    csv = pd.read_csv(tmp_path / 'holdings.csv')
+    # AMCs outside the configured order go last
+    assert list(parquet['amc'].drop_duplicates()) == ['A', 'B', 'C', 'D']
+    assert parquet['stock_name'].astype(str).tolist() == csv['stock_name'].tolist()
+    assert writer.sample['amc'].unique().tolist() == ['A']
+
+def test_parquet_output_is_typed_and_matches_the_csv(tmp_path):
+    writer = HoldingsWriter(str(tmp_path / 'holdings'), formats=('csv', 'parquet'))
+    writer.write('A', _holdings('A', count=3))
+    writer.write('B', _holdings('B'))
+    writer.close(publish=False)
+
+    parquet = pd.read_parquet(tmp_path / 'holdings.parquet')
+    csv = pd.read_csv(tmp_path / 'holdings.csv')
+
+    assert isinstance(parquet['stock_name'].dtype, pd.CategoricalDtype)
+    assert parquet['weight_percent'].dtype == 'float64'
+    assert list(parquet.columns) == list(csv.columns)
+    pd.testing.assert_series_equal(parquet['stock_name'].astype(str), csv['stock_name'].astype(str))
+    pd.testing.assert_series_equal(parquet['weight_percent'], csv['weight_percent'])
@@ -0,0 +1,46 @@
+"""Tests for the on-disk HTTP cache against a local stub server"""
+
+import os
+
+from http_client import HTTPClient
+from http_cache import HTTPCache
+
+def _cache(tmp_path, **kwargs):
+    return HTTPCache(cache_dir=str(tmp_path), client=HTTPClient(host_delay=0), **kwargs)
+
+def test_directory_is_scanned_once_while_under_the_limit(stub_server, tmp_path, monkeypatch):
+    for index in range(5):
+        stub_server.routes[f'/file{index}'] = [(200, {}, b'x' * 100)]
+    cache = _cache(tmp_path, max_bytes=10_000)
+    scans = []
+    listdir = os.listdir
+    monkeypatch.setattr(os, 'listdir', lambda path: scans.append(path) or listdir(path))
+
+    for index in range(5):
+        assert cache.get(stub_server.url(f'/file{index}')) == b'x' * 100
+
+    assert len(scans) == 1
+    assert cache.stats['evictions'] == 0
+
+def test_least_recently_used_entries_are_evicted_over_the_limit(stub_server, tmp_path):
+    for index in range(4):
+        stub_server.routes[f'/file{index}'] = [(200, {}, b'x' * 100)]
+    cache = _cache(tmp_path, max_bytes=250)
+
+    for index in range(4):
+        cache.get(stub_server.url(f'/file{index}'))
+
+    assert cache.stats['evictions'] == 2
+    assert cache.lookup(stub_server.url('/file0')) is None
+    assert cache.lookup(stub_server.url('/file1')) is None
+    assert cache.lookup(stub_server.url('/file3')) is not None
+
+def test_redownloading_an_entry_does_not_count_it_twice(stub_server, tmp_path):
+    stub_server.routes['/file'] = [(200, {}, b'x' * 100)]
+    cache = _cache(tmp_path, ttl=0, max_bytes=150)
+
+    for _ in range(3):
+        cache.get(stub_server.url('/file'))
+
+    assert cache.stats['downloads'] == 3
+    assert cache.stats['evictions'] == 0
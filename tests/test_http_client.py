@@ -0,0 +1,109 @@
+"""Tests for the shared HTTP client against a local stub server"""
+
+import socket
+
+import pytest
+import requests
+
+from http_client import HTTPClient, retry_after_seconds
+
+def test_host_delay_spaces_every_request_to_a_host(stub_server):
+    stub_server.routes['/page'] = [(200, {}, 'ok')]
+    client = HTTPClient(host_delay=0.3, backoff=0.01)
+
+    for _ in range(3):
+        assert client.get(stub_server.url('/page')).status_code == 200
+
+    times = [when for _, _, when in stub_server.hits('/page')]
+    assert all(later - earlier >= 0.25 for earlier, later in zip(times, times[1:]))
+
+def test_retries_wait_for_the_host_delay_too(stub_server):
+    stub_server.routes['/flaky'] = [(503, {}, 'busy'), (200, {}, 'ok')]
+    client = HTTPClient(host_delay=0.3, backoff=0.01)
+
+    assert client.get(stub_server.url('/flaky')).text == 'ok'
+
+    first, second = [when for _, _, when in stub_server.hits('/flaky')]
+    assert second - first >= 0.25
+
+def test_other_hosts_are_not_delayed(stub_server):
+    stub_server.routes['/page'] = [(200, {}, 'ok')]
+    client = HTTPClient(host_delay=5.0)
+
+    client.get(stub_server.url('/page'))
+    # localhost is a different host than 127.0.0.1 as far as the limiter is concerned
+    client.get(stub_server.url('/page').replace('127.0.0.1', 'localhost'))
+
+    first, second = [when for _, _, when in stub_server.hits('/page')]
+    assert second - first < 1.0
+
+def test_server_errors_are_retried_with_backoff(stub_server):
+    stub_server.routes['/busy'] = [(503, {}, 'busy'), (429, {}, 'slow down'), (200, {}, 'ok')]
+    client = HTTPClient(host_delay=0, backoff=0.1)
+
+    response = client.get(stub_server.url('/busy'))
+
+    assert response.status_code == 200
+    first, second, third = [when for _, _, when in stub_server.hits('/busy')]
+    # backoff * 2^attempt with jitter of 0.5x-1.5x
+    assert second - first >= 0.05
+    assert third - second >= 0.1
+    host = client._host(stub_server.url('/busy'))
+    assert client.metrics[host]['retries'] == 2
+    assert client.metrics[host]['failures'] == 0
+
+def test_retry_after_is_honored(stub_server):
+    stub_server.routes['/quota'] = [(429, {'Retry-After': '1'}, 'slow down'), (200, {}, 'ok')]
+    client = HTTPClient(host_delay=0, backoff=0.01)
+
+    assert client.get(stub_server.url('/quota')).status_code == 200
+
+    first, second = [when for _, _, when in stub_server.hits('/quota')]
+    assert second - first >= 0.9
+
+def test_retry_after_accepts_an_http_date():
+    class Response:
+        headers = {'Retry-After': 'Wed, 21 Oct 2015 07:28:00 GMT'}
+
+    assert retry_after_seconds(Response()) == 0.0
+
+def test_gives_up_after_max_retries(stub_server):
+    stub_server.routes['/down'] = [(503, {}, 'down')]
+    client = HTTPClient(host_delay=0, backoff=0.01, max_retries=2)
+
+    response = client.get(stub_server.url('/down'))
+
+    assert response.status_code == 503
+    assert len(stub_server.hits('/down')) == 3
+    host = client._host(stub_server.url('/down'))
+    assert client.metrics[host]['retries'] == 2
+    assert client.metrics[host]['failures'] == 1
+
+def test_client_errors_are_not_retried(stub_server):
+    stub_server.routes['/missing'] = [(404, {}, 'not found')]
+    client = HTTPClient(host_delay=0, backoff=0.01)
+
+    assert client.get(stub_server.url('/missing')).status_code == 404
+    assert len(stub_server.hits('/missing')) == 1
+
+def test_connection_errors_are_raised_once_retries_run_out():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+    client = HTTPClient(host_delay=0, backoff=0.01, max_retries=2)
+
+    with pytest.raises(requests.ConnectionError):
+        client.get(f"http://127.0.0.1:{port}/")
+
+    assert client.metrics[f"127.0.0.1:{port}"]['requests'] == 3
+    assert client.metrics[f"127.0.0.1:{port}"]['failures'] == 1
+
+def test_pooled_connection_is_reused(stub_server):
+    stub_server.routes['/page'] = [(200, {}, 'ok')]
+    client = HTTPClient(host_delay=0)
+
+    for _ in range(4):
+        client.get(stub_server.url('/page'))
+
+    assert len(stub_server.ports) == 4
+    assert len(set(stub_server.ports)) == 1
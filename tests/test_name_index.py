@@ -0,0 +1,80 @@
+"""Tests for scheme and stock name resolution"""
+
+import pandas as pd
+
+from name_index import NameIndex, build_scheme_index, build_stock_index, canonicalize_holdings, stock_key
+
+def test_stock_key_drops_case_punctuation_and_legal_suffixes():
+    assert stock_key('HDFC Bank Ltd.') == stock_key('HDFC BANK LIMITED') == 'hdfc bank'
+    assert stock_key('Larsen & Toubro Ltd') == 'larsen and toubro'
+
+def test_exact_names_resolve_without_the_trigram_index():
+    index = NameIndex(['SBI Bluechip Fund', 'SBI Small Cap Fund'], ['bluechip', 'smallcap'])
+
+    assert index.match('sbi  bluechip fund.') == ('bluechip', 1.0)
+
+def test_misspelled_names_resolve_to_the_closest_key():
+    index = NameIndex(['SBI Bluechip Fund', 'SBI Small Cap Fund', 'HDFC Flexi Cap Fund'],
+                      ['bluechip', 'smallcap', 'flexicap'])
+
+    assert index.lookup('SBI Blue Chip Fund') == 'bluechip'
+    assert index.lookup('HDFC Flexicap') == 'flexicap'
+    assert index.lookup('Nippon India Liquid Fund') is None
+    assert list(index.lookup_many(['SBI Smallcap Fund', None, 'SBI Smallcap Fund'])) == ['smallcap', None, 'smallcap']
+
+def test_first_spelling_of_a_name_wins():
+    index = NameIndex(['HDFC Bank Ltd', 'HDFC BANK LIMITED'], ['INE040A01034', 'other'], normalize=stock_key)
+
+    assert index.lookup('Hdfc Bank') == 'INE040A01034'
+
+def test_canonicalize_holdings_gives_one_spelling_and_fills_isins():
+    df = pd.DataFrame({
+        'scheme_name': ['Alpha Fund', 'Alpha Fund', 'ALPHA FUND', 'Beta Fund'],
+        'stock_name': ['HDFC Bank Ltd', 'HDFC Bank Ltd', 'HDFC BANK LIMITED', 'HDFC Bank Limited'],
+        'isin': ['INE040A01034', 'INE040A01034', None, 'INE040A01034'],
+    })
+
+    canonical = canonicalize_holdings(df)
+
+    assert set(canonical['stock_name']) == {'HDFC Bank Ltd'}
+    assert set(canonical['isin']) == {'INE040A01034'}
+    assert canonical['scheme_name'].tolist() == ['Alpha Fund', 'Alpha Fund', 'Alpha Fund', 'Beta Fund']
+    # The input is left alone
+    assert pd.isna(df.loc[2, 'isin'])
+
+def test_similar_names_of_different_companies_stay_apart():
+    df = pd.DataFrame({
+        'scheme_name': ['Alpha Fund', 'Alpha Fund'],
+        'stock_name': ['Bajaj Finance Ltd', 'Bajaj Finserv Ltd'],
+        'isin': ['INE296A01024', None],
+    })
+
+    canonical = canonicalize_holdings(df)
+
+    assert canonical['stock_name'].tolist() == ['Bajaj Finance Ltd', 'Bajaj Finserv Ltd']
+    assert pd.isna(canonical.loc[1, 'isin'])
+
+def test_categorical_and_counted_holdings_canonicalize_the_same():
+    df = pd.DataFrame({
+        'scheme_name': ['Alpha Fund', 'ALPHA FUND'],
+        'stock_name': ['Infosys Ltd', 'INFOSYS LIMITED'],
+        'isin': ['INE009A01021', 'INE009A01021'],
+    })
+
+    # The second spelling stands for more holdings, so it wins
+    counted = canonicalize_holdings(df, counts=[1, 5])
+    categorical = canonicalize_holdings(df.astype('category'), counts=[1, 5])
+
+    assert set(counted['stock_name']) == {'INFOSYS LIMITED'}
+    assert set(counted['scheme_name']) == {'ALPHA FUND'}
+    pd.testing.assert_frame_equal(categorical.astype(object), counted)
+
+def test_indexes_built_from_holdings():
+    df = pd.DataFrame({
+        'scheme_name': ['Alpha Fund', 'Alpha Fund', 'ALPHA FUND'],
+        'stock_name': ['Infosys Ltd', 'Infosys Ltd', 'HDFC Bank Ltd'],
+        'isin': ['INE009A01021', 'INE009A01021', 'INE040A01034'],
+    })
+
+    assert build_scheme_index(df).lookup('alpha fund') == 'Alpha Fund'
+    assert build_stock_index(df).lookup('INFOSYS LIMITED') == 'INE009A01021'
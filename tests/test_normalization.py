@@ -0,0 +1,55 @@
+"""Tests for holdings normalization"""
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks'))
+
+from normalization import canonical_column, normalize_holdings, normalize_isins, parse_numeric_column
+from synthetic_holdings import generate_holdings
+
+@pytest.mark.parametrize('text, expected', [
+    ('Rs. 1,234.50', 1234.5),
+    ('Rs. 10', 10.0),
+    ('Rs.10', 10.0),
+    ('INR 2,500', 2500.0),
+    ('₹1,23,456.7', 123456.7),
+    ('(1,234)', -1234.0),
+    ('5.2%', 5.2),
+    ('12.5 Cr', 125_000_000.0),
+    ('12.5 Crs.', 125_000_000.0),
+    ('Rs. 3 lakh', 300_000.0),
+])
+def test_parse_numeric_column(text, expected):
+    assert parse_numeric_column(pd.Series([text]))[0] == pytest.approx(expected)
+
+def test_missing_values_parse_as_nan():
+    assert np.isnan(parse_numeric_column(pd.Series(['-', 'N/A', 'nil']))).all()
+
+@pytest.mark.parametrize('header, expected', [
+    ('Equity Shares', 'stock_name'),
+    ('Name of Equity Shares', 'stock_name'),
+    ('Shares', 'quantity'),
+    ('Shares Held', 'quantity'),
+    ('No. of Shares', 'quantity'),
+    ('Number of Shares', 'quantity'),
+])
+def test_shares_headers(header, expected):
+    assert canonical_column(header) == expected
+
+def test_equity_shares_column_holds_the_stock_names():
+    df = normalize_holdings(pd.DataFrame({
+        'Equity Shares': ['Infosys Ltd'], 'No. of Shares': ['1,00,000'], '% to NAV': ['5.2%'],
+    }))
+
+    assert df.loc[0, 'stock_name'] == 'Infosys Ltd'
+    assert df.loc[0, 'quantity'] == 100_000.0
+
+def test_synthetic_isins_pass_validation():
+    isins = generate_holdings(2_000)['isin'].astype(object)
+
+    assert normalize_isins(isins).notna().all()
@@ -0,0 +1,82 @@
+"""Tests that streaming analyses over a multi-month file match the in-memory ones"""
+
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+pytest.importorskip('pyarrow')
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks'))
+
+import analysis_templates as at
+import report_runner
+from out_of_core import OutOfCoreContext
+from synthetic_holdings import generate_holdings
+
+MONTHS = ['2024-01', '2024-02', '2024-03']
+
+@pytest.fixture(scope='module')
+def history(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp('history') / 'history.parquet')
+    generate_holdings(3_000, num_months=len(MONTHS)).to_parquet(path, row_group_size=1_000)
+    return path
+
+@pytest.fixture(scope='module')
+def contexts(history):
+    # Small batches, so partial aggregates are combined several times
+    return at.AnalysisContext(at.load_data(history)), OutOfCoreContext(history, batch_rows=300)
+
+def test_scheme_metrics_match_and_use_the_latest_month(history, contexts):
+    in_memory, streamed = contexts
+    latest = at.load_data(history)
+    latest = latest[(at.holding_months(latest) == MONTHS[-1]).to_numpy()]
+
+    expected = at.compute_scheme_metrics(latest)
+    pd.testing.assert_frame_equal(in_memory.scheme_metrics, expected)
+    pd.testing.assert_frame_equal(streamed.scheme_metrics, expected, check_categorical=False, check_exact=False)
+    # One month of weights per scheme, not the sum over the history
+    assert streamed.scheme_metrics['weight_sum'].max() <= 101.0
+
+def test_month_filtered_scheme_metrics_match(history):
+    in_memory = at.load_data(history)
+    in_memory = in_memory[(at.holding_months(in_memory) == MONTHS[0]).to_numpy()]
+    streamed = OutOfCoreContext(history, months=MONTHS[0], batch_rows=300)
+
+    pd.testing.assert_frame_equal(
+        streamed.scheme_metrics, at.compute_scheme_metrics(in_memory), check_categorical=False, check_exact=False
+    )
+
+@pytest.mark.parametrize('name', ['stock_stats', 'scheme_stats', 'amc_stats', 'sector_stats', 'monthly_stock_stats'])
+def test_aggregates_match(contexts, name):
+    in_memory, streamed = contexts
+    expected, actual = getattr(in_memory, name), getattr(streamed, name)
+
+    assert list(actual.index) == list(expected.index)
+    pd.testing.assert_frame_equal(
+        actual.reset_index(drop=True), expected.reset_index(drop=True), check_dtype=False, check_exact=False
+    )
+
+def test_row_level_analyses_match(contexts, capsys):
+    in_memory, streamed = contexts
+
+    for analysis in (at.analyze_concentrated_bets, at.find_hidden_gems):
+        expected = analysis(in_memory)
+        actual = analysis(streamed)
+        assert list(actual.index) == list(expected.index)
+        pd.testing.assert_frame_equal(
+            actual.reset_index(drop=True), expected.reset_index(drop=True), check_dtype=False, check_exact=False
+        )
+
+def test_report_runner_streams_the_file(history, tmp_path, capsys):
+    in_memory_report, streamed_report = tmp_path / 'in_memory.txt', tmp_path / 'streamed.txt'
+
+    report_runner.main(['--input', history, '--workers', '1', '--output', str(in_memory_report)])
+    report_runner.main(['--input', history, '--workers', '2', '--out-of-core', '--output', str(streamed_report)])
+
+    def report(path):
+        return [line for line in path.read_text().splitlines() if not line.startswith('Generated:')]
+
+    assert report(streamed_report) == report(in_memory_report)
+    assert 'running them in this process' in capsys.readouterr().out
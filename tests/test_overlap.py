@@ -0,0 +1,66 @@
+"""Tests for the sparse all-pairs portfolio overlap engine"""
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks'))
+
+import analysis_templates as at
+from synthetic_holdings import generate_holdings
+
+@pytest.fixture
+def holdings():
+    df = generate_holdings(600, seed=7)
+    df['isin'] = df['isin'].astype(object)
+    # A holding without ISIN is keyed by its stock name, repeated rows are added up
+    df.loc[3, 'isin'] = None
+    return pd.concat([df, df.head(5)], ignore_index=True)
+
+def brute_force_overlap(df, weighted):
+    """Overlap of every scheme pair from Python sets and dicts"""
+    df = df.assign(security=at.security_key(df))
+    positions = {
+        scheme: group.groupby('security')['weight_percent'].sum().to_dict()
+        for scheme, group in df.groupby('scheme_name', observed=True)
+    }
+    schemes = sorted(positions)
+    overlap = np.zeros((len(schemes), len(schemes)))
+    for i, first in enumerate(schemes):
+        for j, second in enumerate(schemes):
+            common = positions[first].keys() & positions[second].keys()
+            if weighted:
+                overlap[i, j] = sum(min(positions[first][key], positions[second][key]) for key in common)
+            else:
+                overlap[i, j] = len(common)
+    return overlap, schemes
+
+@pytest.mark.parametrize('weighted', [False, True])
+def test_overlap_matrix_matches_pairwise_brute_force(holdings, weighted):
+    overlap, schemes = at.compute_overlap_matrix(holdings, weighted=weighted)
+    expected, expected_schemes = brute_force_overlap(holdings, weighted)
+
+    assert list(schemes) == expected_schemes
+    np.testing.assert_allclose(overlap.toarray(), expected)
+
+def test_weighted_overlap_is_the_same_in_small_batches(holdings, monkeypatch):
+    overlap, _ = at.compute_overlap_matrix(holdings, weighted=True)
+    monkeypatch.setattr(at, 'OVERLAP_PAIR_BATCH', 7)
+
+    batched, _ = at.compute_overlap_matrix(holdings, weighted=True)
+
+    np.testing.assert_allclose(batched.toarray(), overlap.toarray())
+
+def test_similar_schemes_rank_by_share_of_common_holdings(holdings, capsys):
+    similar = at.find_similar_schemes(holdings, top_k=3)
+    expected, schemes = brute_force_overlap(holdings, weighted=False)
+    position = {scheme: index for index, scheme in enumerate(schemes)}
+
+    for row in similar.itertuples():
+        i, j = position[row.scheme_name], position[row.similar_scheme]
+        assert row.overlap == expected[i, j]
+        assert row.overlap_pct == pytest.approx(expected[i, j] / expected[i, i] * 100)
+    assert similar.groupby('scheme_name').size().max() <= 3
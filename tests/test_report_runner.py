@@ -0,0 +1,67 @@
+"""Tests for the parallel report runner"""
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip('pyarrow')
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks'))
+
+import report_runner
+from synthetic_holdings import generate_holdings
+
+@pytest.fixture(scope='module')
+def holdings_file(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp('holdings') / 'holdings.parquet')
+    generate_holdings(3_000, num_months=2).to_parquet(path)
+    return path
+
+def _report(path):
+    return [line for line in path.read_text().splitlines() if not line.startswith('Generated:')]
+
+def test_worker_processes_write_the_same_report(holdings_file, tmp_path, capsys):
+    sequential, parallel = tmp_path / 'sequential.txt', tmp_path / 'parallel.txt'
+
+    report_runner.main(['--input', holdings_file, '--workers', '1', '--output', str(sequential)])
+    sequential_output = capsys.readouterr().out
+    report_runner.main(['--input', holdings_file, '--workers', '3', '--output', str(parallel)])
+    parallel_output = capsys.readouterr().out
+
+    assert _report(parallel) == _report(sequential)
+
+    # Every analysis prints the same, in the same order (timings aside)
+    def analyses(output):
+        return output[:output.index('ANALYSIS TIMING')]
+    assert analyses(parallel_output).replace(str(parallel), str(sequential)) == analyses(sequential_output)
+
+def test_worker_results_match_sequential_results(tmp_path, capsys):
+    df = generate_holdings(2_000)
+
+    sequential = report_runner.run_report(df, workers=1, output_file=str(tmp_path / 'sequential.txt'))
+    parallel = report_runner.run_report(df, workers=3, output_file=str(tmp_path / 'parallel.txt'))
+
+    assert sequential.keys() == parallel.keys()
+    for name, result in sequential.items():
+        if isinstance(result, pd.DataFrame):
+            pd.testing.assert_frame_equal(parallel[name], result)
+        elif isinstance(result, pd.Series):
+            pd.testing.assert_series_equal(parallel[name], result)
+        else:
+            assert parallel[name] == result
+
+def test_shared_file_round_trips_with_numbers_on_the_mapped_pages(tmp_path):
+    df = generate_holdings(1_000)
+    path = str(tmp_path / 'shared.arrow')
+
+    report_runner.write_shared(df, path)
+    shared = report_runner.read_shared(path)
+
+    pd.testing.assert_frame_equal(shared, df)
+    # A zero-copy view of the read-only mapping, where a copy would be writeable
+    for col in ['quantity', 'market_value', 'weight_percent']:
+        assert not np.asarray(shared[col].array).flags.writeable
+    assert np.asarray(df['weight_percent'].array).flags.writeable
@@ -0,0 +1,91 @@
+"""Tests for checkpointing and resuming scrape runs"""
+
+import pandas as pd
+import pytest
+
+import scraper
+from http_client import get_client, set_client
+from run_checkpoint import RunCheckpoint
+
+AMC_URLS = {'A': 'https://a.example/', 'B': 'https://b.example/', 'C': 'https://c.example/'}
+
+def _result(amc, holdings=None, error=None):
+    return {
+        'amc': amc, 'url': AMC_URLS[amc], 'seconds': 0.1, 'reused': False, 'method': 'basic', 'error': error,
+        'holdings': holdings if holdings is not None else [
+            {'amc': amc, 'scheme_name': f'{amc} Equity Fund', 'stock_name': 'Infosys Ltd', 'weight_percent': 5.0},
+        ],
+    }
+
+def test_only_amcs_with_holdings_are_done(tmp_path):
+    checkpoint = RunCheckpoint(str(tmp_path))
+    checkpoint.start('holdings_20261018')
+    checkpoint.record(_result('A'))
+    checkpoint.record(_result('B', holdings=[]))
+    checkpoint.record(_result('C', holdings=[], error='timed out'))
+
+    reopened = RunCheckpoint(str(tmp_path))
+
+    assert reopened.resumable()
+    assert reopened.output_stem == 'holdings_20261018'
+    assert [reopened.done(amc) for amc in AMC_URLS] == [True, False, False]
+    assert reopened.load('A')['holdings'] == _result('A')['holdings']
+
+def test_starting_a_run_discards_the_old_checkpoint(tmp_path):
+    checkpoint = RunCheckpoint(str(tmp_path))
+    checkpoint.start('old')
+    checkpoint.record(_result('A'))
+
+    checkpoint.start('new')
+
+    assert not RunCheckpoint(str(tmp_path)).done('A')
+
+@pytest.fixture
+def scrape_run(tmp_path, monkeypatch):
+    """Run scraper.main offline with scrape_amc replaced, recording which AMCs get scraped"""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(scraper, 'load_amc_urls', lambda: dict(AMC_URLS))
+    monkeypatch.setattr(scraper, 'get_amfi_scheme_master', lambda *args: None)
+    monkeypatch.setattr(scraper, 'USE_AI', False)
+    monkeypatch.setattr(scraper, 'FILE_INGESTOR', None)
+    scraped = []
+
+    def run(*flags, crash_at=None, fail=()):
+        def scrape_amc(amc_name, url, *args):
+            if amc_name == crash_at:
+                raise KeyboardInterrupt
+            scraped.append(amc_name)
+            return _result(amc_name, holdings=[] if amc_name in fail else None)
+        monkeypatch.setattr(scraper, 'scrape_amc', scrape_amc)
+        return scraper.main([
+            '--no-cache', '--no-files', '--no-history', '--format', 'csv',
+            '--state-dir', str(tmp_path / 'state'), '--trace-dir', str(tmp_path / 'traces'), *flags,
+        ])
+
+    previous_client = get_client()
+    yield run, scraped
+    set_client(previous_client)
+
+def test_resume_only_scrapes_the_missing_and_failed_amcs(scrape_run, capsys):
+    run, scraped = scrape_run
+
+    # A finishes, B finds nothing, the run is killed while scraping C
+    with pytest.raises(KeyboardInterrupt):
+        run(crash_at='C', fail=['B'])
+    scraped.clear()
+
+    output_files = run('--resume')
+
+    assert scraped == ['B', 'C']
+    df = pd.read_csv(output_files['csv'])
+    assert list(df['amc'].drop_duplicates()) == ['A', 'B', 'C']
+    assert len(df) == 3
+
+def test_without_resume_every_amc_is_scraped_again(scrape_run, capsys):
+    run, scraped = scrape_run
+    run()
+    scraped.clear()
+
+    run()
+
+    assert scraped == ['A', 'B', 'C']
@@ -0,0 +1,46 @@
+"""Tests for run tracing and profiling"""
+
+import threading
+
+from run_trace import Tracer, Profiler
+
+def _busy():
+    return sum(index * index for index in range(20_000))
+
+def test_spans_in_worker_threads_are_traced_but_not_profiled(tmp_path):
+    profiler = Profiler()
+    tracer = Tracer(profiler)
+    errors = []
+
+    def work(index):
+        try:
+            with tracer.span('amc', profile=True, amc=f'AMC {index}'):
+                _busy()
+        except Exception as e:
+            errors.append(e)
+
+    with tracer.span('run', profile=True):
+        threads = [threading.Thread(target=work, args=(index,)) for index in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    profiler.write(str(tmp_path / 'profile'))
+
+    assert errors == []
+    assert sorted(span.name for span in tracer.spans) == ['amc'] * 4 + ['run']
+    assert set(profiler.stats) == {'run'}
+    assert (tmp_path / 'profile' / 'run.prof').exists()
+
+def test_nested_profiled_spans_merge_into_the_outermost(tmp_path):
+    profiler = Profiler()
+    tracer = Tracer(profiler)
+
+    for _ in range(2):
+        with tracer.span('write', profile=True):
+            with tracer.span('parse_file', profile=True):
+                _busy()
+    profiler.write(str(tmp_path / 'profile'))
+
+    assert set(profiler.stats) == {'write'}
+    assert (tmp_path / 'profile' / 'profile.txt').read_text().count('write: top') == 1
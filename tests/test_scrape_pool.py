@@ -0,0 +1,46 @@
+"""Tests for scraping AMCs concurrently under the per-host rate limit"""
+
+import threading
+import time
+
+import scraper
+from http_client import HTTPClient
+
+AMC_URLS = {f'AMC {index}': f'https://amc{index}.example/' for index in range(6)}
+
+def test_pool_keeps_configured_order_and_bounds_concurrency(monkeypatch, capsys):
+    running, peak = [0], [0]
+    lock = threading.Lock()
+
+    def scrape_amc(amc_name, url, *args):
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        # Later AMCs finish first
+        time.sleep(0.02 * (len(AMC_URLS) - int(amc_name.split()[1])))
+        with lock:
+            running[0] -= 1
+        return {'amc': amc_name, 'url': url, 'holdings': [{'stock_name': 'X'}], 'seconds': 0.0, 'error': None}
+    monkeypatch.setattr(scraper, 'scrape_amc', scrape_amc)
+    finished = []
+
+    results = scraper.scrape_all_amcs(AMC_URLS, workers=3, on_result=lambda result: finished.append(result['amc']))
+
+    assert [result['amc'] for result in results] == list(AMC_URLS)
+    assert sorted(finished) == sorted(AMC_URLS) and finished != list(AMC_URLS)
+    assert all(result['num_holdings'] == 1 and result['holdings'] == [] for result in results)
+    assert 1 < peak[0] <= 3
+
+def test_concurrent_requests_to_one_host_are_spaced(stub_server):
+    stub_server.routes['/page'] = [(200, {}, 'ok')]
+    client = HTTPClient(host_delay=0.2, backoff=0.01)
+
+    threads = [threading.Thread(target=client.get, args=(stub_server.url('/page'),)) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    times = sorted(when for _, _, when in stub_server.hits('/page'))
+    assert len(times) == 4
+    assert all(later - earlier >= 0.15 for earlier, later in zip(times, times[1:]))
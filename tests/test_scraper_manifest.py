@@ -0,0 +1,102 @@
+"""Tests for reusing holdings through the run manifest when nothing changed"""
+
+from io import BytesIO
+
+import pandas as pd
+import pytest
+
+import scraper
+from file_ingestion import FileIngestor
+from http_client import HTTPClient, get_client, set_client
+from run_manifest import RunManifest
+
+PAGE = '<html><body><h1>Portfolios</h1><a href="/portfolio.xlsx">Monthly portfolio</a></body></html>'
+
+def _workbook(weight):
+    buffer = BytesIO()
+    rows = [
+        ['Alpha Equity Fund', None, None],
+        ['Name of the Instrument', 'ISIN', '% to Net Assets'],
+        ['Infosys Ltd', 'INE009A01021', weight],
+    ]
+    pd.DataFrame(rows).to_excel(buffer, header=False, index=False)
+    return buffer.getvalue()
+
+@pytest.fixture
+def amc_site(stub_server, tmp_path, monkeypatch):
+    previous_client = get_client()
+    set_client(HTTPClient(host_delay=0, backoff=0.01))
+    ingestor = FileIngestor(scraper.fetch_bytes, workers=1)
+    monkeypatch.setattr(scraper, 'FILE_INGESTOR', ingestor)
+    monkeypatch.setattr(scraper, 'HTTP_CACHE', None)
+    monkeypatch.setattr(scraper, 'AMFI_MASTER', None)
+    monkeypatch.setattr(scraper, 'USE_AI', False)
+    stub_server.routes['/amc'] = [(200, {'Content-Type': 'text/html'}, PAGE)]
+    yield stub_server, RunManifest(str(tmp_path / 'state'))
+    ingestor.close()
+    set_client(previous_client)
+
+def _serve_workbook(server, weight, etag):
+    server.routes['/portfolio.xlsx'] = [(200, {'ETag': etag}, _workbook(weight))]
+
+def test_unchanged_page_and_files_reuse_holdings(amc_site):
+    server, manifest = amc_site
+    _serve_workbook(server, 5.25, '"v1"')
+
+    first = scraper.scrape_amc('Alpha MF', server.url('/amc'), manifest=manifest)
+    second = scraper.scrape_amc('Alpha MF', server.url('/amc'), manifest=manifest)
+
+    assert first['method'] == 'files' and not first['reused']
+    assert second['reused']
+    assert second['holdings'][0]['% to Net Assets'] == first['holdings'][0]['% to Net Assets']
+
+def test_changed_linked_file_is_extracted_again(amc_site):
+    server, manifest = amc_site
+    _serve_workbook(server, 5.25, '"v1"')
+    scraper.scrape_amc('Alpha MF', server.url('/amc'), manifest=manifest)
+
+    # Only the linked workbook changes, the landing page stays the same
+    _serve_workbook(server, 6.5, '"v2"')
+    result = scraper.scrape_amc('Alpha MF', server.url('/amc'), manifest=manifest)
+
+    assert not result['reused']
+    assert result['holdings'][0]['% to Net Assets'] == '6.5'
+
+def test_changed_linked_file_is_detected_through_the_http_cache(amc_site, tmp_path, monkeypatch):
+    server, manifest = amc_site
+    monkeypatch.setattr(scraper, 'HTTP_CACHE', scraper.HTTPCache(cache_dir=str(tmp_path / 'cache'), ttl=0))
+    _serve_workbook(server, 5.25, '"v1"')
+    scraper.scrape_amc('Alpha MF', server.url('/amc'), manifest=manifest)
+
+    _serve_workbook(server, 6.5, '"v2"')
+    result = scraper.scrape_amc('Alpha MF', server.url('/amc'), manifest=manifest)
+
+    assert not result['reused']
+    assert result['holdings'][0]['% to Net Assets'] == '6.5'
+
+def test_first_run_fingerprints_files_from_their_download(amc_site):
+    server, manifest = amc_site
+    _serve_workbook(server, 5.25, '"v1"')
+
+    scraper.scrape_amc('Alpha MF', server.url('/amc'), manifest=manifest)
+
+    # No manifest entry to compare with, so no HEAD before extraction and none after it
+    assert server.hits('/portfolio.xlsx', 'HEAD') == []
+    assert len(server.hits('/portfolio.xlsx', 'GET')) == 1
+
+    reused = scraper.scrape_amc('Alpha MF', server.url('/amc'), manifest=manifest)
+
+    # The next run checks the file with one HEAD and does not download it again
+    assert reused['reused']
+    assert len(server.hits('/portfolio.xlsx', 'HEAD')) == 1
+    assert len(server.hits('/portfolio.xlsx', 'GET')) == 1
+
+def test_full_run_does_not_check_files_before_extracting(amc_site):
+    server, manifest = amc_site
+    _serve_workbook(server, 5.25, '"v1"')
+    scraper.scrape_amc('Alpha MF', server.url('/amc'), manifest=manifest)
+
+    result = scraper.scrape_amc('Alpha MF', server.url('/amc'), manifest=manifest, incremental=False)
+
+    assert not result['reused']
+    assert server.hits('/portfolio.xlsx', 'HEAD') == []
@@ -0,0 +1,182 @@
+"""Tests for batched and incremental Google Sheets uploads against a fake worksheet"""
+
+import re
+
+import pandas as pd
+import pytest
+
+import upload_to_sheets as sheets
+from upload_to_sheets import SheetUploadState, sheet_text, upload_in_batches, update_changed_rows
+
+def _column_number(letters):
+    number = 0
+    for letter in letters:
+        number = number * 26 + ord(letter) - ord('A') + 1
+    return number
+
+def _parse_range(range_name):
+    first_col, first_row, last_col, last_row = re.fullmatch(r'([A-Z]+)(\d+):([A-Z]+)(\d+)', range_name).groups()
+    return int(first_row), int(last_row), _column_number(first_col), _column_number(last_col)
+
+class FakeWorksheet:
+    """In-memory stand-in for a gspread Worksheet, recording every API call"""
+
+    def __init__(self, fail_on_update=None):
+        self.cells = {}
+        self.calls = []
+        self.fail_on_update = fail_on_update
+
+    def clear(self):
+        self.calls.append('clear')
+        self.cells = {}
+
+    def resize(self, rows, cols):
+        self.calls.append('resize')
+
+    def update(self, range_name, values):
+        self.calls.append(('update', range_name))
+        updates = sum(1 for call in self.calls if isinstance(call, tuple) and call[0] == 'update')
+        if updates == self.fail_on_update:
+            raise ConnectionError("connection reset")
+        self._write(range_name, values)
+
+    def batch_update(self, data):
+        self.calls.append(('batch_update', [item['range'] for item in data]))
+        for item in data:
+            self._write(item['range'], item['values'])
+
+    def batch_clear(self, ranges):
+        self.calls.append(('batch_clear', ranges))
+        for range_name in ranges:
+            first_row, last_row, first_col, last_col = _parse_range(range_name)
+            for row in range(first_row, last_row + 1):
+                for col in range(first_col, last_col + 1):
+                    self.cells.pop((row, col), None)
+
+    def _write(self, range_name, values):
+        first_row, _, first_col, _ = _parse_range(range_name)
+        for row_offset, row in enumerate(values):
+            for col_offset, value in enumerate(row):
+                self.cells[(first_row + row_offset, first_col + col_offset)] = value
+
+    def rows(self):
+        """Data rows (below the header) as lists of strings, trailing empty rows dropped"""
+        if not self.cells:
+            return []
+        last_row = max(row for row, _ in self.cells)
+        last_col = max(col for _, col in self.cells)
+        rows = [
+            [str(self.cells.get((row, col), '')) for col in range(1, last_col + 1)]
+            for row in range(2, last_row + 1)
+        ]
+        while rows and not any(rows[-1]):
+            rows.pop()
+        return rows
+
+def _holdings(stocks):
+    return pd.DataFrame({
+        'amc': 'Alpha AMC',
+        'scheme_name': 'Alpha Equity Fund',
+        'stock_name': [stock for stock, _ in stocks],
+        'weight_percent': [weight for _, weight in stocks],
+    })
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(sheets, 'BACKOFF_SECONDS', 0)
+
+def test_interrupted_upload_resumes_after_the_last_batch(tmp_path):
+    df = _holdings([(f'Stock {index}', float(index)) for index in range(10)])
+    state = SheetUploadState(str(tmp_path), 'sheet-id', 'Holdings')
+    # Update 1 is the header row, so the third batch of rows fails
+    worksheet = FakeWorksheet(fail_on_update=4)
+
+    with pytest.raises(ConnectionError):
+        upload_in_batches(worksheet, df, state, 'fingerprint', batch_rows=3)
+    assert state.load_progress()['rows_committed'] == 6
+
+    worksheet.fail_on_update = None
+    worksheet.calls = []
+    upload_in_batches(worksheet, df, state, 'fingerprint', batch_rows=3)
+
+    assert 'clear' not in worksheet.calls
+    assert [call[1] for call in worksheet.calls] == ['A8:D10', 'A11:D11']
+    assert worksheet.rows() == sheet_text(df).values.tolist()
+
+def test_changed_source_restarts_the_upload(tmp_path):
+    df = _holdings([('Stock A', 1.0), ('Stock B', 2.0)])
+    state = SheetUploadState(str(tmp_path), 'sheet-id', 'Holdings')
+    state.save_progress('old-fingerprint', list(df.columns), 1)
+    worksheet = FakeWorksheet()
+
+    upload_in_batches(worksheet, df, state, 'new-fingerprint', batch_rows=10)
+
+    assert worksheet.calls[0] == 'clear'
+    assert worksheet.rows() == sheet_text(df).values.tolist()
+
+def _first_upload(tmp_path, df):
+    worksheet = FakeWorksheet()
+    state = SheetUploadState(str(tmp_path), 'sheet-id', 'Holdings')
+    upload_in_batches(worksheet, df, state, 'fingerprint')
+    state.save_snapshot(sheet_text(df))
+    return worksheet, state
+
+def _incremental_upload(worksheet, state, df):
+    worksheet.calls = []
+    state.save_snapshot(update_changed_rows(worksheet, df, state.load_snapshot()))
+
+def _sorted_rows(rows):
+    return sorted(row for row in rows if any(row))
+
+def test_incremental_upload_sends_only_changed_rows(tmp_path):
+    stocks = [(f'Stock {index}', float(index)) for index in range(6)]
+    worksheet, state = _first_upload(tmp_path, _holdings(stocks))
+
+    stocks[3] = ('Stock 3', 9.5)
+    _incremental_upload(worksheet, state, _holdings(stocks))
+
+    assert worksheet.calls == [('batch_update', ['A5:D5'])]
+    assert worksheet.rows() == sheet_text(_holdings(stocks)).values.tolist()
+
+def test_inserted_holding_does_not_resend_the_rows_after_it(tmp_path):
+    stocks = [(f'Stock {index}', float(index)) for index in range(6)]
+    worksheet, state = _first_upload(tmp_path, _holdings(stocks))
+
+    new = _holdings(stocks[:2] + [('Stock 1a', 1.5)] + stocks[2:])
+    _incremental_upload(worksheet, state, new)
+
+    assert worksheet.calls == ['resize', ('batch_update', ['A8:D8'])]
+    assert _sorted_rows(worksheet.rows()) == _sorted_rows(sheet_text(new).values.tolist())
+
+def test_removed_holding_frees_its_row_for_a_new_one(tmp_path):
+    stocks = [(f'Stock {index}', float(index)) for index in range(4)]
+    worksheet, state = _first_upload(tmp_path, _holdings(stocks))
+
+    removed = _holdings(stocks[:1] + stocks[2:])
+    _incremental_upload(worksheet, state, removed)
+    assert worksheet.calls == [('batch_update', ['A3:D3'])]
+    assert _sorted_rows(worksheet.rows()) == _sorted_rows(sheet_text(removed).values.tolist())
+
+    added = _holdings(stocks[:1] + stocks[2:] + [('Stock 9', 9.0)])
+    _incremental_upload(worksheet, state, added)
+    assert worksheet.calls == [('batch_update', ['A3:D3'])]
+    assert _sorted_rows(worksheet.rows()) == _sorted_rows(sheet_text(added).values.tolist())
+
+def test_trailing_rows_are_cleared_when_the_data_shrinks(tmp_path):
+    stocks = [(f'Stock {index}', float(index)) for index in range(5)]
+    worksheet, state = _first_upload(tmp_path, _holdings(stocks))
+
+    _incremental_upload(worksheet, state, _holdings(stocks[:3]))
+
+    assert worksheet.calls == [('batch_clear', ['A5:D6'])]
+    assert worksheet.rows() == sheet_text(_holdings(stocks[:3])).values.tolist()
+
+def test_repeated_holdings_keep_separate_rows(tmp_path):
+    stocks = [('Stock A', 1.0), ('Stock A', 2.0), ('Stock B', 3.0)]
+    worksheet, state = _first_upload(tmp_path, _holdings(stocks))
+
+    stocks[1] = ('Stock A', 2.5)
+    _incremental_upload(worksheet, state, _holdings(stocks))
+
+    assert worksheet.calls == [('batch_update', ['A3:D3'])]
+    assert worksheet.rows() == sheet_text(_holdings(stocks)).values.tolist()
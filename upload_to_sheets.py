@@ -4,10 +4,19 @@ Upload mutual fund holdings data to Google Sheets
 Optional script for automatic Google Sheets integration
 """
 
-import pandas as pd
 import os
+import re
+import json
+import time
+import random
+import hashlib
+import argparse
+import numpy as np
+import pandas as pd
 from datetime import datetime
 
+from run_manifest import DEFAULT_STATE_DIR
+
 try:
     import gspread
     from oauth2client.service_account import ServiceAccountCredentials
@@ -17,10 +26,241 @@ except ImportError:
     print("Run: pip install gspread oauth2client")
     SHEETS_AVAILABLE = False
 
-def upload_to_google_sheets(csv_file, sheet_name="Mutual Fund Holdings"):
+# Cells per API request, well below the Sheets payload limit
+MAX_BATCH_CELLS = 40_000
+MAX_RETRIES = 6
+BACKOFF_SECONDS = 2.0
+# Quota (429) and transient server errors are retried, anything else is raised
+RETRY_STATUS = {429, 500, 502, 503, 504}
+# Columns identifying a holding, used to match rows between uploads
+ROW_KEY_COLUMNS = ['amc', 'scheme_name', 'isin', 'stock_name']
+
+def _status_code(error):
+    response = getattr(error, 'response', None)
+    return getattr(response, 'status_code', None)
+
+def with_retry(fn, *args, **kwargs):
+    """Call a Sheets API method, backing off exponentially (with jitter) on quota and server errors"""
+    for attempt in range(MAX_RETRIES + 1):
+        try:
+            return fn(*args, **kwargs)
+        except Exception as e:
+            if _status_code(e) not in RETRY_STATUS or attempt == MAX_RETRIES:
+                raise
+            delay = BACKOFF_SECONDS * 2 ** attempt * random.uniform(0.5, 1.5)
+            print(f"⏳ Sheets API returned {_status_code(e)}, retrying in {delay:.1f}s...")
+            time.sleep(delay)
+
+def column_letter(col):
+    """Return the A1 column letter for a 1-based column number (1 -> A, 27 -> AA)"""
+    letters = ''
+    while col > 0:
+        col, remainder = divmod(col - 1, 26)
+        letters = chr(ord('A') + remainder) + letters
+    return letters
+
+def a1_range(first_row, last_row, num_cols):
+    """A1 range covering whole rows first_row..last_row (1-based) of a num_cols wide table"""
+    return f"A{first_row}:{column_letter(num_cols)}{last_row}"
+
+def sheet_values(df):
+    """Rows of plain Python values for the API, with missing values as empty cells"""
+    return df.astype(object).where(df.notna(), '').values.tolist()
+
+def sheet_text(df):
+    """The values as text, used to compare an upload with the previous one"""
+    return df.astype(object).where(df.notna(), '').astype(str)
+
+def file_fingerprint(path):
+    """SHA-256 of a file's contents, read in chunks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class SheetUploadState:
+    """
+    Upload progress and last uploaded snapshot for one worksheet
+
+    The progress file records the source file and the number of data rows
+    already written, updated after every batch, so an interrupted upload
+    resumes where it stopped. The snapshot (CSV of the uploaded values as
+    text) is what incremental uploads diff against.
+    """
+
+    def __init__(self, state_dir, spreadsheet_id, sheet_name):
+        slug = re.sub(r'[^a-z0-9]+', '_', f"{spreadsheet_id}_{sheet_name}".lower()).strip('_')
+        self.progress_path = os.path.join(state_dir, f"sheets_{slug}.json")
+        self.snapshot_path = os.path.join(state_dir, f"sheets_{slug}.csv")
+        os.makedirs(state_dir, exist_ok=True)
+
+    def _replace(self, path, write):
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        write(tmp_path)
+        os.replace(tmp_path, path)
+
+    def load_progress(self):
+        try:
+            with open(self.progress_path) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def save_progress(self, source, columns, rows_committed):
+        def write(path):
+            with open(path, 'w') as f:
+                json.dump({'source': source, 'columns': columns, 'rows_committed': rows_committed}, f)
+        self._replace(self.progress_path, write)
+
+    def clear_progress(self):
+        if os.path.exists(self.progress_path):
+            os.remove(self.progress_path)
+
+    def load_snapshot(self):
+        if not os.path.exists(self.snapshot_path):
+            return None
+        return pd.read_csv(self.snapshot_path, dtype=str, keep_default_na=False)
+
+    def save_snapshot(self, text):
+        self._replace(self.snapshot_path, lambda path: text.to_csv(path, index=False))
+
+def upload_in_batches(worksheet, df, state, source, batch_rows=None):
+    """
+    Replace the worksheet contents with df, batch_rows rows per request
+
+    Progress is saved after each batch. If the saved progress is for the
+    same source file and columns, the upload resumes after the last
+    committed batch instead of clearing the sheet.
+    """
+    columns = [str(col) for col in df.columns]
+    num_cols = len(columns)
+    batch_rows = batch_rows or max(1, MAX_BATCH_CELLS // max(1, num_cols))
+
+    progress = state.load_progress()
+    if progress and progress['source'] == source and progress['columns'] == columns:
+        start = progress['rows_committed']
+        print(f"♻️  Resuming upload after row {start}")
+    else:
+        start = 0
+        with_retry(worksheet.clear)
+        with_retry(worksheet.resize, rows=len(df) + 1, cols=num_cols)
+        with_retry(worksheet.update, range_name=a1_range(1, 1, num_cols), values=[columns])
+        state.save_progress(source, columns, 0)
+
+    for begin in range(start, len(df), batch_rows):
+        end = min(begin + batch_rows, len(df))
+        with_retry(
+            worksheet.update,
+            range_name=a1_range(begin + 2, end + 1, num_cols),
+            values=sheet_values(df.iloc[begin:end])
+        )
+        state.save_progress(source, columns, end)
+        print(f"📤 Uploaded rows {begin + 1}-{end} of {len(df)}")
+
+def row_keys(text):
+    """
+    Stable key for every row of a text frame
+
+    The key is the ROW_KEY_COLUMNS values (all columns if none of them
+    are present) plus the occurrence number among rows with equal values,
+    so repeated holdings keep distinct keys.
+    """
+    columns = [col for col in ROW_KEY_COLUMNS if col in text.columns] or list(text.columns)
+    keys = text[columns[0]].astype(str)
+    if len(columns) > 1:
+        keys = keys.str.cat([text[col].astype(str) for col in columns[1:]], sep='\x1f')
+    return (keys + '\x1f' + keys.groupby(keys).cumcount().astype(str)).tolist()
+
+def sheet_layout(text, previous):
+    """
+    Sheet row of every row of text, given the previously uploaded rows
+
+    Returns, per sheet row, the index of the row of text shown there, or
+    -1 for an empty row. Rows uploaded before keep their sheet row, new
+    rows fill the rows of removed ones and then go at the end.
+    """
+    position = {key: index for index, key in enumerate(row_keys(previous))}
+    layout = np.full(len(previous), -1)
+    fresh = []
+    for index, key in enumerate(row_keys(text)):
+        if key in position:
+            layout[position[key]] = index
+        else:
+            fresh.append(index)
+
+    free = np.flatnonzero(layout < 0)
+    filled = min(len(free), len(fresh))
+    layout[free[:filled]] = fresh[:filled]
+    layout = np.concatenate([layout, np.asarray(fresh[filled:], dtype=layout.dtype)])
+
+    used = np.flatnonzero(layout >= 0)
+    return layout[:used[-1] + 1] if len(used) else layout[:0]
+
+def update_changed_rows(worksheet, df, previous, batch_rows=None):
+    """
+    Push only the rows that differ from the previously uploaded snapshot
+
+    Rows are matched to the snapshot by row_keys, not by position, so an
+    added or removed holding does not shift every row after it (see
+    sheet_layout). Runs of changed sheet rows become ranges, sent in
+    size-bounded batch_update calls, and extra rows left over from a
+    longer previous upload are cleared. Returns the new sheet contents as
+    text, which is the snapshot for the next upload.
+    """
+    num_cols = len(df.columns)
+    batch_rows = batch_rows or max(1, MAX_BATCH_CELLS // max(1, num_cols))
+
+    layout = sheet_layout(sheet_text(df), previous)
+    empty = layout < 0
+    values = df.astype(object).where(df.notna(), '').iloc[np.where(empty, 0, layout)].reset_index(drop=True)
+    values[empty] = ''
+    text = values.astype(str)
+
+    shared = min(len(text), len(previous))
+    changed = np.ones(len(text), dtype=bool)
+    changed[:shared] = (text.to_numpy()[:shared] != previous.to_numpy()[:shared]).any(axis=1)
+
+    if len(text) > len(previous):
+        with_retry(worksheet.resize, rows=len(text) + 1, cols=num_cols)
+
+    # Start and end (exclusive) of every run of changed rows
+    edges = np.flatnonzero(np.diff(np.concatenate([[False], changed, [False]]).astype(np.int8)))
+    ranges = []
+    for run_start, run_end in zip(edges[::2], edges[1::2]):
+        for begin in range(run_start, run_end, batch_rows):
+            ranges.append((begin, min(begin + batch_rows, run_end)))
+
+    batch, batch_cells = [], 0
+    for begin, end in ranges:
+        if batch and batch_cells + (end - begin) * num_cols > MAX_BATCH_CELLS:
+            with_retry(worksheet.batch_update, batch)
+            batch, batch_cells = [], 0
+        batch.append({
+            'range': a1_range(begin + 2, end + 1, num_cols),
+            'values': values.iloc[begin:end].values.tolist(),
+        })
+        batch_cells += (end - begin) * num_cols
+    if batch:
+        with_retry(worksheet.batch_update, batch)
+
+    if len(previous) > len(text):
+        with_retry(worksheet.batch_clear, [a1_range(len(text) + 2, len(previous) + 1, num_cols)])
+
+    print(f"🔁 {int(changed.sum())} of {len(text)} sheet rows changed, {len(ranges)} range(s) updated")
+    return text
+
+def upload_to_google_sheets(csv_file, sheet_name="Mutual Fund Holdings", incremental=False,
+                            batch_rows=None, state_dir=DEFAULT_STATE_DIR):
     """
     Upload CSV data to Google Sheets
     
+    Data is sent in size-bounded batches with retry on quota errors, and
+    an interrupted upload of the same file resumes from the last batch.
+    With incremental set, only rows that changed since the previous
+    upload to this worksheet are sent; rows keep their sheet position
+    between incremental uploads.
+    
     Prerequisites:
     1. Create Google Cloud Project
     2. Enable Google Sheets API
@@ -48,8 +288,11 @@ def upload_to_google_sheets(csv_file, sheet_name="Mutual Fund Holdings"):
         return False
     
     try:
-        # Read CSV
-        df = pd.read_csv(csv_file)
+        # Read CSV (or Parquet)
+        if csv_file.endswith('.parquet'):
+            df = pd.read_parquet(csv_file)
+        else:
+            df = pd.read_csv(csv_file)
         print(f"📊 Loaded {len(df)} rows from {csv_file}")
         
         # Authenticate
@@ -65,21 +308,34 @@ def upload_to_google_sheets(csv_file, sheet_name="Mutual Fund Holdings"):
         
         if sheet_id:
             # Open existing sheet by ID
-            spreadsheet = client.open_by_key(sheet_id)
+            spreadsheet = with_retry(client.open_by_key, sheet_id)
         else:
             # Create new sheet
-            spreadsheet = client.create(f"MF Holdings - {datetime.now().strftime('%Y-%m-%d')}")
+            spreadsheet = with_retry(client.create, f"MF Holdings - {datetime.now().strftime('%Y-%m-%d')}")
             print(f"✅ Created new spreadsheet: {spreadsheet.url}")
         
         # Get or create worksheet
+        state = SheetUploadState(state_dir, spreadsheet.id, sheet_name)
+        created = False
         try:
-            worksheet = spreadsheet.worksheet(sheet_name)
-            worksheet.clear()  # Clear existing data
-        except:
-            worksheet = spreadsheet.add_worksheet(title=sheet_name, rows=len(df)+1, cols=len(df.columns))
+            worksheet = with_retry(spreadsheet.worksheet, sheet_name)
+        except gspread.WorksheetNotFound:
+            worksheet = with_retry(spreadsheet.add_worksheet, title=sheet_name, rows=len(df)+1, cols=len(df.columns))
+            state.clear_progress()
+            created = True
         
         # Upload data
-        worksheet.update([df.columns.values.tolist()] + df.values.tolist())
+        previous = state.load_snapshot() if incremental and not created else None
+        if previous is not None and list(previous.columns) == [str(col) for col in df.columns]:
+            uploaded = update_changed_rows(worksheet, df, previous, batch_rows=batch_rows)
+        else:
+            if incremental:
+                print("⚠️  No matching previous upload, sending everything")
+            upload_in_batches(worksheet, df, state, file_fingerprint(csv_file), batch_rows=batch_rows)
+            uploaded = sheet_text(df)
+        
+        state.save_snapshot(uploaded)
+        state.clear_progress()
         
         print(f"✅ Uploaded {len(df)} rows to Google Sheets")
         print(f"🔗 Sheet URL: {spreadsheet.url}")
@@ -90,8 +346,30 @@ def upload_to_google_sheets(csv_file, sheet_name="Mutual Fund Holdings"):
         print(f"❌ Error uploading to Google Sheets: {e}")
         return False
 
-def main():
+def main(argv=None):
     """Main function"""
+    parser = argparse.ArgumentParser(description="Upload holdings data to Google Sheets")
+    parser.add_argument('file', nargs='?', help="CSV or Parquet file (default: latest holdings CSV)")
+    parser.add_argument('--sheet-name', default="Mutual Fund Holdings", help="Worksheet name (default: %(default)s)")
+    parser.add_argument(
+        '--incremental', action='store_true',
+        help="Only send rows that changed since the previous upload to this worksheet"
+    )
+    parser.add_argument(
+        '--batch-rows', type=int, default=None,
+        help=f"Rows per API request (default: as many as fit in {MAX_BATCH_CELLS:,} cells)"
+    )
+    parser.add_argument(
+        '--state-dir', default=DEFAULT_STATE_DIR,
+        help="Where upload progress and the last uploaded snapshot are kept (default: %(default)s)"
+    )
+    args = parser.parse_args(argv)
+    
+    if args.file:
+        print(f"📁 Using file: {args.file}")
+        upload_to_google_sheets(args.file, args.sheet_name, args.incremental, args.batch_rows, args.state_dir)
+        return
+    
     # Find latest CSV file
     csv_files = [f for f in os.listdir('.') if f.startswith('mutual_fund_holdings') and f.endswith('.csv')]
     
@@ -103,7 +381,7 @@ def main():
     latest_csv = 'mutual_fund_holdings_latest.csv' if 'mutual_fund_holdings_latest.csv' in csv_files else sorted(csv_files)[-1]
     
     print(f"📁 Using file: {latest_csv}")
-    upload_to_google_sheets(latest_csv)
+    upload_to_google_sheets(latest_csv, args.sheet_name, args.incremental, args.batch_rows, args.state_dir)
 
 if __name__ == "__main__":
     main()